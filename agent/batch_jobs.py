@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def batch_results(pipeline, queries, generate=True):
+    """Yields one result dict per query, in order: the NDJSON lines of a batch response.
+
+    The whole batch reads the index version that was live when it started.
+    """
+    with pipeline.index.use() as snapshot:
+        results = pipeline.recommend_batch(queries, generate, snapshot)
+        for index, (query, (tea_ids, degraded)) in enumerate(zip(queries, results)):
+            yield {
+                "index": index,
+                "query": query,
+                "names": [tea['name'] for tea in pipeline.lookup(tea_ids, snapshot)],
+                "degraded": degraded is not None,
+                "degraded_reason": degraded
+            }
+
+
+class BatchJobs:
+    """Background batch jobs for inputs too large for one streamed response.
+
+    Jobs run one at a time on a worker thread and write their NDJSON results
+    to job_dir/<job_id>.ndjson as they go, so results can be fetched while a
+    job is still running. Only the last `history` jobs are kept; older result
+    files are deleted.
+    """
+
+    def __init__(self, pipeline, job_dir=None, history=None):
+        self.pipeline = pipeline
+        self.job_dir = job_dir or os.getenv("BATCH_JOB_DIR", "jobs")
+        self.history = int(history) if history is not None else int(os.getenv("BATCH_JOB_HISTORY", "100"))
+        self.jobs = OrderedDict()  # job id -> status dict
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._work, daemon=True, name="batch-jobs")
+        self._worker.start()
+
+    def results_path(self, job_id):
+        return os.path.join(self.job_dir, f"{job_id}.ndjson")
+
+    def submit(self, queries, generate=True):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "total": len(queries),
+                "done": 0,
+                "submitted_at": time.time(),
+                "error": None
+            }
+            while len(self.jobs) > self.history:
+                old_id, _ = self.jobs.popitem(last=False)
+                if os.path.exists(self.results_path(old_id)):
+                    os.remove(self.results_path(old_id))
+        self._queue.put((job_id, queries, generate))
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def _work(self):
+        while True:
+            job_id, queries, generate = self._queue.get()
+            if self.status(job_id) is None:
+                continue
+            self._update(job_id, status="running", started_at=time.time())
+            os.makedirs(self.job_dir, exist_ok=True)
+            try:
+                with open(self.results_path(job_id), 'w') as out:
+                    for done, result in enumerate(batch_results(self.pipeline, queries, generate), 1):
+                        out.write(json.dumps(result) + "\n")
+                        if done % 100 == 0 or done == len(queries):
+                            out.flush()
+                            self._update(job_id, done=done)
+                self._update(job_id, status="completed", finished_at=time.time())
+            except Exception as e:
+                print(f"Batch job {job_id} failed: {e}")
+                self._update(job_id, status="failed", error=str(e), finished_at=time.time())
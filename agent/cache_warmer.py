@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from agent.deadline import Deadline
+
+load_dotenv()
+
+
+class RequestLog:
+    """Appends one JSONL record per served /recommend request: the query, how it was answered and how long it took.
+
+    This is the record of real traffic the cache warmer replays. Warm-up
+    calls go straight to the pipeline, so they never count themselves.
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path is not None else os.getenv("REQUEST_LOG_PATH", "logs/requests.jsonl")
+        self._lock = threading.Lock()
+
+    def append(self, query, **fields):
+        if not self.path:
+            return
+        record = {"time": time.time(), "query": query}
+        record.update(fields)
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Could not log request: {e}")
+
+
+def read_queries(path, max_lines=None):
+    """Queries from a log: JSONL records with a "query" field (the request log) or one query per line."""
+    max_lines = int(max_lines) if max_lines is not None else int(os.getenv("CACHE_WARM_LOG_LINES", "100000"))
+    # Only the most recent lines count, so popularity follows current traffic
+    lines = deque(maxlen=max_lines)
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                lines.append(line)
+    queries = []
+    for line in lines:
+        if line.startswith("{"):
+            try:
+                line = json.loads(line).get("query") or ""
+            except ValueError:
+                pass
+        if line:
+            queries.append(line)
+    return queries
+
+
+class CacheWarmer:
+    """Replays the most frequent queries through a pipeline so its caches are warm before traffic.
+
+    Queries come from CACHE_WARM_QUERY_LOG (default: the backend's request
+    log, REQUEST_LOG_PATH), or from the evaluation test set when there is no
+    log yet. All of them are embedded in one batched call, which fills the
+    query-embedding cache. With the semantic cache enabled, the top
+    CACHE_WARM_TOP_N queries that would go to RAG are also answered, on
+    CACHE_WARM_WORKERS threads, so their answers are cached. With it off
+    there are no answers to keep, so only embeddings are warmed, and the
+    run reports answers_cached False.
+
+    `ready` is only set by a run that succeeds. A run that raises, or in
+    which every query fails, leaves its reason in `error` instead.
+
+    Warming is incremental. Each answered query's candidate teas and their
+    content keys are remembered. After a catalog reload, a query whose
+    candidates are unchanged gets its previous answer copied to the new
+    version, with no generation. Only queries whose candidates changed are
+    answered again.
+    """
+
+    def __init__(self, pipeline, router=None, log_path=None, seed_path='evaluation/test_data.json', top_n=None, workers=None):
+        self.pipeline = pipeline
+        self.router = router
+        self.log_path = log_path or os.getenv("CACHE_WARM_QUERY_LOG") or os.getenv("REQUEST_LOG_PATH", "logs/requests.jsonl")
+        self.seed_path = seed_path
+        self.top_n = int(top_n) if top_n is not None else int(os.getenv("CACHE_WARM_TOP_N", "200"))
+        self.workers = int(workers) if workers is not None else int(os.getenv("CACHE_WARM_WORKERS", "2"))
+        self.budget_ms = int(os.getenv("CACHE_WARM_BUDGET_MS", "30000"))
+        self.records = {}  # query -> {"version", "fingerprint", "answer"}
+        self.ready = False
+        self.error = None  # why the last run failed, if it did
+        self.runs = 0
+        self.last_run = {}
+        self._lock = threading.Lock()
+        # A reload during the startup warm-up waits for it rather than generating the same answers twice
+        self._run_lock = threading.Lock()
+
+    def top_queries(self):
+        """The top_n most frequent logged queries, or the seed queries when nothing is logged."""
+        if self.log_path and os.path.exists(self.log_path):
+            counts = Counter(read_queries(self.log_path))
+            if counts:
+                return [query for query, _ in counts.most_common(self.top_n)]
+        if self.seed_path and os.path.exists(self.seed_path):
+            with open(self.seed_path, 'r') as f:
+                return [item['query'] for item in json.load(f)][:self.top_n]
+        return []
+
+    def _fingerprint(self, hits, catalog):
+        return [(tea['id'], catalog.embedding_key(tea['id'])) for tea, _ in hits]
+
+    def _warm_one(self, query):
+        """Warms one query's cached answer; returns what was done."""
+        pipeline = self.pipeline
+        if self.router is not None and self.router.route(query)[0] != "rag":
+            # Retrieval-only and full-inventory answers are not cached; the embedding is enough
+            return "embedded"
+        # Fingerprint, answer and cache entry all belong to the one version pinned here
+        with pipeline.index.use() as snapshot:
+            version = snapshot.version
+            hits = pipeline.candidates(query, snapshot=snapshot)
+            fingerprint = self._fingerprint(hits, snapshot.catalog)
+            with self._lock:
+                record = self.records.get(query)
+            if record is not None and record["fingerprint"] == fingerprint:
+                if record["version"] == version:
+                    return "current"
+                pipeline.semantic_cache.put(pipeline.embed_query(query), list(record["answer"]), version, mode=True)
+                record["version"] = version
+                return "carried"
+            tea_ids, degraded = pipeline.recommend_within(query, Deadline.from_ms(self.budget_ms), snapshot=snapshot)
+        if degraded is not None:
+            print(f"Cache warm-up could not answer '{query}' ({degraded})")
+            return "failed"
+        with self._lock:
+            self.records[query] = {"version": version, "fingerprint": fingerprint, "answer": list(tea_ids)}
+        return "generated"
+
+    def warm(self):
+        """Warms the caches for the current catalog version; returns counts of what was done per query."""
+        with self._run_lock:
+            return self._warm()
+
+    def _warm(self):
+        start = time.perf_counter()
+        queries = []
+        counts = Counter()
+        error = None
+        try:
+            queries = self.top_queries()
+            if queries and self.pipeline.embedder is not None:
+                # One batched call fills the query-embedding cache for every query
+                self.pipeline.embed_queries(queries)
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cache-warm") as executor:
+                    for outcome in executor.map(self._safe_warm_one, queries):
+                        counts[outcome] += 1
+                with self._lock:
+                    # Queries that fell out of the top list are not tracked any more
+                    self.records = {query: self.records[query] for query in queries if query in self.records}
+                if counts["failed"] == len(queries):
+                    error = f"all {len(queries)} queries failed"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.runs += 1
+        self.last_run = dict(counts, queries=len(queries), ms=round((time.perf_counter() - start) * 1000, 1),
+                             catalog_version=self.pipeline.catalog_version,
+                             answers_cached=self.pipeline.semantic_cache.enabled)
+        self.error = error
+        if error is None:
+            self.ready = True
+            print(f"Cache warm-up: {self.last_run}")
+        else:
+            self.last_run["error"] = error
+            print(f"Cache warm-up failed ({error}): {self.last_run}")
+        return self.last_run
+
+    def _safe_warm_one(self, query):
+        try:
+            if not self.pipeline.semantic_cache.enabled:
+                # Only the router's classifier and the embedding cache to warm
+                if self.router is not None:
+                    self.router.route(query)
+                return "embedded"
+            return self._warm_one(query)
+        except Exception as e:
+            print(f"Cache warm-up failed for '{query}': {e}")
+            return "failed"
+
+    def metrics(self):
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "runs": self.runs,
+            "tracked": len(self.records),
+            "last_run": self.last_run
+        }
@@ -0,0 +1,178 @@
+import os
+import threading
+from contextlib import contextmanager
+
+
+class TeaCatalog:
+    """Column-oriented tea catalog with an id -> row index.
+
+    Each field is one list indexed by row, and embeddings are never stored
+    here (they live in the vector index). Query paths work with row numbers
+    and only hydrate() the handful of rows they return.
+    """
+
+    FIELDS = ('id', 'name', 'type', 'flavors', 'description', 'caffeine')
+
+    def __init__(self):
+        self.columns = {field: [] for field in self.FIELDS}
+        self.embedding_keys = []  # embedding key of each row's indexed document
+        self.snippets = []  # each row's rendered RAG context snippet, cached at index time
+        self.extras = {}  # row -> fields outside FIELDS, for the rare tea that has them
+        self.row_of = {}
+
+    def append(self, tea, embedding_key=None, snippet=None):
+        row = len(self.row_of)
+        self.row_of[tea['id']] = row
+        for field in self.FIELDS:
+            value = tea.get(field)
+            self.columns[field].append(tuple(value) if field == 'flavors' else value)
+        self.embedding_keys.append(embedding_key)
+        self.snippets.append(snippet)
+        extra = {k: v for k, v in tea.items() if k not in self.FIELDS and k not in ('embedding', 'embedding_key')}
+        if extra:
+            self.extras[row] = extra
+        return row
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def __contains__(self, tea_id):
+        return tea_id in self.row_of
+
+    @property
+    def ids(self):
+        return self.columns['id']
+
+    def embedding_key(self, tea_id):
+        row = self.row_of.get(tea_id)
+        return self.embedding_keys[row] if row is not None else None
+
+    def snippet(self, tea_id):
+        row = self.row_of.get(tea_id)
+        return self.snippets[row] if row is not None else None
+
+    def hydrate(self, row):
+        """Builds the dict view of one row."""
+        tea = {field: self.columns[field][row] for field in self.FIELDS}
+        tea['flavors'] = list(tea['flavors'])
+        if row in self.extras:
+            tea.update(self.extras[row])
+        return tea
+
+    def get(self, tea_id):
+        row = self.row_of.get(tea_id)
+        return self.hydrate(row) if row is not None else None
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.hydrate(row)
+
+
+class IndexVersion:
+    """An immutable snapshot of the catalog and the indexes built from it."""
+
+    def __init__(self, version, catalog, index=None, suggestions=None):
+        self.version = version
+        self.catalog = catalog
+        self.index = index
+        self.suggestions = suggestions
+        self.in_flight = 0
+        self.retired = False
+
+
+class VersionedIndex:
+    """Holds the live IndexVersion and swaps in new ones atomically.
+
+    Requests pin the version they started on via use(), so a reload never
+    pulls an index out from under an in-flight query. Retired versions are
+    handed to on_retire once their last request has finished.
+    Every stage of a request reads the same pinned snapshot: use(snapshot)
+    with a snapshot the caller already holds yields it as is.
+    """
+
+    def __init__(self, on_retire=None):
+        self._lock = threading.Lock()
+        self._current = None
+        self._on_retire = on_retire
+
+    @property
+    def current(self):
+        return self._current
+
+    @contextmanager
+    def use(self, snapshot=None):
+        if snapshot is not None:
+            # Already pinned by the caller, which also releases it
+            yield snapshot
+            return
+        with self._lock:
+            snapshot = self._current
+            if snapshot is None:
+                raise RuntimeError("Index has not been built yet.")
+            snapshot.in_flight += 1
+        try:
+            yield snapshot
+        finally:
+            with self._lock:
+                snapshot.in_flight -= 1
+                drop = snapshot.retired and snapshot.in_flight == 0
+            if drop:
+                self._retire(snapshot)
+
+    def publish(self, snapshot):
+        with self._lock:
+            previous = self._current
+            self._current = snapshot
+            drop = False
+            if previous is not None:
+                previous.retired = True
+                drop = previous.in_flight == 0
+        if drop:
+            self._retire(previous)
+
+    def _retire(self, snapshot):
+        if self._on_retire is not None:
+            self._on_retire(snapshot)
+
+
+class CatalogWatcher:
+    """Polls catalog files and calls on_change when any of them is modified."""
+
+    def __init__(self, paths, on_change, interval=None):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = float(interval) if interval is not None else float(os.getenv("CATALOG_WATCH_INTERVAL", "30"))
+        self._mtimes = self._snapshot()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _snapshot(self):
+        return {p: os.path.getmtime(p) if os.path.exists(p) else None for p in self.paths}
+
+    def check(self):
+        """Returns True (and fires on_change) if a watched file changed since the last check."""
+        mtimes = self._snapshot()
+        if mtimes == self._mtimes:
+            return False
+        self._mtimes = mtimes
+        try:
+            self.on_change()
+        except Exception as e:
+            print(f"Catalog reload failed: {e}")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,91 @@
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text):
+    """Approximate token count (~4 characters per token for English BPE vocabularies)."""
+    return (len(text) + 3) // 4
+
+
+def trim_description(description, max_tokens):
+    """Keeps whole leading sentences within max_tokens, cutting the first one at a word if it alone is too long."""
+    kept = ""
+    for sentence in SENTENCE_END.split(description.strip()):
+        candidate = f"{kept} {sentence}".strip()
+        if count_tokens(candidate) > max_tokens:
+            break
+        kept = candidate
+    if kept:
+        return kept
+    words = description.split()
+    while words and count_tokens(" ".join(words) + "...") > max_tokens:
+        words.pop()
+    return " ".join(words) + "..." if words else ""
+
+
+def distinct_flavors(tea, mentioned=""):
+    """Flavors without case-insensitive repeats or ones the name, type or mentioned text already say."""
+    said = set(re.findall(r"[\w-]+", f"{tea['name']} {tea['type']} {mentioned}".lower()))
+    flavors = []
+    for flavor in tea['flavors']:
+        key = flavor.lower()
+        if key not in said:
+            said.add(key)
+            flavors.append(flavor)
+    return flavors
+
+
+class ContextBuilder:
+    """Assembles RAG context under a token budget.
+
+    Each tea is rendered once, at index time, into a full snippet (description
+    trimmed to description_tokens, flavors the text already mentions dropped)
+    and a compact one (name, type, flavors). build() adds hits best first,
+    falling back to the compact snippet when the full one no longer fits, and
+    stops at the budget, so prompt size stays bounded however large
+    RETRIEVAL_N is.
+    """
+
+    def __init__(self, budget=None, description_tokens=None):
+        self.budget = int(budget) if budget is not None else int(os.getenv("CONTEXT_TOKEN_BUDGET", "512"))
+        self.description_tokens = int(description_tokens) if description_tokens is not None else int(os.getenv("CONTEXT_DESCRIPTION_TOKENS", "48"))
+
+    def render(self, tea):
+        """Returns (full, full_tokens, compact, compact_tokens) for one tea, without the list label."""
+        description = trim_description(tea['description'] or "", self.description_tokens)
+        flavors = distinct_flavors(tea, description)
+        full = f"{tea['name']} ({tea['type']}): {description}"
+        if flavors:
+            full += f" (Flavors: {', '.join(flavors)})"
+        compact = f"{tea['name']} ({tea['type']}) (Flavors: {', '.join(distinct_flavors(tea))})"
+        return full, count_tokens(full), compact, count_tokens(compact)
+
+    def build(self, hits, snippet_of=None, show_id=False):
+        """Returns (context, included_hits) for hits in rank order.
+
+        snippet_of(tea) returns the snippet cached at index time (or None to
+        render now). The top hit is always included, compacted if need be.
+        """
+        lines = []
+        included = []
+        used = 0
+        for tea, score in hits:
+            snippet = (snippet_of(tea) if snippet_of else None) or self.render(tea)
+            full, full_tokens, compact, compact_tokens = snippet
+            label = f"- [{tea['id']}] " if show_id else "- "
+            label_tokens = count_tokens(label)
+            if used + label_tokens + full_tokens <= self.budget:
+                text, tokens = full, full_tokens
+            elif used + label_tokens + compact_tokens <= self.budget or not lines:
+                text, tokens = compact, compact_tokens
+            else:
+                break
+            lines.append(f"{label}{text}\n")
+            included.append((tea, score))
+            used += label_tokens + tokens
+        return "".join(lines), included
@@ -0,0 +1,168 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request has no time left for the next stage."""
+
+
+class Deadline:
+    """A per-request latency budget carried through embedding, retrieval and generation."""
+
+    def __init__(self, budget_seconds, started=None):
+        self.budget = float(budget_seconds)
+        # started (a time.monotonic() value) backdates the budget, e.g. to when the request arrived
+        self.expires_at = (started if started is not None else time.monotonic()) + self.budget
+
+    @classmethod
+    def from_ms(cls, budget_ms, started=None):
+        return cls(budget_ms / 1000.0, started)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap=None):
+        """Seconds to pass as an HTTP timeout for the next call; raises if none are left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        return min(remaining, cap) if cap is not None else remaining
+
+
+def is_timeout(error):
+    """True for deadline, socket and HTTP-client timeouts (requests.Timeout, openai.APITimeoutError, ...)."""
+    return isinstance(error, (DeadlineExceeded, TimeoutError)) or "Timeout" in type(error).__name__
+
+
+def call_timeout(deadline, default):
+    """The HTTP timeout for a call: what the deadline leaves, or the client default without one."""
+    return deadline.timeout() if deadline is not None else default
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures and half-opens after reset_after seconds."""
+
+    def __init__(self, failure_threshold=None, reset_after=None):
+        self.failure_threshold = int(failure_threshold) if failure_threshold is not None else int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+        self.reset_after = float(reset_after) if reset_after is not None else float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+
+class GenerationGuard:
+    """Decides whether a request can afford an LLM generation right now.
+
+    Generation is refused (and the caller should degrade) when the circuit
+    breaker is open, when max_concurrent generations are already running, or
+    when the deadline has less time left than a typical generation takes
+    (an exponential moving average of recent successful generations).
+    Background work (batch jobs) shares the same slots at a lower priority
+    through admit_background().
+    """
+
+    def __init__(self, max_concurrent=None, latency_estimate=None, breaker=None):
+        self.max_concurrent = int(max_concurrent) if max_concurrent is not None else int(os.getenv("MAX_CONCURRENT_GENERATIONS", "4"))
+        self.latency_estimate = float(latency_estimate) if latency_estimate is not None else float(os.getenv("GENERATION_LATENCY_ESTIMATE", "2.0"))
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._background = 0
+        self.degraded = {}
+
+    def admit(self, deadline=None):
+        """Reserves a generation slot; returns None if admitted, otherwise the reason to degrade."""
+        if not self.breaker.allow():
+            return self._refuse("circuit_open")
+        if deadline is not None and deadline.remaining() < self.latency_estimate:
+            return self._refuse("deadline")
+        with self._lock:
+            if self._in_flight >= self.max_concurrent:
+                reason = "saturated"
+            else:
+                self._in_flight += 1
+                return None
+        return self._refuse(reason)
+
+    def admit_background(self, reserve=1):
+        """Reserves a slot for background (batch) work, which yields to requests.
+
+        Background work never takes the last `reserve` slots (though it may
+        always have one), and waits for a slot instead of being refused as
+        saturated. Returns None once admitted, or "circuit_open".
+        """
+        limit = max(1, self.max_concurrent - reserve)
+        with self._lock:
+            while True:
+                if not self.breaker.allow():
+                    break
+                if self._in_flight < limit:
+                    self._in_flight += 1
+                    self._background += 1
+                    return None
+                # Woken by every release; the timeout re-checks the breaker while waiting
+                self._slot_freed.wait(1.0)
+        return self._refuse("circuit_open")
+
+    def release_background(self, elapsed, ok):
+        with self._lock:
+            self._background -= 1
+        self.release(elapsed, ok)
+
+    def _refuse(self, reason):
+        with self._lock:
+            self.degraded[reason] = self.degraded.get(reason, 0) + 1
+        return reason
+
+    def release(self, elapsed, ok):
+        with self._lock:
+            self._in_flight -= 1
+            self._slot_freed.notify()
+            if ok:
+                self.latency_estimate = 0.8 * self.latency_estimate + 0.2 * elapsed
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "background": self._background,
+                "latency_estimate_s": round(self.latency_estimate, 3),
+                "breaker": self.breaker.state,
+                "degraded": dict(self.degraded)
+            }
@@ -0,0 +1,265 @@
+import os
+import time
+import hashlib
+import numpy as np
+from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from agent.ollama_pool import get_pool
+from agent.openai_scheduler import get_scheduler
+from agent.context import count_tokens
+from agent.deadline import Deadline, call_timeout
+
+load_dotenv()
+
+
+def embedding_key(model, text):
+    """Identifies an embedding by the model and the exact text that was embedded."""
+    return hashlib.sha1(f"{model}\n{text}".encode('utf-8')).hexdigest()
+
+
+class OllamaEmbeddingProvider:
+    """Embeds text with a local Ollama server.
+
+    nomic-embed-text expects instructional prefixes, so queries and documents
+    are embedded as "search_query: ..." and "search_document: ..." by default.
+    url may be a comma-separated list of servers (see OllamaPool); with
+    OLLAMA_HEDGE=1 slow embedding calls are hedged to a second server.
+    """
+
+    def __init__(self, url=None, model=None, query_prefix=None, document_prefix=None, batch_size=None, hedge=None):
+        self.pool = get_pool(url)
+        self.url = self.pool.url
+        self.model = model or os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
+        self.query_prefix = query_prefix if query_prefix is not None else os.getenv("OLLAMA_QUERY_PREFIX", "search_query: ")
+        self.document_prefix = document_prefix if document_prefix is not None else os.getenv("OLLAMA_DOCUMENT_PREFIX", "search_document: ")
+        self.batch_size = int(batch_size) if batch_size is not None else int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+        self.timeout = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+        self.hedge = hedge if hedge is not None else os.getenv("OLLAMA_HEDGE", "0") == "1"
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+    def _embed(self, texts, timeout=None):
+        response = self.pool.post(
+            "/api/embed",
+            {"model": self.model, "input": texts, "keep_alive": self.keep_alive},
+            timeout=timeout or self.timeout,
+            hedge=self.hedge
+        )
+        return response["embeddings"]
+
+    def embed_query(self, text, timeout=None):
+        return self._embed([self.query_prefix + text], timeout)[0]
+
+    def embed_queries(self, texts):
+        """Embeds many queries in batches of batch_size per request."""
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(self._embed([self.query_prefix + text for text in texts[start:start + self.batch_size]]))
+        return embeddings
+
+    def embed_documents(self, texts):
+        """Embeds documents in batches of batch_size per request."""
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = [self.document_prefix + text for text in texts[start:start + self.batch_size]]
+            embeddings.extend(self._embed(batch))
+        return embeddings
+
+    def document_key(self, text):
+        return embedding_key(self.model, self.document_prefix + text)
+
+
+class OpenAIEmbeddingProvider:
+    """Embeds text with the OpenAI embeddings API.
+
+    Calls go through the shared OpenAIScheduler, which paces them against
+    OPENAI_RPM / OPENAI_TPM and retries 429s. Documents are packed into
+    requests of up to batch_size inputs and the scheduler's per-request token
+    share, and up to `concurrency` requests run in parallel.
+    """
+
+    def __init__(self, client=None, model="text-embedding-ada-002", batch_size=None, concurrency=None, scheduler=None):
+        if client is None:
+            from openai import OpenAI
+            # Retries are the scheduler's job, so they back off with every other caller
+            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        self.client = client
+        self.model = model
+        # The API accepts up to 2048 inputs per request
+        self.batch_size = int(batch_size) if batch_size is not None else int(os.getenv("OPENAI_EMBEDDING_BATCH_SIZE", "2048"))
+        self.concurrency = int(concurrency) if concurrency is not None else int(os.getenv("OPENAI_CONCURRENCY", "4"))
+        self.scheduler = scheduler or get_scheduler()
+        self.timeout = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+    def _embed(self, texts, timeout=None):
+        texts = [text.replace("\n", " ") for text in texts]
+        # A query's timeout is its remaining budget: waiting for the rate limits spends it too
+        deadline = Deadline(timeout) if timeout else None
+        response = self.scheduler.call(
+            lambda: self.client.embeddings.create(input=texts, model=self.model, timeout=call_timeout(deadline, self.timeout)),
+            sum(count_tokens(text) for text in texts),
+            deadline
+        )
+        return [item.embedding for item in response.data]
+
+    def embed_query(self, text, timeout=None):
+        return self._embed([text], timeout)[0]
+
+    def embed_queries(self, texts):
+        # Queries and documents are embedded the same way
+        return self.embed_documents(texts)
+
+    def _pack(self, texts):
+        """Splits texts into request-sized batches by input count and estimated tokens."""
+        limit = self.scheduler.request_token_limit(self.concurrency)
+        batches, batch, tokens = [], [], 0
+        for text in texts:
+            size = count_tokens(text)
+            if batch and (len(batch) >= self.batch_size or tokens + size > limit):
+                batches.append(batch)
+                batch, tokens = [], 0
+            batch.append(text)
+            tokens += size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def embed_documents(self, texts):
+        """Embeds documents in packed batches, up to concurrency requests at a time, preserving order."""
+        batches = self._pack(texts)
+        if len(batches) <= 1:
+            return self._embed(batches[0]) if batches else []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(self._embed, batches))
+        return [embedding for batch in results for embedding in batch]
+
+    def document_key(self, text):
+        return embedding_key(self.model, text.replace("\n", " "))
+
+
+class OnnxEmbeddingProvider:
+    """Embeds text in-process with an ONNX export of the embedding model (CPU).
+
+    Removes the HTTP hop from the query path. `model` names the model whose
+    vectors this export reproduces (default nomic-embed-text, the Ollama
+    embedding model) and the same query/document prefixes are applied, so
+    document keys match and the stored Ollama catalog embeddings are reused.
+    verify() checks that claim against a sample of stored vectors whose
+    embedding_key matches (rows embedded from other text prove nothing).
+
+    Token embeddings are mean-pooled over the attention mask and normalized.
+    Document batches are sorted by length to limit padding and run on
+    `workers` threads; onnxruntime releases the GIL while it runs.
+    """
+
+    def __init__(self, model_path=None, tokenizer_path=None, model=None, query_prefix=None, document_prefix=None,
+                 batch_size=None, workers=None, max_length=None, warmup=None):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ImportError("EMBEDDING_PROVIDER=onnx needs the onnxruntime and tokenizers packages")
+        self.model_path = model_path or os.getenv("ONNX_MODEL_PATH", "models/nomic-embed-text/model.onnx")
+        tokenizer_path = tokenizer_path or os.getenv(
+            "ONNX_TOKENIZER_PATH", os.path.join(os.path.dirname(self.model_path), "tokenizer.json")
+        )
+        for path in (self.model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"ONNX embedding model file not found: {path}")
+        self.model = model or os.getenv("ONNX_EMBEDDING_MODEL", os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text"))
+        self.query_prefix = query_prefix if query_prefix is not None else os.getenv("OLLAMA_QUERY_PREFIX", "search_query: ")
+        self.document_prefix = document_prefix if document_prefix is not None else os.getenv("OLLAMA_DOCUMENT_PREFIX", "search_document: ")
+        self.batch_size = int(batch_size) if batch_size is not None else int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+        self.workers = int(workers) if workers is not None else int(os.getenv("ONNX_WORKERS", "2"))
+        self.max_length = int(max_length) if max_length is not None else int(os.getenv("ONNX_MAX_LENGTH", "512"))
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(self.max_length)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        # Threads per inference call; parallelism across batches comes from `workers`
+        options.intra_op_num_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "2"))
+        self.session = onnxruntime.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="onnx-embed")
+        self.url = f"onnx://{self.model_path}"
+        self.warm_up_ms = None
+        if warmup if warmup is not None else os.getenv("ONNX_WARMUP", "1") == "1":
+            self.warm_up()
+
+    def _run(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        output = self.session.run(None, feeds)[0]
+        if output.ndim == 3:
+            # Mean pooling over real (unpadded) tokens
+            mask = attention_mask[:, :, None].astype(np.float32)
+            output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        output = output / np.maximum(np.linalg.norm(output, axis=1, keepdims=True), 1e-12)
+        return output.astype(np.float32).tolist()
+
+    def _embed_many(self, texts):
+        """Embeds texts in length-sorted batches on the worker threads, preserving order."""
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+        embeddings = [None] * len(texts)
+        for batch, results in zip(batches, self.executor.map(lambda b: self._run([texts[i] for i in b]), batches)):
+            for i, embedding in zip(batch, results):
+                embeddings[i] = embedding
+        return embeddings
+
+    def warm_up(self):
+        """Runs a query and a full batch once so session setup and arena allocation happen before traffic."""
+        start = time.perf_counter()
+        self._run([self.query_prefix + "warm up"])
+        self._embed_many([self.document_prefix + "warm up"] * self.batch_size)
+        self.warm_up_ms = (time.perf_counter() - start) * 1000
+        print(f"Warmed up ONNX embedding model {self.model_path} in {self.warm_up_ms:.0f}ms.")
+
+    def embed_query(self, text, timeout=None):
+        # In-process: no network call, so there is nothing for a timeout to bound
+        return self._run([self.query_prefix + text])[0]
+
+    def embed_queries(self, texts):
+        return self._embed_many([self.query_prefix + text for text in texts])
+
+    def embed_documents(self, texts):
+        return self._embed_many([self.document_prefix + text for text in texts])
+
+    def document_key(self, text):
+        return embedding_key(self.model, self.document_prefix + text)
+
+    def verify(self, documents, stored_embeddings, min_cosine=None):
+        """Re-embeds documents and compares them with their stored vectors.
+
+        Raises ValueError if any pair has cosine similarity below min_cosine
+        (ONNX_MIN_COSINE, default 0.98): the export does not reproduce the
+        model the catalog was embedded with. Returns the lowest similarity.
+        """
+        min_cosine = float(min_cosine) if min_cosine is not None else float(os.getenv("ONNX_MIN_COSINE", "0.98"))
+        fresh = np.asarray(self.embed_documents(documents), dtype=np.float32)
+        stored = np.asarray(stored_embeddings, dtype=np.float32)
+        if fresh.shape != stored.shape:
+            raise ValueError(f"ONNX model produces {fresh.shape[1]}-dim vectors; stored embeddings have {stored.shape[1]}")
+        stored = stored / np.maximum(np.linalg.norm(stored, axis=1, keepdims=True), 1e-12)
+        lowest = float((fresh * stored).sum(axis=1).min())
+        if lowest < min_cosine:
+            raise ValueError(
+                f"ONNX embeddings differ from the stored {self.model} embeddings (cosine {lowest:.3f} < {min_cosine})"
+            )
+        return lowest
+
+
+def local_embedding_provider():
+    """The embedder for the Ollama agents: EMBEDDING_PROVIDER=onnx runs the same model in-process instead."""
+    provider = os.getenv("EMBEDDING_PROVIDER", "ollama").lower()
+    if provider == "onnx":
+        return OnnxEmbeddingProvider()
+    if provider == "ollama":
+        return OllamaEmbeddingProvider()
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider}")
@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import math
+from dotenv import load_dotenv
+from agent.ollama_pool import get_pool
+from agent.openai_scheduler import get_scheduler
+from agent.context import count_tokens
+from agent.deadline import Deadline, call_timeout
+
+load_dotenv()
+
+
+class OllamaGenerator:
+    """Generates completions with Ollama's /api/generate, spread over an OllamaPool."""
+
+    def __init__(self, url=None, model=None, temperature=0):
+        self.pool = get_pool(url)
+        self.url = self.pool.url
+        self.model = model or os.getenv("OLLAMA_MODEL", "gpt-oss:20b")
+        self.temperature = temperature
+        self.timeout = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+        # How long Ollama keeps the model loaded after each request
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        # Reasoning models (gpt-oss) spend num_predict on their thinking before the answer
+        self.reasoning_tokens = int(os.getenv("OLLAMA_REASONING_TOKENS", "1024"))
+        # Rerank scoring is one digit per candidate; it can run on a smaller, non-reasoning model
+        self.score_model = os.getenv("RERANK_MODEL") or self.model
+        self._warned_thinking = False
+
+    def generate(self, system, prompt, timeout=None):
+        response = self.pool.post(
+            "/api/generate",
+            {
+                "model": self.model,
+                "system": system,
+                "prompt": prompt,
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": {
+                    "temperature": self.temperature
+                }
+            },
+            timeout=timeout or self.timeout
+        )
+        return response["response"]
+
+    def generate_json(self, system, prompt, schema, max_tokens, timeout=None):
+        """Generates a JSON object constrained to schema, stopping after max_tokens (plus reasoning_tokens)."""
+        response = self.pool.post(
+            "/api/generate",
+            {
+                "model": self.model,
+                "system": system,
+                "prompt": prompt,
+                "format": schema,
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": {
+                    "temperature": self.temperature,
+                    "num_predict": max_tokens + self.reasoning_tokens
+                }
+            },
+            timeout=timeout or self.timeout
+        )
+        return json.loads(response["response"])
+
+    def generate_score(self, system, prompt, timeout=None):
+        """Generates a 0-9 digit with score_model and returns it scaled to 0..1 (0 if the model strays).
+
+        Thinking is turned off and the answer capped at two tokens (a leading
+        space may take one), so a score costs a couple of output tokens.
+        Models that cannot stop thinking (gpt-oss) spend the cap on reasoning
+        and score 0; RERANK_MODEL should then name a non-reasoning model.
+        """
+        response = self.pool.post(
+            "/api/generate",
+            {
+                "model": self.score_model,
+                "system": system,
+                "prompt": prompt,
+                "think": False,
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": {
+                    "temperature": 0,
+                    "num_predict": 2
+                }
+            },
+            timeout=timeout or self.timeout
+        )
+        digit = re.search(r"\d", response["response"])
+        if digit is None and response.get("thinking") and not self._warned_thinking:
+            self._warned_thinking = True
+            print(f"{self.score_model} keeps thinking with think=false; set RERANK_MODEL to a non-reasoning model.")
+        return int(digit.group()) / 9 if digit else 0.0
+
+
+class OpenAIGenerator:
+    """Generates completions with the OpenAI chat completions API, paced by the shared OpenAIScheduler."""
+
+    def __init__(self, client=None, model="gpt-3.5-turbo", temperature=0, structured_model=None, scheduler=None):
+        if client is None:
+            from openai import OpenAI
+            # Retries are the scheduler's job, so they back off with every other caller
+            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        self.client = client
+        self.model = model
+        self.temperature = temperature
+        # JSON-schema response formats need a model that supports Structured Outputs
+        self.structured_model = structured_model or os.getenv("OPENAI_STRUCTURED_MODEL", "gpt-4o-mini")
+        self.scheduler = scheduler or get_scheduler()
+        # Reserved for completions without a max_tokens cap, until usage corrects it
+        self.completion_estimate = int(os.getenv("OPENAI_COMPLETION_ESTIMATE", "256"))
+        self.timeout = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+    def _complete(self, system, prompt, timeout, completion_tokens, **kwargs):
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+        # A request's timeout is its remaining budget: waiting for the rate limits spends it too
+        deadline = Deadline(timeout) if timeout else None
+        return self.scheduler.call(
+            lambda: self.client.chat.completions.create(messages=messages, timeout=call_timeout(deadline, self.timeout), **kwargs),
+            count_tokens(system) + count_tokens(prompt) + completion_tokens,
+            deadline
+        )
+
+    def generate(self, system, prompt, timeout=None):
+        response = self._complete(
+            system, prompt, timeout, self.completion_estimate,
+            model=self.model,
+            temperature=self.temperature
+        )
+        return response.choices[0].message.content
+
+    def generate_json(self, system, prompt, schema, max_tokens, timeout=None):
+        """Generates a JSON object constrained to schema, stopping after max_tokens."""
+        response = self._complete(
+            system, prompt, timeout, max_tokens,
+            model=self.structured_model,
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "tea_recommendation", "schema": schema, "strict": True}
+            },
+            max_tokens=max_tokens,
+            temperature=self.temperature
+        )
+        return json.loads(response.choices[0].message.content)
+
+    def generate_score(self, system, prompt, timeout=None):
+        """Generates a single 0-9 digit and returns its probability-weighted value scaled to 0..1."""
+        response = self._complete(
+            system, prompt, timeout, 1,
+            model=self.model,
+            max_tokens=1,
+            logprobs=True,
+            top_logprobs=10,
+            temperature=0
+        )
+        candidates = response.choices[0].logprobs.content[0].top_logprobs
+        weights = {}
+        for candidate in candidates:
+            token = candidate.token.strip()
+            if len(token) == 1 and token.isdigit():
+                weights[int(token)] = weights.get(int(token), 0.0) + math.exp(candidate.logprob)
+        total = sum(weights.values())
+        return sum(digit * weight for digit, weight in weights.items()) / (9 * total) if total else 0.0
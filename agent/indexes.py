@@ -0,0 +1,157 @@
+import os
+import numpy as np
+
+# Chroma HNSW collection settings and the environment variables that set them;
+# unset ones keep Chroma's defaults (M=16, construction_ef=100, search_ef=10)
+HNSW_PARAMS = {
+    "hnsw:M": "HNSW_M",
+    "hnsw:construction_ef": "HNSW_EF_CONSTRUCTION",
+    "hnsw:search_ef": "HNSW_EF_SEARCH",
+    "hnsw:batch_size": "HNSW_BATCH_SIZE",
+    "hnsw:sync_threshold": "HNSW_SYNC_THRESHOLD",
+    "hnsw:num_threads": "HNSW_NUM_THREADS"
+}
+
+
+def hnsw_metadata(overrides=None):
+    """Collection metadata for ChromaIndex: cosine space, HNSW_* settings from the environment, then overrides."""
+    metadata = {"hnsw:space": "cosine"}
+    for key, env in HNSW_PARAMS.items():
+        if os.getenv(env):
+            metadata[key] = int(os.getenv(env))
+    metadata.update(overrides or {})
+    return metadata
+
+
+class NumpyIndex:
+    """Exact cosine search over an in-memory embedding matrix."""
+
+    def __init__(self, name):
+        self.name = name
+        self.ids = []
+        self.rows = {}  # id -> row
+        self._matrix = None
+        self._size = 0
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._matrix[:self._size]
+
+    def add(self, ids, embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if len(vectors) == 0:
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+        needed = self._size + len(vectors)
+        if self._matrix is None:
+            self._matrix = np.empty((needed, vectors.shape[1]), dtype=np.float32)
+        elif needed > len(self._matrix):
+            # Grow geometrically so batch-by-batch building stays linear
+            grown = np.empty((max(needed, 2 * len(self._matrix)), vectors.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[self._size:needed] = vectors
+        for tea_id in ids:
+            self.rows[tea_id] = len(self.ids)
+            self.ids.append(tea_id)
+        self._size = needed
+
+    def count(self):
+        return len(self.ids)
+
+    def get_embeddings(self, ids):
+        return [self._matrix[self.rows[tea_id]] for tea_id in ids]
+
+    def search(self, query_embedding, k):
+        """Returns the ids and cosine similarities of the k closest entries."""
+        if not self.ids:
+            return [], []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self.matrix @ query
+        k = min(k, len(self.ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.ids[i] for i in top], [float(scores[i]) for i in top]
+
+    def search_batch(self, query_embeddings, k):
+        """search() for many queries with one matrix product; returns a list of (ids, scores)."""
+        if not self.ids:
+            return [([], []) for _ in query_embeddings]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = (self.matrix @ (queries / norms).T).T
+        k = min(k, len(self.ids))
+        results = []
+        for row, top in zip(scores, np.argpartition(-scores, k - 1, axis=1)[:, :k]):
+            top = top[np.argsort(-row[top])]
+            results.append(([self.ids[i] for i in top], [float(row[i]) for i in top]))
+        return results
+
+    def drop(self):
+        self.ids = []
+        self.rows = {}
+        self._matrix = None
+        self._size = 0
+
+
+class ChromaIndex:
+    """A ChromaDB collection using cosine distance.
+
+    HNSW construction and search parameters come from hnsw_metadata(): the
+    HNSW_* environment variables, overridden per index by `hnsw`
+    (e.g. {"hnsw:M": 32}). evaluation/hnsw_sweep.py measures the trade-offs.
+    """
+
+    def __init__(self, name, client=None, hnsw=None):
+        import chromadb
+        self.name = name
+        self.client = client or chromadb.Client()
+        self.collection = self.client.get_or_create_collection(
+            name=name,
+            metadata=hnsw_metadata(hnsw)
+        )
+
+    def add(self, ids, embeddings):
+        # Only ids and vectors are stored; tea fields are hydrated from the TeaCatalog
+        if ids:
+            # Vectors carried over from the previous version come back from Chroma as arrays,
+            # fresh ones as lists; Chroma rejects a batch mixing the two
+            self.collection.add(ids=list(ids), embeddings=np.asarray(embeddings, dtype=np.float32))
+
+    def count(self):
+        return self.collection.count()
+
+    def get_embeddings(self, ids):
+        results = self.collection.get(ids=list(ids), include=["embeddings"])
+        by_id = dict(zip(results['ids'], results['embeddings']))
+        return [by_id[tea_id] for tea_id in ids]
+
+    def search(self, query_embedding, k):
+        """Returns the ids and cosine similarities of the k closest entries."""
+        results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            include=["distances"]
+        )
+        # ChromaDB 'cosine' distance is 1 - similarity
+        return results['ids'][0], [1.0 - d for d in results['distances'][0]]
+
+    def search_batch(self, query_embeddings, k):
+        """search() for many queries in one collection query; returns a list of (ids, scores)."""
+        if not query_embeddings:
+            return []
+        results = self.collection.query(
+            query_embeddings=list(query_embeddings),
+            n_results=k,
+            include=["distances"]
+        )
+        return [(ids, [1.0 - d for d in distances]) for ids, distances in zip(results['ids'], results['distances'])]
+
+    def drop(self):
+        self.client.delete_collection(self.name)
@@ -0,0 +1,203 @@
+import os
+import json
+import textwrap
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def iter_catalog(path, chunk_size=65536):
+    """Yields teas one at a time from a JSON array or JSONL file without loading the whole file."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Data file not found: {path}")
+    if path.endswith('.jsonl'):
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        return
+
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buffer = ""
+        started = False
+        eof = False
+        while True:
+            buffer = buffer.lstrip()
+            if started:
+                buffer = buffer.lstrip(", \t\r\n")
+                if buffer.startswith("]"):
+                    return
+            if not buffer or (started and not eof and len(buffer) < chunk_size):
+                chunk = f.read(chunk_size)
+                if chunk:
+                    buffer += chunk
+                    continue
+                eof = True
+                if not buffer:
+                    raise ValueError(f"Unexpected end of catalog: {path}")
+            if not started:
+                if not buffer.startswith("["):
+                    raise ValueError(f"Catalog must be a JSON array: {path}")
+                buffer = buffer[1:]
+                started = True
+                continue
+            try:
+                tea, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            yield tea
+
+
+def batched(items, size):
+    """Groups an iterable into lists of at most size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    """Records how many catalog items have been durably written, and where the output ended."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {"items": 0, "offset": 0}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def save(self, items, offset):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"items": items, "offset": offset}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class EmbeddingLookup:
+    """A previous output's embeddings by tea id, without holding them in memory.
+
+    The previous output is streamed once: each embedding is copied to a JSONL
+    spill file, and only its tea id, embedding_key and byte offset stay in
+    memory. get() reads an embedding back from disk when its key still
+    matches, so reuse follows the tea wherever it moved in the catalog.
+    """
+
+    def __init__(self, path, spill_path):
+        self.spill_path = spill_path
+        self.offsets = {}  # tea id -> (embedding_key, offset in the spill file)
+        self._spill = None
+        if not os.path.exists(path):
+            return
+        with open(spill_path, 'wb') as spill:
+            for tea in iter_catalog(path):
+                key = tea.get('embedding_key')
+                if key is None or 'embedding' not in tea:
+                    continue
+                self.offsets[tea['id']] = (key, spill.tell())
+                spill.write((json.dumps(tea['embedding']) + "\n").encode('utf-8'))
+        self._spill = open(spill_path, 'rb')
+
+    def get(self, tea_id, key):
+        """The stored embedding for tea_id if it was computed under key, else None."""
+        entry = self.offsets.get(tea_id)
+        if entry is None or entry[0] != key:
+            return None
+        self._spill.seek(entry[1])
+        return json.loads(self._spill.readline())
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        if os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+
+def _render_row(tea, jsonl):
+    if jsonl:
+        return json.dumps(tea) + "\n"
+    # Same layout json.dump(..., indent=2) gives an array element
+    return textwrap.indent(json.dumps(tea, indent=2), "  ")
+
+
+def stream_embedded_catalog(embedder, render, out_path, data_path, batch_size=None):
+    """Embeds data_path into out_path batch by batch with bounded memory.
+
+    Rows go to out_path + ".partial" and a checkpoint is saved after each
+    batch, so a crashed run resumes after the last completed batch. A tea's
+    previous embedding is looked up by its id (see EmbeddingLookup) and
+    reused when its embedding_key still matches (i.e. the tea's text is
+    unchanged), so inserting, deleting or reordering teas only embeds the
+    teas that are new or changed. Returns (embedded, reused) counts for this run.
+    """
+    batch_size = int(batch_size) if batch_size is not None else int(os.getenv("INGEST_BATCH_SIZE", "256"))
+    jsonl = out_path.endswith('.jsonl')
+    partial_path = out_path + ".partial"
+    checkpoint = Checkpoint(out_path + ".checkpoint")
+    state = checkpoint.load() if os.path.exists(partial_path) else {"items": 0, "offset": 0}
+    done = state["items"]
+    if done:
+        print(f"Resuming from checkpoint after {done} teas.")
+
+    previous = EmbeddingLookup(out_path, out_path + ".previous")
+    catalog = iter_catalog(data_path)
+    for _ in range(done):
+        next(catalog, None)
+
+    embedded = reused = 0
+    try:
+        with open(partial_path, 'r+' if done else 'w') as out:
+            out.seek(state["offset"])
+            out.truncate()
+            if not done and not jsonl:
+                out.write("[\n")
+            for batch in batched(catalog, batch_size):
+                documents = [render(tea) for tea in batch]
+                keys = [embedder.document_key(doc) for doc in documents]
+                embeddings = [previous.get(tea['id'], key) for tea, key in zip(batch, keys)]
+                missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+                for i, embedding in zip(missing, embedder.embed_documents([documents[i] for i in missing])):
+                    embeddings[i] = embedding
+
+                rows = []
+                for tea, key, embedding in zip(batch, keys, embeddings):
+                    tea['embedding_key'] = key
+                    tea['embedding'] = embedding
+                    rows.append(_render_row(tea, jsonl))
+                separator = "" if jsonl else ",\n"
+                if done and not jsonl:
+                    out.write(separator)
+                out.write(separator.join(rows))
+                out.flush()
+                os.fsync(out.fileno())
+
+                done += len(batch)
+                embedded += len(missing)
+                reused += len(batch) - len(missing)
+                checkpoint.save(done, out.tell())
+            if not jsonl:
+                out.write("\n]")
+    finally:
+        previous.close()
+
+    os.replace(partial_path, out_path)
+    checkpoint.clear()
+    return embedded, reused
@@ -0,0 +1,98 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ModelWarmer:
+    """Keeps the Ollama generation and embedding models loaded on every pool endpoint.
+
+    warm_up() runs a one-token generation and a one-text embedding on each
+    endpoint; `ready` turns true once every model answered on at least one
+    endpoint. A background thread then sends a load-only request for each model
+    every `interval` seconds with keep_alive, so the models are never evicted
+    for being idle. Loads the keep-warm task had to do (the model had been
+    evicted anyway) are counted as warmup_loads on the pool; cold loads paid by
+    real requests show up as cold_loads.
+    """
+
+    def __init__(self, pool, generate_model=None, embed_model=None, keep_alive=None, interval=None):
+        self.pool = pool
+        self.generate_model = generate_model
+        self.embed_model = embed_model
+        self.keep_alive = keep_alive or os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self.interval = float(interval) if interval is not None else float(os.getenv("OLLAMA_KEEP_WARM_SECONDS", "240"))
+        self.timeout = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+        self.ready = False
+        self.warm_up_ms = None
+        self.refreshes = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _requests(self, load_only):
+        """(path, payload) per model: a tiny real call for warm-up, a load-only call to keep warm."""
+        calls = []
+        if self.generate_model:
+            payload = {"model": self.generate_model, "keep_alive": self.keep_alive, "stream": False}
+            # An empty prompt loads the model without generating
+            payload.update({"prompt": ""} if load_only else {"prompt": "Hi", "options": {"num_predict": 1}})
+            calls.append(("/api/generate", payload))
+        if self.embed_model:
+            calls.append(("/api/embed", {"model": self.embed_model, "input": ["warm up"], "keep_alive": self.keep_alive}))
+        return calls
+
+    def _run(self, load_only):
+        """Sends every model's call to every endpoint; returns the number of models answered somewhere."""
+        answered = 0
+        for path, payload in self._requests(load_only):
+            ok = False
+            for url, result in self.pool.post_each(path, payload, timeout=self.timeout):
+                if isinstance(result, Exception):
+                    self.failures += 1
+                    print(f"Could not warm {payload['model']} on {url}: {result}")
+                else:
+                    ok = True
+            answered += ok
+        return answered
+
+    def warm_up(self):
+        """Loads and exercises every model on every endpoint; returns whether all models answered."""
+        start = time.perf_counter()
+        models = len(self._requests(load_only=False))
+        self.ready = self._run(load_only=False) == models
+        self.warm_up_ms = (time.perf_counter() - start) * 1000
+        print(f"Model warm-up {'finished' if self.ready else 'incomplete'} in {self.warm_up_ms:.0f}ms.")
+        return self.ready
+
+    def _loop(self):
+        # Until the first warm-up succeeds, retry it; afterwards refresh keep_alive each interval
+        while not self._stop.is_set():
+            if not self.ready:
+                self.warm_up()
+            else:
+                self._run(load_only=True)
+                self.refreshes += 1
+            self._stop.wait(self.interval if self.ready else min(self.interval, 10))
+
+    def start(self):
+        """Warms up in the background, then keeps the models warm until stop()."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="model-warmer")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def metrics(self):
+        return {
+            "ready": self.ready,
+            "warm_up_ms": self.warm_up_ms,
+            "keep_alive": self.keep_alive,
+            "refreshes": self.refreshes,
+            "failures": self.failures
+        }
@@ -0,0 +1,114 @@
+import os
+import json
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+from agent.ingest import iter_catalog
+
+load_dotenv()
+
+
+def neighbors_path(embeddings_path):
+    """Where the neighbor graph for an embedded catalog is stored: next to it, as tea_neighbors.json."""
+    return os.path.join(os.path.dirname(embeddings_path), "tea_neighbors.json")
+
+
+def _spill_vectors(embeddings_path, vectors_path):
+    """Streams normalized embeddings into a float32 memmap; returns (ids, memmap)."""
+    ids = []
+    out = None
+    with open(vectors_path, 'wb') as f:
+        for tea in iter_catalog(embeddings_path):
+            vector = np.asarray(tea['embedding'], dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+            f.write(vector.tobytes())
+            ids.append(tea['id'])
+            dim = len(vector)
+    if ids:
+        out = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(len(ids), dim))
+    return ids, out
+
+
+def compute_neighbors(embeddings_path, out_path=None, k=None, block_size=None):
+    """Computes every tea's top-k cosine neighbors from the stored embeddings.
+
+    The embeddings are streamed to a memory-mapped matrix, then compared a
+    block_size x block_size tile at a time, keeping a running top-k per row,
+    so memory is bounded by the tile size rather than the catalog size.
+    Writes {"k": k, "neighbors": {id: [[neighbor_id, score], ...]}} to
+    out_path (default neighbors_path(embeddings_path)) and returns out_path.
+    """
+    k = int(k) if k is not None else int(os.getenv("NEIGHBORS_K", "10"))
+    block_size = int(block_size) if block_size is not None else int(os.getenv("NEIGHBORS_BLOCK_SIZE", "1024"))
+    out_path = out_path or neighbors_path(embeddings_path)
+    vectors_path = out_path + ".vectors"
+    try:
+        ids, vectors = _spill_vectors(embeddings_path, vectors_path)
+        n = len(ids)
+        k = min(k, max(n - 1, 0))
+        neighbors = {}
+        for start in range(0, n, block_size):
+            rows = np.asarray(vectors[start:start + block_size])
+            best_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+            best_ids = np.zeros((len(rows), k), dtype=np.int64)
+            for col in range(0, n, block_size):
+                scores = rows @ np.asarray(vectors[col:col + block_size]).T
+                if col == start:
+                    np.fill_diagonal(scores, -np.inf)  # a tea is not its own neighbor
+                # Merge this tile into the running top-k of each row
+                merged_scores = np.concatenate([best_scores, scores], axis=1)
+                merged_ids = np.concatenate([best_ids, np.broadcast_to(np.arange(col, col + scores.shape[1]), scores.shape)], axis=1)
+                top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k] if k else np.zeros((len(rows), 0), dtype=np.int64)
+                best_scores = np.take_along_axis(merged_scores, top, axis=1)
+                best_ids = np.take_along_axis(merged_ids, top, axis=1)
+            order = np.argsort(-best_scores, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            best_ids = np.take_along_axis(best_ids, order, axis=1)
+            for i, row in enumerate(range(start, start + len(rows))):
+                neighbors[ids[row]] = [[ids[j], round(float(s), 6)] for j, s in zip(best_ids[i], best_scores[i])]
+        del vectors
+    finally:
+        if os.path.exists(vectors_path):
+            os.remove(vectors_path)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"k": k, "source": os.path.basename(embeddings_path), "neighbors": neighbors}, f)
+    os.replace(tmp_path, out_path)
+    print(f"Wrote top-{k} neighbors for {n} teas to {out_path}.")
+    return out_path
+
+
+class NeighborGraph:
+    """The precomputed neighbor lists, served from a dict (no model or index calls)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._neighbors = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """(Re)loads the graph file; a missing file leaves the graph empty."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'r') as f:
+            neighbors = json.load(f)["neighbors"]
+        with self._lock:
+            self._neighbors = neighbors
+        print(f"Loaded neighbor graph for {len(neighbors)} teas from {self.path}.")
+        return True
+
+    def __len__(self):
+        return len(self._neighbors)
+
+    def __contains__(self, tea_id):
+        return tea_id in self._neighbors
+
+    def similar(self, tea_id, n=None):
+        """[(neighbor_id, score), ...] for tea_id, best first; None if the tea is not in the graph."""
+        entries = self._neighbors.get(tea_id)
+        if entries is None:
+            return None
+        return [(neighbor_id, score) for neighbor_id, score in entries[:n]]
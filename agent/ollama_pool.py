@@ -0,0 +1,246 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class Endpoint:
+    """One Ollama server plus the load and health state the pool routes on."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.cold_loads = 0  # requests that paid a model load (the model was not resident)
+        self.warmup_loads = 0  # model loads triggered by warm-up / keep-warm calls instead
+        self.latencies = {}  # path -> recent latencies in seconds
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.ejected_until
+
+    def metrics(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "cold_loads": self.cold_loads,
+            "warmup_loads": self.warmup_loads
+        }
+
+
+class OllamaPool:
+    """Spreads Ollama calls over several servers.
+
+    Each call goes to the healthy endpoint with the fewest outstanding
+    requests. An endpoint that fails with a connection error is ejected for
+    eject_seconds, and the call moves on to the next endpoint. With hedge=True
+    a duplicate request goes to a second endpoint if the first has not
+    answered within the recent p95 latency for that path, and whichever
+    answers first wins. Hedged calls (the primary and its duplicate) run on
+    their own executor of OLLAMA_HEDGE_WORKERS threads (default 4 per
+    endpoint) and only when a thread is free for each, so a duplicate never
+    queues behind the calls it races; otherwise the call goes out unhedged.
+    """
+
+    def __init__(self, urls, eject_seconds=None, hedge_min_samples=20):
+        self.endpoints = [Endpoint(url) for url in urls]
+        if not self.endpoints:
+            raise ValueError("OllamaPool needs at least one endpoint")
+        self.eject_seconds = float(eject_seconds) if eject_seconds is not None else float(os.getenv("OLLAMA_EJECT_SECONDS", "10"))
+        self.hedge_min_samples = hedge_min_samples
+        # A response whose load_duration exceeds this paid for loading the model
+        self.cold_load_ms = float(os.getenv("OLLAMA_COLD_LOAD_MS", "500"))
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(self.endpoints), thread_name_prefix="ollama-pool")
+        hedge_workers = int(os.getenv("OLLAMA_HEDGE_WORKERS") or 4 * len(self.endpoints))
+        self._hedge_executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="ollama-hedge")
+        self._hedge_slots = threading.BoundedSemaphore(hedge_workers)
+
+    @property
+    def url(self):
+        return self.endpoints[0].url
+
+    def _pick(self, exclude=()):
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude and e.healthy]
+            if not candidates:
+                # Everything is ejected: fall back to the remaining endpoints rather than failing outright
+                candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                return None
+            least = min(e.outstanding for e in candidates)
+            endpoint = random.choice([e for e in candidates if e.outstanding == least])
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _send(self, endpoint, path, payload, timeout, warmup=False):
+        start = time.monotonic()
+        try:
+            response = requests.post(f"{endpoint.url}{path}", json=payload, timeout=timeout)
+            response.raise_for_status()
+        except requests.ConnectionError:
+            with self._lock:
+                endpoint.errors += 1
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+            raise
+        except Exception:
+            with self._lock:
+                endpoint.errors += 1
+            raise
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+        data = response.json()
+        cold = isinstance(data, dict) and data.get("load_duration", 0) / 1e6 >= self.cold_load_ms
+        with self._lock:
+            endpoint.latencies.setdefault(path, deque(maxlen=200)).append(time.monotonic() - start)
+            if cold and warmup:
+                endpoint.warmup_loads += 1
+            elif cold:
+                endpoint.cold_loads += 1
+        if cold and not warmup:
+            print(f"Cold model load on {endpoint.url}{path}: {data['load_duration'] / 1e6:.0f}ms")
+        return data
+
+    def _post_once(self, path, payload, timeout, exclude=(), tried=None):
+        """Sends to the best endpoint, failing over to the others on connection errors.
+
+        Endpoints are appended to `tried` as they are picked, so a hedge can avoid them.
+        """
+        tried = tried if tried is not None else []
+        tried.extend(exclude)
+        while True:
+            endpoint = self._pick(exclude=tried)
+            if endpoint is None:
+                raise requests.ConnectionError(f"No Ollama endpoint reachable for {path}")
+            tried.append(endpoint)
+            try:
+                return self._send(endpoint, path, payload, timeout), endpoint
+            except requests.ConnectionError as e:
+                print(f"Ollama endpoint {endpoint.url} failed, ejecting for {self.eject_seconds}s: {e}")
+                if len(tried) >= len(self.endpoints):
+                    raise
+
+    def post_each(self, path, payload, timeout=None):
+        """POSTs payload to every endpoint in parallel (model warm-up); returns [(url, response or exception)]."""
+        def send(endpoint):
+            with self._lock:
+                endpoint.outstanding += 1
+                endpoint.requests += 1
+            try:
+                return endpoint.url, self._send(endpoint, path, payload, timeout, warmup=True)
+            except Exception as e:
+                return endpoint.url, e
+        return list(self._executor.map(send, self.endpoints))
+
+    def p95(self, path):
+        with self._lock:
+            samples = sorted(s for e in self.endpoints for s in e.latencies.get(path, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def _hedged_call(self, path, payload, timeout, exclude=(), tried=None):
+        try:
+            return self._post_once(path, payload, timeout, exclude, tried)
+        finally:
+            self._hedge_slots.release()
+
+    def post(self, path, payload, timeout=None, hedge=False):
+        """POSTs payload to path on the pool and returns the decoded JSON response."""
+        delay = self.p95(path) if hedge and len(self.endpoints) > 1 else None
+        if delay is None:
+            return self._post_once(path, payload, timeout)[0]
+
+        # The primary runs on the hedge executor too, with a slot of its own, so it starts at once
+        if not self._hedge_slots.acquire(blocking=False):
+            with self._lock:
+                self.hedges_skipped += 1
+            return self._post_once(path, payload, timeout)[0]
+        primary_tried = []
+        primary = self._hedge_executor.submit(self._hedged_call, path, payload, timeout, (), primary_tried)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()[0]
+        if not self._hedge_slots.acquire(blocking=False):
+            # Every hedge thread is busy: a backup would only queue, so wait for the primary
+            with self._lock:
+                self.hedges_skipped += 1
+            return primary.result()[0]
+        with self._lock:
+            self.hedged += 1
+        # The duplicate goes to a server the primary is not waiting on
+        backup = self._hedge_executor.submit(self._hedged_call, path, payload, timeout, list(primary_tried))
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()[0]
+                except Exception as e:
+                    error = e
+                    continue
+                if future is backup:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return result
+        raise error
+
+    def check_health(self):
+        """Actively probes every endpoint's /api/tags and updates ejection state."""
+        for endpoint in self.endpoints:
+            try:
+                requests.get(f"{endpoint.url}/api/tags", timeout=2).raise_for_status()
+                with self._lock:
+                    endpoint.ejected_until = 0.0
+            except Exception:
+                with self._lock:
+                    endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        return [e.metrics() for e in self.endpoints]
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "endpoints": [e.metrics() for e in self.endpoints],
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedges_skipped": self.hedges_skipped,
+                "cold_loads": sum(e.cold_loads for e in self.endpoints)
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(urls=None):
+    """Returns the process-wide pool for urls (default: OLLAMA_URLS, else OLLAMA_URL).
+
+    Embedding providers and generators pointed at the same servers share one
+    pool, so outstanding-request counts reflect all traffic to an endpoint.
+    """
+    if urls is None:
+        urls = os.getenv("OLLAMA_URLS") or os.getenv("OLLAMA_URL", "http://localhost:11434")
+    if isinstance(urls, str):
+        urls = [url.strip() for url in urls.split(",") if url.strip()]
+    key = tuple(url.rstrip("/") for url in urls)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = OllamaPool(key)
+        return _pools[key]
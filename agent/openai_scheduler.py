@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+from agent.deadline import DeadlineExceeded
+
+load_dotenv()
+
+# The embeddings API accepts at most this many tokens in one request
+MAX_EMBEDDING_REQUEST_TOKENS = 300000
+
+
+class TokenBucket:
+    """Holds up to per_minute units and refills continuously at per_minute / 60 per second."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount, now):
+        """Seconds until amount units are available (0 if they are now)."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        # May go negative when a response reports more usage than was reserved
+        self.level -= amount
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait in a 429 response, or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class OpenAIScheduler:
+    """Paces every OpenAI call in the process against the account's RPM and TPM limits.
+
+    A call reserves one request and its estimated tokens from two token
+    buckets, waiting until both have room; the estimate is corrected from the
+    response's reported usage. A 429 pauses all callers for the server's
+    Retry-After (or an exponential backoff) before the call is retried, so
+    concurrent workers back off together instead of hammering the limit.
+    A call with a deadline never waits past it: if the limits would hold it
+    longer than the deadline leaves, it raises DeadlineExceeded at once.
+    """
+
+    def __init__(self, rpm=None, tpm=None, max_retries=None):
+        self.rpm = int(rpm) if rpm is not None else int(os.getenv("OPENAI_RPM", "500"))
+        self.tpm = int(tpm) if tpm is not None else int(os.getenv("OPENAI_TPM", "1000000"))
+        self.max_retries = int(max_retries) if max_retries is not None else int(os.getenv("OPENAI_MAX_RETRIES", "6"))
+        self._requests = TokenBucket(self.rpm)
+        self._tokens = TokenBucket(self.tpm)
+        self._cond = threading.Condition()
+        self._paused_until = 0.0
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.rate_limited = 0
+        self.throttled = 0  # calls that had to wait for the limits
+        self.throttled_seconds = 0.0  # time those calls spent waiting
+        self.deadline_refused = 0
+
+    def request_token_limit(self, concurrency=1):
+        """Largest token reservation one of concurrency parallel requests should make."""
+        return max(1, min(MAX_EMBEDDING_REQUEST_TOKENS, self.tpm // max(1, concurrency)))
+
+    def _acquire(self, tokens, deadline=None):
+        waited_since = None
+        with self._cond:
+            self.queue_depth += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = max(
+                        self._paused_until - now,
+                        self._requests.wait_time(1, now),
+                        self._tokens.wait_time(tokens, now)
+                    )
+                    if wait <= 0:
+                        self._requests.take(1)
+                        self._tokens.take(tokens)
+                        self.in_flight += 1
+                        break
+                    if deadline is not None and wait >= deadline.remaining():
+                        self.deadline_refused += 1
+                        raise DeadlineExceeded(f"OpenAI rate limits need a {wait:.1f}s wait; the deadline leaves {deadline.remaining():.1f}s")
+                    if waited_since is None:
+                        waited_since = now
+                    self._cond.wait(wait)
+            finally:
+                self.queue_depth -= 1
+                if waited_since is not None:
+                    self.throttled += 1
+                    self.throttled_seconds += time.monotonic() - waited_since
+
+    def _release(self, reserved, used):
+        with self._cond:
+            self.in_flight -= 1
+            self.calls += 1
+            if used is not None:
+                self._tokens.take(used - reserved)
+            self._cond.notify_all()
+
+    def call(self, fn, tokens, deadline=None):
+        """Runs fn() once the limits allow a request of about `tokens` tokens, retrying rate-limit errors.
+
+        With a deadline, raises DeadlineExceeded instead of waiting longer than it leaves.
+        """
+        # Nothing larger than the bucket could ever be admitted
+        tokens = min(int(tokens), self.tpm)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens, deadline)
+            try:
+                response = fn()
+            except Exception as e:
+                self._release(tokens, None)
+                if getattr(e, "status_code", None) != 429 or attempt == self.max_retries:
+                    raise
+                delay = retry_after(e) or min(60.0, 2.0 ** attempt)
+                with self._cond:
+                    self.rate_limited += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                print(f"OpenAI rate limit hit, pausing {delay:.1f}s (retry {attempt + 1}/{self.max_retries}).")
+                continue
+            usage = getattr(getattr(response, "usage", None), "total_tokens", None)
+            self._release(tokens, usage)
+            return response
+
+    def metrics(self):
+        with self._cond:
+            now = time.monotonic()
+            self._requests.wait_time(0, now)
+            self._tokens.wait_time(0, now)
+            return {
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "rate_limited": self.rate_limited,
+                "throttled": self.throttled,
+                "throttled_s": round(self.throttled_seconds, 3),
+                "deadline_refused": self.deadline_refused,
+                "requests_available": int(self._requests.level),
+                "tokens_available": int(self._tokens.level)
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process-wide scheduler shared by every OpenAI embedding provider and generator."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = OpenAIScheduler()
+        return _scheduler
@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+import functools
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_local = threading.local()
+
+
+def active_session():
+    """The profiling session running on this thread, if the current request was sampled."""
+    return getattr(_local, "session", None)
+
+
+class ProfileSession:
+    """Stacks and per-stage allocations collected for one sampled request."""
+
+    def __init__(self, label, root_code, thread_id):
+        self.label = label
+        self.root_code = root_code
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.stages = {}  # stage -> [count, allocated bytes, peak bytes]
+
+    def sample(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            if code is not _wrapper_code:
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            if code is self.root_code:
+                break
+            frame = frame.f_back
+        # Frames above the profiled call (server, thread pool) are dropped
+        self.stacks[";".join([self.label] + names[::-1])] += 1
+
+    @contextmanager
+    def stage(self, name):
+        if not tracemalloc.is_tracing():
+            yield
+            return
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            totals = self.stages.setdefault(name, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += max(0, after - before)
+            totals[2] = max(totals[2], peak - before)
+
+
+class RequestProfiler:
+    """Samples a fraction of requests with a low-overhead stack sampler.
+
+    A sampled request is walked every interval_ms by a background thread
+    (sys._current_frames), and, with trace_memory, tracemalloc records the
+    bytes each pipeline stage allocates. Results accumulate across sampled
+    requests and are written to out_dir as collapsed stacks (one
+    "frame;frame;frame count" line per stack, the input format of
+    flamegraph.pl and speedscope) plus stages.json. sample_rate 0 turns
+    profiling off at the cost of one random() per request.
+
+    tracemalloc counts allocations from every thread, so allocation numbers
+    are exact only when sampled requests do not overlap (as in the offline
+    CLI mode); stack samples are always per request.
+    """
+
+    def __init__(self, sample_rate=None, interval_ms=None, out_dir=None, trace_memory=None):
+        self.sample_rate = float(sample_rate) if sample_rate is not None else float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.interval = (float(interval_ms) if interval_ms is not None else float(os.getenv("PROFILE_INTERVAL_MS", "5"))) / 1000.0
+        self.out_dir = out_dir or os.getenv("PROFILE_DIR", "profiles")
+        self.trace_memory = trace_memory if trace_memory is not None else os.getenv("PROFILE_MEMORY", "1") == "1"
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> session
+        self._sampler = None
+        self._wake = threading.Event()
+        self.sampled = 0
+        self.stacks = Counter()
+        self.stages = {}
+
+    @contextmanager
+    def profile(self, label, root_code=None):
+        """Profiles the enclosed call if this request is sampled; nested calls join the outer session."""
+        if active_session() is not None or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            yield
+            return
+        session = ProfileSession(label, root_code, threading.get_ident())
+        self._begin(session)
+        _local.session = session
+        try:
+            yield
+        finally:
+            _local.session = None
+            self._end(session)
+
+    def _begin(self, session):
+        with self._lock:
+            if self.trace_memory and not self._active and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._active[session.thread_id] = session
+            self._wake.set()
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, daemon=True, name="profile-sampler")
+                self._sampler.start()
+
+    def _end(self, session):
+        with self._lock:
+            del self._active[session.thread_id]
+            if self.trace_memory and not self._active and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self.sampled += 1
+            self.stacks.update(session.stacks)
+            for name, (count, allocated, peak) in session.stages.items():
+                totals = self.stages.setdefault(name, [0, 0, 0])
+                totals[0] += count
+                totals[1] += allocated
+                totals[2] = max(totals[2], peak)
+            self._write()
+
+    def _sample_loop(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    # Idle until the next sampled request
+                    self._wake.clear()
+                    continue
+                frames = sys._current_frames()
+                for thread_id, session in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        session.sample(frame)
+
+    def stage_stats(self):
+        return {
+            name: {
+                "count": count,
+                "avg_alloc_kb": round(allocated / count / 1024, 2),
+                "peak_kb": round(peak / 1024, 2)
+            }
+            for name, (count, allocated, peak) in self.stages.items()
+        }
+
+    def _write(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(os.path.join(self.out_dir, "recommend.collapsed"), "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.out_dir, "stages.json"), "w") as f:
+            json.dump(self.stage_stats(), f, indent=2)
+
+    def top_frames(self, n=15):
+        """Leaf frames that received the most samples, i.e. where the time went."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [(frame, round(100 * count / total, 1)) for frame, count in leaves.most_common(n)]
+
+    def summary(self):
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "sampled_requests": self.sampled,
+                "samples": sum(self.stacks.values()),
+                "top_frames": self.top_frames(),
+                "stages": self.stage_stats(),
+                "out_dir": self.out_dir
+            }
+
+    def reset(self):
+        with self._lock:
+            self.sampled = 0
+            self.stacks = Counter()
+            self.stages = {}
+
+
+def profiled(label):
+    """Method decorator: profiles a sampled call through self.profiler."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.profile(label, method.__code__):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Decorator frames carry no information and are left out of collapsed stacks
+_wrapper_code = profiled(None)(lambda self: None).__code__
@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import time
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODES = ("retrieval", "rag", "llm")
+
+# Comparisons and explanations need the model to see the whole inventory
+COMPARISON = re.compile(
+    r"\b(compare|comparison|versus|vs\.?|difference|differences|better than|which (one|is|of)|"
+    r"pros and cons|rank|explain|why)\b",
+    re.IGNORECASE
+)
+
+# Words that carry no attribute of their own in a lookup ("a green tea with no caffeine")
+FILLER = {
+    "a", "an", "the", "some", "any", "something", "i", "me", "my", "want", "need", "like", "would",
+    "looking", "for", "with", "and", "or", "of", "in", "to", "please", "show", "find", "give", "tea",
+    "teas", "blend", "blends", "cup", "no", "not", "without", "free", "low", "high", "medium", "very",
+    "caffeine", "caffeinated", "decaf", "decaffeinated", "iced", "hot", "loose", "leaf", "flavored", "flavour", "flavor"
+}
+
+# Seed examples for the nearest-centroid classifier; ROUTER_EXAMPLES_PATH adds more
+EXAMPLES = [
+    ("green tea", "retrieval"),
+    ("no caffeine", "retrieval"),
+    ("herbal tea without caffeine", "retrieval"),
+    ("floral white tea", "retrieval"),
+    ("spicy black tea", "retrieval"),
+    ("citrus tea", "retrieval"),
+    ("I want something citrusy and bold.", "rag"),
+    ("Something to help me sleep, no caffeine.", "rag"),
+    ("What should I drink on a cold rainy afternoon?", "rag"),
+    ("A gift for a friend who likes sweet things", "rag"),
+    ("Something light to go with sushi", "rag"),
+    ("I'm feeling stressed and need to relax after work", "rag"),
+    ("Compare Earl Grey and Masala Chai for a morning routine", "llm"),
+    ("Which of your teas is best for focus, and why?", "llm"),
+    ("Rank your teas from mildest to strongest", "llm"),
+    ("What is the difference between white and green tea?", "llm"),
+    ("Plan three teas for a tasting evening that build from delicate to bold", "llm"),
+]
+
+
+class QueryRouter:
+    """Sends each /recommend query to the cheapest mode that can answer it.
+
+    "retrieval" returns the vector ranking without generating, "rag" is the
+    structured RAG pick over the top hits, and "llm" gives the model the whole
+    inventory. Rules decide first: follow-ups in a session stay on RAG (their
+    history is in the prompt), comparisons and explanations go to the LLM,
+    and short queries made only of catalog vocabulary (types, flavors, names,
+    caffeine words) are attribute lookups for retrieval. Queries no rule
+    decides go to a nearest-centroid classifier over the query embedding,
+    which retrieval then reuses from the cache; below ROUTER_MIN_MARGIN it
+    falls back to RAG. Decisions are appended to ROUTER_LOG_PATH as JSONL.
+    """
+
+    def __init__(self, rag, llm=None, log_path=None, min_margin=None, max_lookup_words=None):
+        self.rag = rag
+        self.llm = llm
+        if llm is not None:
+            # LLM turns belong to the same conversations, and when generation is skipped
+            # its fallback is the vector ranking rather than inventory order
+            llm.sessions = rag.sessions
+            llm.fallback_ranker = rag.recommend_ranked
+            # Both modes generate on the same model server, so they share one admission limit
+            llm.generation_guard = rag.generation_guard
+        self.log_path = log_path if log_path is not None else os.getenv("ROUTER_LOG_PATH", "logs/router_decisions.jsonl")
+        self.min_margin = float(min_margin) if min_margin is not None else float(os.getenv("ROUTER_MIN_MARGIN", "0.05"))
+        self.max_lookup_words = int(max_lookup_words) if max_lookup_words is not None else int(os.getenv("ROUTER_MAX_LOOKUP_WORDS", "6"))
+        self.examples = list(EXAMPLES) + self._load_examples(os.getenv("ROUTER_EXAMPLES_PATH"))
+        self._centroids = None
+        self._vocabulary = (None, set(), [])  # (catalog version, words, lowercased names)
+        self._lock = threading.Lock()
+        self.counts = {mode: 0 for mode in MODES}
+
+    def _load_examples(self, path):
+        """Extra [{"query": ..., "mode": ...}] examples, e.g. relabeled from the decision log."""
+        if not path or not os.path.exists(path):
+            return []
+        with open(path, 'r') as f:
+            return [(example['query'], example['mode']) for example in json.load(f) if example.get('mode') in MODES]
+
+    def _catalog_vocabulary(self):
+        """Words of the live catalog's names, types, flavors and caffeine levels, rebuilt per version."""
+        version = self.rag.catalog_version
+        if self._vocabulary[0] != version:
+            catalog = self.rag.teas
+            words = set(FILLER)
+            for field in ('name', 'type', 'caffeine'):
+                for value in catalog.columns[field]:
+                    words.update(re.findall(r"[\w-]+", (value or "").lower()))
+            for flavors in catalog.columns['flavors']:
+                for flavor in flavors or ():
+                    words.update(re.findall(r"[\w-]+", flavor.lower()))
+            names = [name.lower() for name in catalog.columns['name'] if name]
+            self._vocabulary = (version, words, names)
+        return self._vocabulary[1], self._vocabulary[2]
+
+    def _classify(self, query, deadline):
+        """(mode, margin) from the closest class centroid, or (None, 0.0) when there is no embedder."""
+        if self.rag.embedder is None:
+            return None, 0.0
+        with self._lock:
+            if self._centroids is None:
+                embeddings = np.asarray(self.rag.embed_queries([text for text, _ in self.examples]), dtype=np.float32)
+                embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+                labels = [mode for _, mode in self.examples]
+                centroids = {}
+                for mode in MODES:
+                    rows = embeddings[[i for i, label in enumerate(labels) if label == mode]]
+                    if len(rows):
+                        centroid = rows.mean(axis=0)
+                        centroids[mode] = centroid / np.linalg.norm(centroid)
+                self._centroids = centroids
+        query_embedding = np.asarray(self.rag.embed_query(query, deadline), dtype=np.float32)
+        query_embedding /= np.linalg.norm(query_embedding) or 1.0
+        scores = sorted(((float(centroid @ query_embedding), mode) for mode, centroid in self._centroids.items()), reverse=True)
+        if len(scores) < 2:
+            return scores[0][1] if scores else None, 0.0
+        return scores[0][1], scores[0][0] - scores[1][0]
+
+    def route(self, query, session_id=None, deadline=None):
+        """Returns (mode, reason) for query."""
+        if session_id is not None and self.rag.sessions.get(session_id).is_follow_up(query):
+            return "rag", "follow_up"
+        vocabulary, names = self._catalog_vocabulary()
+        lowered = query.lower()
+        if COMPARISON.search(query) or sum(name in lowered for name in names) >= 2:
+            mode, reason = "llm", "comparison"
+        else:
+            words = re.findall(r"[\w-]+", lowered)
+            if words and len(words) <= self.max_lookup_words and all(word in vocabulary for word in words):
+                return "retrieval", "attribute_lookup"
+            mode, margin = self._classify(query, deadline)
+            if mode is None or margin < self.min_margin:
+                return "rag", "default"
+            reason = f"classifier ({margin:.3f})"
+        if mode == "llm" and self.llm is None:
+            return "rag", f"{reason}, no llm mode"
+        return mode, reason
+
+    def _log(self, record):
+        if not self.log_path:
+            return
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Could not log routing decision: {e}")
+
+    def recommend_within(self, user_query, deadline, user_id=None, session_id=None, snapshot=None):
+        """Routes the query and answers it; returns (tea_ids, degraded, mode).
+
+        snapshot is a version of the RAG pipeline's index pinned by the
+        caller; the LLM pipeline reads its own.
+        """
+        start = time.perf_counter()
+        mode, reason = self.route(user_query, session_id, deadline)
+        route_ms = (time.perf_counter() - start) * 1000
+        if mode == "retrieval":
+            tea_ids, degraded = self.rag.recommend_ranked(user_query, deadline, user_id, session_id, snapshot), None
+        elif mode == "llm":
+            tea_ids, degraded = self.llm.recommend_within(user_query, deadline, user_id, session_id)
+        else:
+            tea_ids, degraded = self.rag.recommend_within(user_query, deadline, user_id, session_id, snapshot)
+        with self._lock:
+            self.counts[mode] += 1
+        self._log({
+            "time": time.time(),
+            "query": user_query,
+            "mode": mode,
+            "reason": reason,
+            "route_ms": round(route_ms, 3),
+            "total_ms": round((time.perf_counter() - start) * 1000, 3),
+            "degraded": degraded
+        })
+        return tea_ids, degraded, mode
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.counts)
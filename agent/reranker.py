@@ -0,0 +1,88 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from agent.deadline import GenerationGuard, call_timeout
+
+load_dotenv()
+
+RERANK_SYSTEM = "You grade how well a tea matches a customer's request."
+
+RERANK_PROMPT = """Tea: {tea}
+User's Request: "{query}"
+
+On a scale of 0 to 9, how well does this tea match the request? Answer with a single digit.
+
+Score:"""
+
+
+def render_candidate(tea):
+    return f"{tea['name']} ({tea['type']}): {tea['description']} Flavors: {', '.join(tea['flavors'])}."
+
+
+class LLMReranker:
+    """Reorders a retrieved candidate pool with one single-token LLM judgement per tea.
+
+    Each candidate is scored independently (in parallel) with a one-digit
+    answer, so the cost is a short prompt and one output token per tea
+    instead of the whole inventory plus a prose explanation.
+
+    Scoring calls go through a GenerationGuard of their own: at most
+    RERANK_WORKERS run at once across all requests, none start once the model
+    server's circuit breaker is open, and none start without a typical
+    scoring call's worth of deadline left. Only as many candidates as the
+    deadline can afford (in rounds of RERANK_WORKERS calls) are scored.
+    """
+
+    def __init__(self, generator, pool_size=None, workers=None, guard=None):
+        self.generator = generator
+        self.pool_size = int(pool_size) if pool_size is not None else int(os.getenv("RERANK_POOL", "50"))
+        self.workers = int(workers) if workers is not None else int(os.getenv("RERANK_WORKERS", "8"))
+        self.guard = guard or GenerationGuard(
+            max_concurrent=self.workers, latency_estimate=os.getenv("RERANK_LATENCY_ESTIMATE", "0.5"))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rerank")
+        self.skipped = 0  # candidates left unscored for lack of budget or a slot
+
+    def score(self, query, tea, deadline=None):
+        """The candidate's 0..1 score, or None if the guard refused the call."""
+        if self.guard.admit(deadline) is not None:
+            return None
+        prompt = RERANK_PROMPT.format(tea=render_candidate(tea), query=query)
+        start = time.perf_counter()
+        try:
+            score = self.generator.generate_score(RERANK_SYSTEM, prompt, timeout=call_timeout(deadline, None))
+        except Exception as e:
+            self.guard.release(time.perf_counter() - start, ok=False)
+            print(f"Rerank scoring failed for {tea['id']}: {e}")
+            return 0.0
+        self.guard.release(time.perf_counter() - start, ok=True)
+        return score
+
+    def affordable(self, count, deadline=None, reserve=0.0):
+        """How many of count candidates can be scored in the deadline, leaving reserve seconds."""
+        if deadline is None:
+            return count
+        rounds = int((deadline.remaining() - reserve) / self.guard.latency_estimate)
+        return max(0, min(count, rounds * self.workers))
+
+    def rerank(self, query, hits, n, deadline=None, reserve=0.0):
+        """Returns the n best (tea, rerank score) pairs; retrieval order breaks ties.
+
+        Candidates that are not scored (beyond what the deadline affords, or
+        refused by the guard) and candidates whose scoring fails score 0, so
+        an exhausted budget degrades to plain retrieval order.
+        """
+        scored = hits[:self.affordable(len(hits), deadline, reserve)]
+        scores = list(self._executor.map(lambda hit: self.score(query, hit[0], deadline), scored))
+        skipped = len(hits) - len(scored) + sum(score is None for score in scores)
+        if skipped:
+            self.skipped += skipped
+        scores = [score or 0.0 for score in scores] + [0.0] * (len(hits) - len(scored))
+        order = sorted(range(len(hits)), key=lambda i: -scores[i])
+        return [(hits[i][0], scores[i]) for i in order[:n]]
+
+    def metrics(self):
+        report = self.guard.metrics()
+        report["skipped"] = self.skipped
+        return report
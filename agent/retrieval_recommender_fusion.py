@@ -0,0 +1,154 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.tea_pipeline import TeaPipeline
+from agent.embeddings import local_embedding_provider, OpenAIEmbeddingProvider
+from agent.generators import OllamaGenerator
+from agent.semantic_cache import SemanticCache
+from agent.deadline import Deadline, DeadlineExceeded
+
+load_dotenv()
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuses ranked hit lists into one: each tea scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores = {}
+    teas = {}
+    for hits in rankings:
+        for rank, (tea, _) in enumerate(hits, 1):
+            scores[tea['id']] = scores.get(tea['id'], 0.0) + 1.0 / (k + rank)
+            teas.setdefault(tea['id'], tea)
+    return [(teas[tea_id], score) for tea_id, score in sorted(scores.items(), key=lambda item: -item[1])]
+
+
+class TeaFusionRecommender(TeaPipeline):
+    """RAG over both stored embedding sets: Ollama and OpenAI retrieval fused with RRF, then Ollama generation.
+
+    Both query embeddings and index searches run concurrently, so retrieval
+    takes as long as the slower provider. A provider that fails or misses
+    FUSION_PROVIDER_TIMEOUT_MS (or the request deadline, if sooner) is left
+    out and the other one's ranking is used alone.
+    """
+
+    def __init__(self, retrieval_n=None):
+        super().__init__(
+            embedder=local_embedding_provider(),
+            index_backend="numpy",
+            generator=OllamaGenerator(),
+            retrieval_n=retrieval_n,
+            embeddings_path='data/ollama/tea_data_with_embeddings.json'
+        )
+        self.secondary = TeaPipeline(
+            embedder=OpenAIEmbeddingProvider(),
+            index_backend="numpy",
+            embeddings_path='data/openai/tea_data_with_embeddings.json',
+            collection_name="tea_inventory_openai"
+        )
+        self.providers = ("ollama", "openai")
+        # Each provider contributes its top `depth` hits to the fusion
+        self.depth = int(os.getenv("FUSION_DEPTH", "20"))
+        self.rrf_k = int(os.getenv("FUSION_RRF_K", "60"))
+        self.provider_timeout = float(os.getenv("FUSION_PROVIDER_TIMEOUT_MS", "2000")) / 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=int(os.getenv("FUSION_WORKERS", "8")), thread_name_prefix="fusion")
+        # The semantic cache is keyed by the Ollama query embedding alone, which would make Ollama a hard dependency again
+        self.semantic_cache = SemanticCache(maxsize=0)
+        self._lock = threading.Lock()
+        self.counts = {"fused": 0, "ollama_only": 0, "openai_only": 0}
+        self.model = self.generator.model
+
+    def build_index(self):
+        super().build_index()
+        self.secondary.build_index()
+
+    build_vectordb = build_index
+
+    def reload(self):
+        self.secondary.reload()
+        return super().reload()
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def _fuse(self, futures, k, deadline):
+        """Waits for both providers until the provider deadline; fuses whatever ranked in time."""
+        timeout = self.provider_timeout if deadline is None else min(self.provider_timeout, deadline.remaining())
+        wait(futures, timeout=timeout)
+        rankings, answered, errors = [], [], []
+        for provider, future in zip(self.providers, futures):
+            if not future.done():
+                errors.append(f"{provider}: no answer within {timeout * 1000:.0f}ms")
+            elif future.exception() is not None:
+                errors.append(f"{provider}: {future.exception()}")
+            else:
+                rankings.append(future.result())
+                answered.append(provider)
+        if not rankings:
+            raise DeadlineExceeded(f"No retrieval provider answered ({'; '.join(errors)})")
+        if errors:
+            print(f"Fusion fell back to {answered[0]} ({'; '.join(errors)})")
+        self._count("fused" if len(rankings) > 1 else f"{answered[0]}_only")
+        return reciprocal_rank_fusion(rankings, self.rrf_k)[:k]
+
+    def retrieve(self, query, k=None, deadline=None, user_id=None, snapshot=None):
+        """Concurrent Ollama and OpenAI retrieval fused with RRF; scores are fused ranks, not cosines.
+
+        snapshot is the primary index version pinned by the caller; the
+        OpenAI side pins its own pipeline's version for the call.
+        """
+        k = k or self.retrieval_n
+        depth = max(k, self.depth)
+        # Each provider's HTTP calls are bounded by the provider deadline, so abandoned calls end on their own
+        provider_deadline = Deadline(self.provider_timeout if deadline is None else min(self.provider_timeout, deadline.remaining()))
+        with self.stats.time("fusion_retrieve"), self.index.use(snapshot) as snapshot, \
+                self.secondary.index.use() as secondary_snapshot:
+            futures = [
+                self.executor.submit(super().retrieve, query, depth, provider_deadline, user_id, snapshot),
+                self.executor.submit(self.secondary.retrieve, query, depth, provider_deadline, snapshot=secondary_snapshot)
+            ]
+            return self._fuse(futures, k, deadline)
+
+    def retrieve_batch(self, queries, k=None, snapshot=None):
+        k = k or self.retrieval_n
+        depth = max(k, self.depth)
+        with self.index.use(snapshot) as snapshot, self.secondary.index.use() as secondary_snapshot:
+            futures = [
+                self.executor.submit(super().retrieve_batch, queries, depth, snapshot),
+                self.executor.submit(self.secondary.retrieve_batch, queries, depth, secondary_snapshot)
+            ]
+            wait(futures)
+        # Bulk work has no deadline: only a failed provider is left out
+        batches = [future.result() for future in futures if future.exception() is None]
+        if not batches:
+            raise futures[0].exception()
+        return [reciprocal_rank_fusion(rankings, self.rrf_k)[:k] for rankings in zip(*batches)]
+
+    def chat(self, user_input):
+        # One conversation per process, so follow-ups can refer to earlier answers
+        return self.recommend(user_input, session_id="cli")
+
+def main():
+    try:
+        recommender = TeaFusionRecommender()
+        recommender.build_index()
+        print(f"TeaBot (Ollama + OpenAI fusion, {recommender.model}) is ready! Type 'exit' to quit.")
+        while True:
+            user_input = input("You: ")
+            if user_input.lower() == 'exit':
+                break
+            response = recommender.chat(user_input)
+            print(f"TeaBot: {response}")
+    except Exception as e:
+        print(f"Error: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,34 @@
 import os
-import json
-import numpy as np
-import requests
+import sys
 from dotenv import load_dotenv
 
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.tea_pipeline import TeaPipeline
+from agent.embeddings import local_embedding_provider
+from agent.generators import OllamaGenerator
+
 load_dotenv()
 
-class TeaRecommenderOllama:
-    def __init__(self, retrieval_n=None):
-        self.ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-        self.model = os.getenv("OLLAMA_MODEL", "gpt-oss:20b")
-        self.embedding_model = os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
-        self.retrieval_n = int(retrieval_n) if retrieval_n is not None else int(os.getenv("RETRIEVAL_N", "3"))
-        self.system_context = self._load_system_context()
-        self.data_path = 'data/ollama/tea_data_final.json'
-        self.load_data()
-        
-    def _load_system_context(self):
-        context_path = os.path.join(os.path.dirname(__file__), 'system_context.txt')
-        if os.path.exists(context_path):
-            with open(context_path, 'r') as f:
-                return f.read().strip()
-        return "You are a helpful tea recommender."
+class TeaRecommenderOllama(TeaPipeline):
+    """Standard RAG: cosine search over pre-computed Ollama embeddings, then Ollama generation."""
 
-    def load_data(self):
-        if not os.path.exists(self.data_path):
-            raise FileNotFoundError(f"Data file not found: {self.data_path}. Please run data preparation scripts.")
-        with open(self.data_path, 'r') as f:
-            self.teas = json.load(f)
-            
-    def get_embedding(self, text):
-        response = requests.post(
-            f"{self.ollama_url}/api/embeddings",
-            json={"model": self.embedding_model, "prompt": text}
-        )
-        response.raise_for_status()
-        return response.json()["embedding"]
+    default_system_context = "You are a helpful tea recommender."
 
-    def cosine_similarity(self, v1, v2):
-        return np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-
-    def retrieve(self, query, k=2):
-        query_embedding = self.get_embedding(query)
-        similarities = []
-        for tea in self.teas:
-            sim = self.cosine_similarity(query_embedding, tea['embedding'])
-            similarities.append((tea, sim))
-        
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return [item[0] for item in similarities[:k]]
+    def __init__(self, retrieval_n=None):
+        super().__init__(
+            embedder=local_embedding_provider(),
+            index_backend="numpy",
+            generator=OllamaGenerator(),
+            retrieval_n=retrieval_n,
+            embeddings_path='data/ollama/tea_data_with_embeddings.json'
+        )
+        self.model = self.generator.model
+        self.build_index()
 
     def chat(self, user_input):
-        results = self.retrieve(user_input, k=self.retrieval_n)
-        
-        context = "Relevant Tea Blends:\n"
-        for tea in results:
-            context += f"- {tea['name']}: {tea['description']} (Flavors: {', '.join(tea['flavors'])})\n"
-            
-        prompt = f"""System: {self.system_context} Use the following context to recommend exactly {self.retrieval_n} teas to the user.
-
-Context:
-{context}
-
-User: {user_input}
-TeaBot:"""
-        
-        response = requests.post(
-            f"{self.ollama_url}/api/generate",
-            json={
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0
-                }
-            }
-        )
-        response.raise_for_status()
-        return response.json()["response"]
+        # One conversation per process, so follow-ups can refer to earlier answers
+        return self.recommend(user_input, session_id="cli")
 
 def main():
     try:
@@ -1,69 +1,41 @@
 import os
-import json
-import numpy as np
-import requests
+import sys
 from dotenv import load_dotenv
 
-load_dotenv()
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.tea_pipeline import TeaPipeline
+from agent.embeddings import local_embedding_provider
 
-class TeaEmbeddingSearcher:
-    def __init__(self, retrieval_n=None):
-        self.ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-        self.embedding_model = os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
-        self.retrieval_n = int(retrieval_n) if retrieval_n is not None else int(os.getenv("RETRIEVAL_N", "3"))
-        self.system_context = self._load_system_context()
-        self.data_path = 'data/ollama/tea_data_with_embeddings.json'
-        self.teas = self._load_data()
+load_dotenv()
 
-    def _load_system_context(self):
-        context_path = os.path.join(os.path.dirname(__file__), 'system_context.txt')
-        if os.path.exists(context_path):
-            with open(context_path, 'r') as f:
-                return f.read().strip()
-        return "You are a helpful tea searcher."
+class TeaEmbeddingSearcher(TeaPipeline):
+    """Search-only mode over pre-computed Ollama embeddings; no generation."""
 
-    def _load_data(self):
-        """Loads the tea data with pre-computed embeddings."""
-        if not os.path.exists(self.data_path):
-            raise FileNotFoundError(f"Missing data file: {self.data_path}. Please run 'data/ollama/embed_documents_ollama.py' first.")
-        
-        with open(self.data_path, 'r') as f:
-            return json.load(f)
+    default_system_context = "You are a helpful tea searcher."
 
-    def get_embedding(self, text):
-        """Generates an embedding for the user's query using Ollama."""
-        response = requests.post(
-            f"{self.ollama_url}/api/embeddings",
-            json={"model": self.embedding_model, "prompt": text}
+    def __init__(self, retrieval_n=None):
+        super().__init__(
+            embedder=local_embedding_provider(),
+            index_backend="numpy",
+            retrieval_n=retrieval_n,
+            embeddings_path='data/ollama/tea_data_with_embeddings.json'
         )
-        response.raise_for_status()
-        return response.json()["embedding"]
-
-    def cosine_similarity(self, v1, v2):
-        """Calculates cosine similarity between two vectors."""
-        v1 = np.array(v1)
-        v2 = np.array(v2)
-        return np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+        self.build_index()
 
     def search(self, query, top_k=3):
         """Finds the top K most similar teas to the user's query."""
         print(f"\nSearching for: '{query}'...")
-        query_vec = self.get_embedding(query)
-        
-        results = []
-        for tea in self.teas:
-            similarity = self.cosine_similarity(query_vec, tea['embedding'])
-            results.append({
+        return [
+            {
                 "name": tea['name'],
                 "type": tea['type'],
                 "flavors": tea['flavors'],
                 "description": tea['description'],
-                "score": similarity
-            })
-        
-        # Sort by similarity score in descending order
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:top_k]
+                "score": score
+            }
+            for tea, score in self.retrieve(query, k=top_k)
+        ]
 
 def main():
     try:
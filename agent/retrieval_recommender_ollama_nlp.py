@@ -1,66 +1,23 @@
 import os
-import json
-import requests
+import sys
 from dotenv import load_dotenv
 
-load_dotenv()
-
-class TeaRecommenderOllamaNLP:
-    def __init__(self, retrieval_n=None):
-        self.ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-        self.model = os.getenv("OLLAMA_MODEL", "gpt-oss:20b")
-        self.retrieval_n = int(retrieval_n) if retrieval_n is not None else int(os.getenv("RETRIEVAL_N", "3"))
-        self.system_context = self._load_system_context()
-        self.data_path = 'data/mock_tea_data.json'
-        self.teas = self._load_data()
-
-    def _load_system_context(self):
-        context_path = os.path.join(os.path.dirname(__file__), 'system_context.txt')
-        if os.path.exists(context_path):
-            with open(context_path, 'r') as f:
-                return f.read().strip()
-        return "You are a professional tea sommelier."
-
-    def _load_data(self):
-        """Loads the raw tea data from JSON."""
-        if not os.path.exists(self.data_path):
-            raise FileNotFoundError(f"Data file not found: {self.data_path}")
-        with open(self.data_path, 'r') as f:
-            return json.load(f)
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.tea_pipeline import TeaPipeline, INVENTORY_PROMPT
+from agent.generators import OllamaGenerator
 
-    def recommend(self, user_query):
-        """Uses LLM reasoning to find the best tea match from the full list."""
-        tea_list_str = json.dumps(self.teas, indent=2)
-        
-        # We provide the full context to the LLM to act as a 'searchable database'
-        prompt = f"""System: {self.system_context} Below is our current inventory of tea blends:
-
-{tea_list_str}
-
-User Preference: "{user_query}"
+load_dotenv()
 
-Task:
-1. Identify the top {self.retrieval_n} best matching teas from the list above.
-2. Explain why each tea is a good fit for the user's specific request.
+class TeaRecommenderOllamaNLP(TeaPipeline):
+    """NLP-only mode: the whole inventory goes into the prompt and the LLM does the matching."""
 
-Response:"""
+    prompt_template = INVENTORY_PROMPT
+    default_system_context = "You are a professional tea sommelier."
 
-        try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0
-                    }
-                }
-            )
-            response.raise_for_status()
-            return response.json()["response"]
-        except Exception as e:
-            return f"Error communicating with Ollama: {e}"
+    def __init__(self, retrieval_n=None):
+        super().__init__(generator=OllamaGenerator(), retrieval_n=retrieval_n)
+        self.build_index()
 
 def main():
     try:
@@ -74,7 +31,7 @@ def main():
                 break
             
             print("\nAnalyzing our inventory...")
-            recommendation = recommender.recommend(user_input)
+            recommendation = recommender.recommend(user_input, session_id="cli")
             print(f"\n{recommendation}")
             print("-" * 40)
 
@@ -1,132 +1,43 @@
 import os
-import json
-import requests
+import sys
 import chromadb
 from dotenv import load_dotenv
 
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.tea_pipeline import TeaPipeline
+from agent.embeddings import local_embedding_provider
+from agent.generators import OllamaGenerator
+
 load_dotenv()
 
-class TeaChromaRecommender:
+class TeaChromaRecommender(TeaPipeline):
+    """RAG pipeline: ChromaDB retrieval over Ollama embeddings -> Ollama generation."""
+
     def __init__(self, retrieval_n=None):
-        self.ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-        self.ollama_model = os.getenv("OLLAMA_MODEL", "gpt-oss:20b")
-        self.embedding_model = os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
-        self.retrieval_n = int(retrieval_n) if retrieval_n is not None else int(os.getenv("RETRIEVAL_N", "3"))
-        self.system_context = self._load_system_context()
-        
-        # Initialize ChromaDB client (In-memory for this example)
-        self.chroma_client = chromadb.Client()
-        self.collection = self.chroma_client.get_or_create_collection(
-            name="tea_inventory",
-            metadata={"hnsw:space": "cosine"}
+        super().__init__(
+            embedder=local_embedding_provider(),
+            index_backend="chroma",
+            generator=OllamaGenerator(),
+            retrieval_n=retrieval_n,
+            collection_name="tea_inventory",
+            chroma_client=chromadb.Client()  # In-memory for this example
         )
-        
-        self.data_path = 'data/mock_tea_data.json'
-        self.teas = self._load_data()
-
-    def _load_system_context(self):
-        context_path = os.path.join(os.path.dirname(__file__), 'system_context.txt')
-        if os.path.exists(context_path):
-            with open(context_path, 'r') as f:
-                return f.read().strip()
-        return "You are a helpful tea assistant."
+        self.ollama_model = self.generator.model
+        self.embedding_model = self.embedder.model
 
-    def _load_data(self):
-        if not os.path.exists(self.data_path):
-            raise FileNotFoundError(f"Data file not found: {self.data_path}")
-        with open(self.data_path, 'r') as f:
-            return json.load(f)
-
-    def get_ollama_embedding(self, text, is_query=False):
-        """Generates embedding using Ollama's embedding API with instructional prefixes."""
-        prefix = "search_query: " if is_query else "search_document: "
-        response = requests.post(
-            f"{self.ollama_url}/api/embeddings",
-            json={"model": self.embedding_model, "prompt": prefix + text}
-        )
-        response.raise_for_status()
-        return response.json()["embedding"]
+    @property
+    def collection(self):
+        """The ChromaDB collection of the live catalog version."""
+        current = self.index.current
+        # None when INDEX_BACKEND swaps Chroma for another index
+        return getattr(current.index, "collection", None) if current is not None else None
 
     def build_vectordb(self):
         """Builds ChromaDB by embedding all teas."""
-        print(f"Building ChromaDB collection using Ollama model: {self.embedding_model}...")
-        
-        ids = []
-        documents = []
-        embeddings = []
-        metadatas = []
-
-        for tea in self.teas:
-            # Create a more descriptive natural language string for better embedding quality
-            content = f"{tea['name']} is a {tea['type']} tea. It features flavors like {', '.join(tea['flavors'])}. {tea['description']}"
-            embedding = self.get_ollama_embedding(content, is_query=False)
-            
-            ids.append(tea['id'])
-            documents.append(content)
-            embeddings.append(embedding)
-            # Store full info in metadata for easy retrieval
-            metadatas.append({
-                "name": tea['name'],
-                "type": tea['type'],
-                "flavors": ", ".join(tea['flavors']),
-                "description": tea['description']
-            })
-
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas
-        )
-        print(f"ChromaDB built with {self.collection.count()} entries.")
-
-    def recommend(self, user_query):
-        """RAG pipeline: ChromaDB Retrieval -> Ollama Generation."""
-        # 1. Embed Query
-        query_embedding = self.get_ollama_embedding(user_query, is_query=True)
-        
-        # 2. Query ChromaDB
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=self.retrieval_n
-        )
-        
-        # 3. Construct Context
-        context = "Top Matching Teas:\n"
-        for i in range(len(results['metadatas'][0])):
-            meta = results['metadatas'][0][i]
-            context += f"- {meta['name']} ({meta['type']}): {meta['description']} Flavors: {meta['flavors']}\n"
-
-        # 4. Generate via Ollama
-        prompt = f"""System: {self.system_context} Use the following tea information to answer the user's request.
-
-Context:
-{context}
-
-User's Request: "{user_query}"
-
-Instructions:
-- Recommend the top {self.retrieval_n} teas from the provided context.
-- Keep the response concise and friendly.
-
-Response:"""
-
-        try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.ollama_model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0
-                    }
-                }
-            )
-            response.raise_for_status()
-            return response.json()["response"]
-        except Exception as e:
-            return f"Error during generation: {e}"
+        print(f"Building ChromaDB collection using {self.embedder.model}...")
+        self.build_index()
+        print(f"ChromaDB built with {self.index.current.index.count()} entries.")
 
 def main():
     try:
@@ -140,7 +51,7 @@ def main():
                 break
             
             print("Searching and thinking...")
-            answer = recommender.recommend(user_input)
+            answer = recommender.recommend(user_input, session_id="cli")
             print(f"\n{answer}")
             print("-" * 50)
 
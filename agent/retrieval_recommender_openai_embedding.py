@@ -1,64 +1,41 @@
 import os
-import json
-import numpy as np
-from openai import OpenAI
+import sys
 from dotenv import load_dotenv
 
-load_dotenv()
-
-class TeaEmbeddingSearcherOpenAI:
-    def __init__(self, retrieval_n=None):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.retrieval_n = int(retrieval_n) if retrieval_n is not None else int(os.getenv("RETRIEVAL_N", "3"))
-        self.system_context = self._load_system_context()
-        self.data_path = 'data/openai/tea_data_with_embeddings.json'
-        self.teas = self._load_data()
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.tea_pipeline import TeaPipeline
+from agent.embeddings import OpenAIEmbeddingProvider
 
-    def _load_system_context(self):
-        context_path = os.path.join(os.path.dirname(__file__), 'system_context.txt')
-        if os.path.exists(context_path):
-            with open(context_path, 'r') as f:
-                return f.read().strip()
-        return "You are a helpful tea searcher."
+load_dotenv()
 
-    def _load_data(self):
-        """Loads the tea data with pre-computed embeddings."""
-        if not os.path.exists(self.data_path):
-            raise FileNotFoundError(f"Missing data file: {self.data_path}. Please run 'data/openai/embed_documents_openai.py' first.")
-        
-        with open(self.data_path, 'r') as f:
-            return json.load(f)
+class TeaEmbeddingSearcherOpenAI(TeaPipeline):
+    """Search-only mode over pre-computed OpenAI embeddings; no generation."""
 
-    def get_embedding(self, text, model="text-embedding-ada-002"):
-        """Generates an embedding for the user's query using OpenAI."""
-        text = text.replace("\n", " ")
-        return self.client.embeddings.create(input=[text], model=model).data[0].embedding
+    default_system_context = "You are a helpful tea searcher."
 
-    def cosine_similarity(self, v1, v2):
-        """Calculates cosine similarity between two vectors."""
-        v1 = np.array(v1)
-        v2 = np.array(v2)
-        return np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+    def __init__(self, retrieval_n=None):
+        super().__init__(
+            embedder=OpenAIEmbeddingProvider(),
+            index_backend="numpy",
+            retrieval_n=retrieval_n,
+            embeddings_path='data/openai/tea_data_with_embeddings.json'
+        )
+        self.build_index()
 
     def search(self, query, top_k=3):
         """Finds the top K most similar teas to the user's query."""
         print(f"\nSearching for: '{query}'...")
-        query_vec = self.get_embedding(query)
-        
-        results = []
-        for tea in self.teas:
-            similarity = self.cosine_similarity(query_vec, tea['embedding'])
-            results.append({
+        return [
+            {
                 "name": tea['name'],
                 "type": tea['type'],
                 "flavors": tea['flavors'],
                 "description": tea['description'],
-                "score": similarity
-            })
-        
-        # Sort by similarity score in descending order
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:top_k]
+                "score": score
+            }
+            for tea, score in self.retrieve(query, k=top_k)
+        ]
 
 def main():
     try:
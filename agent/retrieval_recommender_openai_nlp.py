@@ -1,62 +1,23 @@
 import os
-import json
-from openai import OpenAI
+import sys
 from dotenv import load_dotenv
 
-load_dotenv()
-
-class TeaRecommenderOpenAINLP:
-    def __init__(self, retrieval_n=None):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.retrieval_n = int(retrieval_n) if retrieval_n is not None else int(os.getenv("RETRIEVAL_N", "3"))
-        self.system_context = self._load_system_context()
-        self.data_path = 'data/mock_tea_data.json'
-        self.teas = self._load_data()
-
-    def _load_system_context(self):
-        context_path = os.path.join(os.path.dirname(__file__), 'system_context.txt')
-        if os.path.exists(context_path):
-            with open(context_path, 'r') as f:
-                return f.read().strip()
-        return "You are a professional tea sommelier."
-
-    def _load_data(self):
-        """Loads the raw tea data from JSON."""
-        if not os.path.exists(self.data_path):
-            raise FileNotFoundError(f"Data file not found: {self.data_path}")
-        with open(self.data_path, 'r') as f:
-            return json.load(f)
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.tea_pipeline import TeaPipeline, INVENTORY_PROMPT
+from agent.generators import OpenAIGenerator
 
-    def recommend(self, user_query):
-        """Uses OpenAI reasoning to find the best tea match from the inventory."""
-        tea_list_str = json.dumps(self.teas, indent=2)
-        
-        system_msg = self.system_context
-        
-        prompt = f"""Inventory:
-{tea_list_str}
-
-User's Request: "{user_query}"
+load_dotenv()
 
-Task:
-1. Identify the top {self.retrieval_n} best matches from the inventory.
-2. Explain the flavor profiles and why they match the user's request.
-3. Keep the tone friendly and elegant.
+class TeaRecommenderOpenAINLP(TeaPipeline):
+    """NLP-only mode: the whole inventory goes into the prompt and GPT-3.5 does the matching."""
 
-Response:"""
+    prompt_template = INVENTORY_PROMPT
+    default_system_context = "You are a professional tea sommelier."
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error communicating with OpenAI: {e}"
+    def __init__(self, retrieval_n=None):
+        super().__init__(generator=OpenAIGenerator(), retrieval_n=retrieval_n)
+        self.build_index()
 
 def main():
     try:
@@ -70,7 +31,7 @@ def main():
                 break
             
             print("\nAnalyzing inventory and preferences...")
-            recommendation = recommender.recommend(user_input)
+            recommendation = recommender.recommend(user_input, session_id="cli")
             print(f"\n{recommendation}")
             print("-" * 40)
 
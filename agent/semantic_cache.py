@@ -0,0 +1,115 @@
+import os
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class SemanticCache:
+    """Answers a query from a previous result when their embeddings are close enough.
+
+    Entries are (normalized query embedding, answer) pairs kept in a fixed-size
+    matrix, so a lookup is one matrix-vector product. An entry only matches
+    queries against the same catalog version and answer mode. When full, the
+    least recently used (policy "lru") or least frequently used ("lfu") entry
+    is replaced.
+    """
+
+    def __init__(self, maxsize=None, threshold=None, policy=None):
+        self.maxsize = int(maxsize) if maxsize is not None else int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+        self.threshold = float(threshold) if threshold is not None else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.policy = (policy or os.getenv("SEMANTIC_CACHE_POLICY", "lru")).lower()
+        if self.policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown semantic cache policy: {self.policy}")
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._answers = []
+        self._keys = []  # (catalog version, mode) per row
+        self._last_used = np.zeros(self.maxsize, dtype=np.int64)
+        self._uses = np.zeros(self.maxsize, dtype=np.int64)
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def __len__(self):
+        return len(self._answers)
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get(self, embedding, catalog_version, mode=None):
+        """Returns the cached answer for the closest matching query, or None."""
+        if not self.enabled:
+            return None
+        query = self._normalize(embedding)
+        with self._lock:
+            self._clock += 1
+            size = len(self._answers)
+            if size:
+                scores = self._matrix[:size] @ query
+                valid = np.array([key == (catalog_version, mode) for key in self._keys])
+                scores[~valid] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._last_used[best] = self._clock
+                    self._uses[best] += 1
+                    self.hits += 1
+                    return self._answers[best]
+            self.misses += 1
+            return None
+
+    def put(self, embedding, answer, catalog_version, mode=None):
+        if not self.enabled:
+            return
+        query = self._normalize(embedding)
+        with self._lock:
+            self._clock += 1
+            if self._matrix is None:
+                self._matrix = np.zeros((self.maxsize, query.shape[0]), dtype=np.float32)
+            size = len(self._answers)
+            if size < self.maxsize:
+                row = size
+                self._answers.append(answer)
+                self._keys.append((catalog_version, mode))
+            else:
+                row = self._victim()
+                self._answers[row] = answer
+                self._keys[row] = (catalog_version, mode)
+                self.evictions += 1
+            self._matrix[row] = query
+            self._last_used[row] = self._clock
+            self._uses[row] = 1
+
+    def _victim(self):
+        # Entries from an older catalog version can never hit again, so they go first
+        current = max(version for version, _ in self._keys)
+        stale = [i for i, (version, _) in enumerate(self._keys) if version != current]
+        if stale:
+            return stale[0]
+        if self.policy == "lfu":
+            # Least frequently used, oldest first among ties
+            return int(np.lexsort((self._last_used, self._uses))[0])
+        return int(np.argmin(self._last_used))
+
+    def clear(self):
+        with self._lock:
+            self._answers = []
+            self._keys = []
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._answers),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
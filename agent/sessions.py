@@ -0,0 +1,147 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+from agent.context import count_tokens, trim_description
+
+load_dotenv()
+
+# A reference to an earlier answer: "that one", "the second one", "them"
+REFERENCE = r"(that|those|these|this one|it|them|the (first|second|third|last|other) one)( one)?"
+
+# Follow-ups open with the reference or a comparison to it ("that one but cheaper",
+# "something milder", "another", "is it caffeinated?"), are just the comparison
+# ("cheaper?"), or end on the reference ("less smoky than that"). Words like
+# "more", "than" or "other" elsewhere ("a tea that is more floral than sencha") do not count.
+FOLLOW_UP_START = re.compile(
+    rf"^\s*(({REFERENCE}|another|anything else|something (else|similar|cheaper|stronger|lighter|milder|less|more)|"
+    r"(is|are|does|do|was|were) (it|that|they|those|these)|more like|similar to)\b|"
+    r"(cheaper|stronger|lighter|milder|less|more|similar)( ones?)?\s*[.?!]*$)",
+    re.IGNORECASE
+)
+FOLLOW_UP_END = re.compile(rf"\b(than|like|to|of|instead of) {REFERENCE}\s*[.?!]*$", re.IGNORECASE)
+
+
+class Session:
+    """One conversation: its recent turns verbatim plus a rolling summary of the older ones.
+
+    Each turn is (query, reply, tea_ids). add_turn() compacts as it goes:
+    while summary and turns exceed the token budget, the oldest turn is
+    folded into a one-line summary entry, and the summary keeps at most half
+    the budget by dropping its oldest entries. The history sent with each
+    prompt is therefore bounded however long the conversation runs.
+    """
+
+    def __init__(self, session_id, budget):
+        self.session_id = session_id
+        self.budget = budget
+        self.turns = []
+        self.summary = []
+        self.turn_count = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def last_tea_ids(self):
+        with self.lock:
+            return list(self.turns[-1][2]) if self.turns else []
+
+    def is_follow_up(self, query):
+        """Whether query refers back to the previous answer (and there is one)."""
+        with self.lock:
+            return bool(self.turns) and (FOLLOW_UP_START.search(query) is not None or FOLLOW_UP_END.search(query) is not None)
+
+    def _turn_text(self, turn):
+        query, reply, _ = turn
+        return f"User: {query}\nTeaBot: {reply}\n"
+
+    def _summary_line(self, turn):
+        query, reply, _ = turn
+        return f"- User: {trim_description(query, 16)} / TeaBot: {trim_description(reply, 24)}\n"
+
+    def _tokens(self):
+        return sum(count_tokens(line) for line in self.summary) + sum(count_tokens(self._turn_text(t)) for t in self.turns)
+
+    def add_turn(self, query, reply, tea_ids):
+        with self.lock:
+            self.turns.append((query, reply, list(tea_ids)))
+            self.turn_count += 1
+            # The newest turn always stays verbatim
+            while len(self.turns) > 1 and self._tokens() > self.budget:
+                self.summary.append(self._summary_line(self.turns.pop(0)))
+            while self.summary and sum(count_tokens(line) for line in self.summary) > self.budget // 2:
+                self.summary.pop(0)
+
+    def history(self):
+        """The conversation so far as prompt text ("" for a new session)."""
+        with self.lock:
+            if not self.turns:
+                return ""
+            text = ""
+            if self.summary:
+                text += "Earlier in this conversation:\n" + "".join(self.summary)
+            return text + "".join(self._turn_text(turn) for turn in self.turns)
+
+
+class SessionStore:
+    """Conversations by session id, in memory, with LRU and idle-TTL eviction.
+
+    At most SESSION_CACHE_SIZE sessions are kept (default 1000); a session
+    unused for SESSION_TTL_SECONDS (default 1800) is dropped and its id
+    starts a new conversation. Each session's history is compacted to
+    SESSION_HISTORY_TOKENS (default 256).
+    """
+
+    def __init__(self, maxsize=None, ttl=None, history_tokens=None):
+        self.maxsize = int(maxsize) if maxsize is not None else int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+        self.ttl = float(ttl) if ttl is not None else float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+        self.history_tokens = int(history_tokens) if history_tokens is not None else int(os.getenv("SESSION_HISTORY_TOKENS", "256"))
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+        self.follow_ups = 0
+
+    def _expire(self, now):
+        # Sessions are kept in last-used order, so expired ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def get(self, session_id):
+        """The live session for session_id, or a new one."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id, self.history_tokens)
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+            return session
+
+    def end(self, session_id):
+        """Forgets a conversation; returns whether it existed."""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "follow_ups": self.follow_ups
+            }
@@ -0,0 +1,313 @@
+import os
+import zlib
+import threading
+import multiprocessing
+import numpy as np
+from dotenv import load_dotenv
+
+from agent.indexes import NumpyIndex
+
+load_dotenv()
+
+
+class ShardLostError(RuntimeError):
+    """A shard no longer holds its partition of an index (its worker died and was restarted)."""
+
+    def __init__(self, shards, message, results=None):
+        super().__init__(message)
+        self.shards = shards
+        self.results = results or {}  # replies from the shards that still had it
+
+
+def _shard_worker(conn):
+    """Runs in a shard process: holds NumpyIndex partitions by index name and answers commands.
+
+    A partition exists from its "create" command on, even if no ids hash to
+    this shard, so a command for a name the worker does not know means the
+    partition was lost (the worker was restarted) and is answered "lost".
+    """
+    indexes = {}
+    while True:
+        try:
+            command, name, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            if command == "create":
+                indexes[name] = NumpyIndex(name)
+                conn.send(("ok", None))
+                continue
+            if command == "drop":
+                indexes.pop(name, None)
+                conn.send(("ok", None))
+                continue
+            index = indexes.get(name)
+            if index is None:
+                conn.send(("lost", f"no partition of index {name}"))
+                continue
+            if command == "add":
+                result = index.add(*args)
+            elif command == "search_batch":
+                result = index.search_batch(*args)
+            elif command == "get_embeddings":
+                result = index.get_embeddings(*args)
+            elif command == "count":
+                result = index.count()
+            else:
+                raise ValueError(f"Unknown shard command: {command}")
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class ShardPool:
+    """N local worker processes, each holding one partition of every sharded index.
+
+    Commands are scattered to the shards involved and sent before any reply
+    is awaited, so the shards work in parallel on separate cores. Each shard
+    connection has its own lock; concurrent callers queue per shard, taking
+    the locks in shard order.
+    """
+
+    def __init__(self, shards=None):
+        self.shards = int(shards) if shards is not None else int(os.getenv("INDEX_SHARDS") or os.cpu_count() or 1)
+        self._context = multiprocessing.get_context("spawn")
+        self._locks = [threading.Lock() for _ in range(self.shards)]
+        self._conns = [None] * self.shards
+        self._procs = [None] * self.shards
+        self.restarts = 0
+        for shard in range(self.shards):
+            self._start(shard)
+
+    def _start(self, shard):
+        parent, child = self._context.Pipe()
+        process = self._context.Process(target=_shard_worker, args=(child,), daemon=True, name=f"index-shard-{shard}")
+        process.start()
+        child.close()
+        self._conns[shard] = parent
+        self._procs[shard] = process
+
+    def scatter(self, requests):
+        """Runs {shard: (command, name, args)} on the shards in parallel; returns {shard: result}."""
+        shards = sorted(requests)
+        for shard in shards:
+            self._locks[shard].acquire()
+        try:
+            sent = []
+            for shard in shards:
+                try:
+                    self._conns[shard].send(requests[shard])
+                    sent.append(shard)
+                except (BrokenPipeError, OSError):
+                    pass
+            results, errors, lost = {}, [], []
+            for shard in shards:
+                try:
+                    if shard not in sent:
+                        raise EOFError
+                    status, result = self._conns[shard].recv()
+                except (EOFError, OSError):
+                    # The worker died and its partitions with it; a fresh, empty one takes its place
+                    self._start(shard)
+                    self.restarts += 1
+                    status, result = "lost", "worker died and was restarted"
+                if status == "ok":
+                    results[shard] = result
+                elif status == "lost":
+                    lost.append(shard)
+                    errors.append(f"index shard {shard}: {result}")
+                else:
+                    errors.append(f"index shard {shard}: {result}")
+            if lost and len(lost) == len(errors):
+                raise ShardLostError(lost, "; ".join(errors), results)
+            if errors:
+                raise RuntimeError("; ".join(errors))
+            return results
+        finally:
+            for shard in shards:
+                self._locks[shard].release()
+
+    def close(self):
+        for shard in range(self.shards):
+            with self._locks[shard]:
+                self._conns[shard].close()
+                self._procs[shard].join(timeout=5)
+
+    def metrics(self):
+        return {
+            "shards": self.shards,
+            "alive": sum(process.is_alive() for process in self._procs),
+            "restarts": self.restarts
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_shard_pool():
+    """The process-wide ShardPool, started on first use (INDEX_SHARDS workers)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ShardPool()
+        return _pool
+
+
+class ShardedIndex:
+    """Exact cosine search over a catalog partitioned across ShardPool workers.
+
+    Each id lives on shard crc32(id) % shards, so a shard's partition depends
+    only on its own ids and every shard builds its part independently and in
+    parallel. A search fans the query out to every shard, each returns its
+    local top-k, and the merged top-k is the same as an unsharded search.
+
+    Sharding only pays off once a search scans enough rows to outweigh the
+    pipe round-trip to the workers, and only with a core per shard. Below
+    min_rows (INDEX_SHARD_MIN_ROWS, default 100000) the index stays an
+    in-process NumpyIndex; it moves to the shards when it grows past that.
+    evaluation/shard_sweep.py measures the crossover on a given host.
+
+    If a worker dies, its replacement starts empty and the shard answers
+    "lost" for this index. With a `rebuild(ids) -> embeddings` callback the
+    lost partition is repopulated and the call retried; without one the
+    ShardLostError propagates.
+    """
+
+    def __init__(self, name, pool=None, rebuild=None, min_rows=None):
+        self.name = name
+        self._pool = pool
+        self.rebuild = rebuild
+        self.min_rows = int(min_rows) if min_rows is not None else int(os.getenv("INDEX_SHARD_MIN_ROWS", "100000"))
+        # Rows stay in-process until min_rows; afterwards `local` is None and the shards hold them
+        self.local = NumpyIndex(name)
+        self._shard_ids = None  # shard -> ids it holds, so a lost partition can be rebuilt
+        self._repair_lock = threading.Lock()
+        self.repairs = 0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = get_shard_pool()
+        return self._pool
+
+    @property
+    def sharded(self):
+        return self.local is None
+
+    def shard_of(self, tea_id):
+        return zlib.crc32(tea_id.encode('utf-8')) % self.pool.shards
+
+    def _partition(self, ids):
+        """{shard: [positions in ids]}"""
+        parts = {}
+        for position, tea_id in enumerate(ids):
+            parts.setdefault(self.shard_of(tea_id), []).append(position)
+        return parts
+
+    def _scatter_add(self, ids, vectors):
+        parts = self._partition(ids)
+        self._call({
+            shard: ("add", self.name, ([ids[p] for p in positions], vectors[positions]))
+            for shard, positions in parts.items()
+        })
+        for shard, positions in parts.items():
+            self._shard_ids[shard].extend(ids[p] for p in positions)
+
+    def _move_to_shards(self):
+        """Sends the in-process rows to the shards, batch by batch, and drops the local copy."""
+        self.pool.scatter({shard: ("create", self.name, ()) for shard in range(self.pool.shards)})
+        self._shard_ids = {shard: [] for shard in range(self.pool.shards)}
+        local, batch_size = self.local, 10000
+        for start in range(0, local.count(), batch_size):
+            self._scatter_add(local.ids[start:start + batch_size], local.matrix[start:start + batch_size])
+        self.local = None
+        print(f"Index {self.name} reached {local.count()} rows; moved it to {self.pool.shards} shards.")
+
+    def _repair(self, shards):
+        """Recreates lost partitions from rebuild(); raises if there is no rebuild callback."""
+        with self._repair_lock:
+            for shard in shards:
+                ids = self._shard_ids[shard]
+                print(f"Rebuilding shard {shard} of index {self.name} ({len(ids)} rows).")
+                self.pool.scatter({shard: ("create", self.name, ())})
+                for start in range(0, len(ids), 10000):
+                    chunk = ids[start:start + 10000]
+                    vectors = np.asarray(self.rebuild(chunk), dtype=np.float32)
+                    self.pool.scatter({shard: ("add", self.name, (chunk, vectors))})
+                self.repairs += 1
+
+    def _call(self, requests):
+        """Scatters requests to the shards; lost partitions are rebuilt and only their requests retried."""
+        try:
+            return self.pool.scatter(requests)
+        except ShardLostError as e:
+            if self.rebuild is None:
+                raise
+            self._repair(e.shards)
+            results = dict(e.results)
+            results.update(self.pool.scatter({shard: requests[shard] for shard in e.shards if shard in requests}))
+            return results
+
+    def add(self, ids, embeddings):
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if not self.sharded:
+            self.local.add(ids, vectors)
+            if self.local.count() >= self.min_rows:
+                self._move_to_shards()
+            return
+        self._scatter_add(list(ids), vectors)
+
+    def count(self):
+        if not self.sharded:
+            return self.local.count()
+        results = self._call({shard: ("count", self.name, ()) for shard in range(self.pool.shards)})
+        return sum(results.values())
+
+    def get_embeddings(self, ids):
+        if not self.sharded:
+            return self.local.get_embeddings(ids)
+        parts = self._partition(ids)
+        results = self._call({
+            shard: ("get_embeddings", self.name, ([ids[p] for p in positions],))
+            for shard, positions in parts.items()
+        })
+        embeddings = [None] * len(ids)
+        for shard, positions in parts.items():
+            for position, embedding in zip(positions, results[shard]):
+                embeddings[position] = embedding
+        return embeddings
+
+    def search(self, query_embedding, k):
+        """Returns the ids and cosine similarities of the k closest entries."""
+        return self.search_batch([query_embedding], k)[0]
+
+    def search_batch(self, query_embeddings, k):
+        """Scatters the queries to every shard and merges the per-shard top-k; returns a list of (ids, scores)."""
+        if len(query_embeddings) == 0:
+            return []
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if not self.sharded:
+            return self.local.search_batch(queries, k)
+        results = self._call({shard: ("search_batch", self.name, (queries, k)) for shard in range(self.pool.shards)})
+        merged = []
+        for i in range(len(queries)):
+            ids = [tea_id for shard in results for tea_id in results[shard][i][0]]
+            scores = [score for shard in results for score in results[shard][i][1]]
+            top = sorted(range(len(ids)), key=lambda j: -scores[j])[:k]
+            merged.append(([ids[j] for j in top], [scores[j] for j in top]))
+        return merged
+
+    def metrics(self):
+        report = {"sharded": self.sharded, "min_rows": self.min_rows, "repairs": self.repairs}
+        if self.sharded:
+            report.update(self.pool.metrics())
+        return report
+
+    def drop(self):
+        if not self.sharded:
+            self.local.drop()
+            return
+        self.pool.scatter({shard: ("drop", self.name, ()) for shard in range(self.pool.shards)})
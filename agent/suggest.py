@@ -0,0 +1,84 @@
+import os
+import heapq
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def normalize(text):
+    """Lowercases, strips accents and collapses whitespace, so "Rooibos " and "rooïbos" match."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+class SuggestIndex:
+    """Prefix index over tea names, types and flavors for typeahead.
+
+    Suggestions are ranked once at build time by weight (the tea's
+    `popularity` field for names, the number of teas for types and flavors)
+    and stored in that order. Every word start of a suggestion is a key in a
+    sorted array, so "dra" finds "Jasmine Dragon Pearls". A lookup is a
+    bisect for the key range plus the n best-ranked entries in it. Prefixes of
+    up to `precompute` characters, whose ranges are the widest, are answered
+    from a table built with the index.
+    """
+
+    def __init__(self, limit=None, precompute=None):
+        self.limit = int(limit) if limit is not None else int(os.getenv("SUGGEST_LIMIT", "10"))
+        self.precompute = int(precompute) if precompute is not None else int(os.getenv("SUGGEST_PRECOMPUTE_CHARS", "2"))
+        self.entries = []  # (text, kind, tea_id), best first
+        self.keys = []  # sorted word-start keys
+        self.entry_of = []  # entry rank of each key
+        self._top = {}  # short prefix -> best entry ranks
+
+    @classmethod
+    def from_catalog(cls, catalog, **kwargs):
+        index = cls(**kwargs)
+        type_counts = Counter(t for t in catalog.columns['type'] if t)
+        flavor_counts = Counter(f for flavors in catalog.columns['flavors'] for f in flavors or ())
+        weighted = []
+        for row, (tea_id, name) in enumerate(zip(catalog.ids, catalog.columns['name'])):
+            popularity = catalog.extras.get(row, {}).get('popularity', 1)
+            weighted.append((popularity, name, "name", tea_id))
+        weighted += [(count, text, "type", None) for text, count in type_counts.items()]
+        weighted += [(count, text, "flavor", None) for text, count in flavor_counts.items()]
+        weighted.sort(key=lambda e: (-e[0], len(e[1]), e[1]))
+        index._build([(text, kind, tea_id) for _, text, kind, tea_id in weighted])
+        return index
+
+    def _build(self, entries):
+        self.entries = entries
+        pairs = []
+        for rank, (text, _, _) in enumerate(entries):
+            words = normalize(text).split(" ")
+            for i in range(len(words)):
+                pairs.append((" ".join(words[i:]), rank))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.entry_of = [rank for _, rank in pairs]
+        top = {}
+        for key, rank in pairs:
+            for length in range(1, min(self.precompute, len(key)) + 1):
+                top.setdefault(key[:length], set()).add(rank)
+        self._top = {prefix: sorted(ranks)[:self.limit] for prefix, ranks in top.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, prefix, n=None):
+        """The best n (at most limit) suggestions starting with prefix, as dicts with text, kind and tea_id."""
+        n = min(n or self.limit, self.limit)
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= self.precompute:
+            ranks = self._top.get(prefix, [])[:n]
+        else:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + "\uffff", lo)
+            ranks = heapq.nsmallest(n, set(self.entry_of[lo:hi]))
+        return [{"text": text, "kind": kind, "tea_id": tea_id} for text, kind, tea_id in (self.entries[r] for r in ranks)]
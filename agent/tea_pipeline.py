@@ -0,0 +1,704 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+from agent.catalog import TeaCatalog, IndexVersion, VersionedIndex
+from agent.ingest import iter_catalog, batched, stream_embedded_catalog
+from agent.indexes import NumpyIndex, ChromaIndex
+from agent.sharding import ShardedIndex
+from agent.reranker import LLMReranker
+from agent.context import ContextBuilder, trim_description
+from agent.profiling import RequestProfiler, active_session, profiled
+from agent.semantic_cache import SemanticCache
+from agent.user_profiles import UserProfileStore
+from agent.suggest import SuggestIndex
+from agent.sessions import SessionStore
+from agent.deadline import GenerationGuard, call_timeout, is_timeout
+
+load_dotenv()
+
+RAG_PROMPT = """Context:
+{context}
+
+User's Request: "{query}"
+
+Instructions:
+- Recommend the top {n} teas from the provided context.
+- Keep the response concise and friendly.
+
+Response:"""
+
+INVENTORY_PROMPT = """Below is our current inventory of tea blends:
+
+{context}
+
+User's Request: "{query}"
+
+Task:
+1. Identify the top {n} best matching teas from the inventory above.
+2. Explain why each tea is a good fit for the user's specific request.
+
+Response:"""
+
+STRUCTURED_PROMPT = """Context:
+{context}
+
+User's Request: "{query}"
+
+Instructions:
+- Return the ids (shown in brackets) of the top {n} teas from the provided context, best match first.
+
+Response:"""
+
+HISTORY_PROMPT = """Conversation so far:
+{history}
+{prompt}"""
+
+
+def load_system_context(default="You are a helpful tea assistant."):
+    """Loads the shared TeaBot persona from agent/system_context.txt."""
+    context_path = os.path.join(os.path.dirname(__file__), 'system_context.txt')
+    if os.path.exists(context_path):
+        with open(context_path, 'r') as f:
+            return f.read().strip()
+    return default
+
+
+def render_document(tea):
+    """The natural-language text every index embeds for a tea."""
+    return (f"The {tea['name']} is a {tea['type']} tea. It has a flavor profile featuring {', '.join(tea['flavors'])}. "
+            f"{tea['description']} This tea has a {tea['caffeine']} caffeine level.")
+
+
+def recommendation_schema(candidate_ids, n):
+    """JSON schema that only admits up to n distinct ids from the retrieved candidates."""
+    return {
+        "type": "object",
+        "properties": {
+            "tea_ids": {
+                "type": "array",
+                "items": {"type": "string", "enum": list(candidate_ids)},
+                "maxItems": n
+            }
+        },
+        "required": ["tea_ids"],
+        "additionalProperties": False
+    }
+
+
+def schema_token_budget(candidate_ids, n):
+    """Upper bound on output tokens for a recommendation_schema answer.
+
+    Ids are counted at a token per character (ids like "tea-0042" split into
+    short tokens), plus quotes, separator and whitespace the model may put
+    between items. Reasoning tokens are the generator's to add on top.
+    """
+    longest = max((len(tea_id) for tea_id in candidate_ids), default=0)
+    return 32 + n * (longest + 8)
+
+
+class LRUCache:
+    """A small thread-safe LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = int(maxsize)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class StageStats:
+    """Cumulative call counts and latencies per pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    @contextmanager
+    def time(self, stage):
+        session = active_session()
+        start = time.perf_counter()
+        try:
+            if session is None:
+                yield
+            else:
+                with session.stage(stage):
+                    yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                count, total = self._totals.get(stage, (0, 0.0))
+                self._totals[stage] = (count + 1, total + elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                stage: {"count": count, "avg_ms": round(total / count * 1000, 3)}
+                for stage, (count, total) in self._totals.items()
+            }
+
+
+class TeaPipeline:
+    """The shared load -> embed -> retrieve -> prompt -> generate flow behind every TeaBot agent.
+
+    Agents are configurations of this class: an embedding provider (or None
+    for inventory-in-prompt modes), an index backend ("numpy", "chroma" or
+    None) and a generator (or None for search-only modes). Catalog versions,
+    embedding reuse, query-embedding caching and stage timings live here so
+    they apply to every mode.
+    """
+
+    data_path = 'data/mock_tea_data.json'
+    prompt_template = RAG_PROMPT
+    default_system_context = "You are a helpful tea assistant."
+
+    def __init__(self, embedder=None, index_backend="numpy", generator=None, retrieval_n=None,
+                 embeddings_path=None, collection_name="tea_inventory", chroma_client=None, reranker=None):
+        self.embedder = embedder
+        # INDEX_BACKEND (numpy, chroma or sharded) overrides the mode's default index
+        self.index_backend = (os.getenv("INDEX_BACKEND") or index_backend) if embedder is not None else None
+        self.generator = generator
+        # RERANK=llm turns on the LLM rerank stage for any retrieval mode that has a generator
+        if reranker is None and os.getenv("RERANK", "").lower() == "llm" and generator is not None and self.index_backend:
+            reranker = LLMReranker(generator)
+        self.reranker = reranker
+        self.retrieval_n = int(retrieval_n) if retrieval_n is not None else int(os.getenv("RETRIEVAL_N", "3"))
+        self.system_context = load_system_context(self.default_system_context)
+        # When set, embeddings stored alongside the catalog are reused instead of recomputed
+        self.embeddings_path = embeddings_path
+        self.collection_name = collection_name
+        self.chroma_client = chroma_client
+
+        # Each catalog load becomes a new index version; queries pin the
+        # version they started on so reloads never disturb in-flight requests.
+        self.index = VersionedIndex(on_retire=self._drop_version)
+        self._reload_lock = threading.Lock()
+        self._next_version = 1
+
+        self.ingest_batch_size = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+        self.query_cache = LRUCache(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+        self.generation_guard = GenerationGuard()
+        # Near-duplicate queries are answered from earlier results (SEMANTIC_CACHE_SIZE=0 disables)
+        self.semantic_cache = SemanticCache()
+        self.stats = StageStats()
+        # RAG context is assembled from snippets rendered at index time, under CONTEXT_TOKEN_BUDGET
+        self.context_builder = ContextBuilder()
+        self.profiler = RequestProfiler()
+        # Per-user preference vectors from feedback, blended into retrieval when a user_id is given
+        self.user_profiles = UserProfileStore(
+            path=os.getenv("USER_PROFILE_PATH") or os.path.join("user_profiles", collection_name)
+        )
+        # Multi-turn conversations by session_id, with history compacted to SESSION_HISTORY_TOKENS
+        self.sessions = SessionStore()
+        # fallback_ranker(query, deadline, user_id) -> ids, for inventory modes whose hits are not ranked
+        self.fallback_ranker = None
+
+        if not os.path.exists(self.catalog_path):
+            raise FileNotFoundError(f"Data file not found: {self.catalog_path}")
+
+    @property
+    def catalog_path(self):
+        """The file a reload reads from (and a catalog watcher should poll)."""
+        return self.embeddings_path or self.data_path
+
+    @property
+    def catalog_version(self):
+        current = self.index.current
+        return current.version if current is not None else 0
+
+    @property
+    def teas(self):
+        """The live TeaCatalog (None until the first index is built)."""
+        current = self.index.current
+        return current.catalog if current is not None else None
+
+    # --- Index lifecycle ---
+
+    def build_index(self):
+        """Builds and publishes the first index version from the catalog file."""
+        with self._reload_lock:
+            self._publish()
+
+    def reload(self):
+        """Re-reads the catalog, embeds only new or changed teas and swaps the index in."""
+        with self._reload_lock:
+            snapshot = self._publish()
+            print(f"Catalog reloaded as version {snapshot.version} with {len(snapshot.catalog)} entries.")
+            return snapshot.version
+
+    def reload_async(self):
+        """Runs reload() in a background thread; queries keep using the old version until it finishes."""
+        thread = threading.Thread(target=self.reload, name="catalog-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def _publish(self):
+        snapshot = self._build_version(iter_catalog(self.catalog_path))
+        # The typeahead index is rebuilt with every version and swapped in with it
+        snapshot.suggestions = SuggestIndex.from_catalog(snapshot.catalog)
+        self.index.publish(snapshot)
+        return snapshot
+
+    def _make_index(self, version, catalog):
+        name = f"{self.collection_name}_v{version}"
+        if self.index_backend == "chroma":
+            return ChromaIndex(name, client=self.chroma_client)
+        if self.index_backend == "numpy":
+            return NumpyIndex(name)
+        if self.index_backend == "sharded":
+            # A shard that loses its partition (its worker died) is re-embedded from this version's catalog
+            return ShardedIndex(name, rebuild=lambda ids: self.embedder.embed_documents(
+                [render_document(catalog.get(tea_id)) for tea_id in ids]))
+        raise ValueError(f"Unknown index backend: {self.index_backend}")
+
+    def _build_version(self, teas):
+        version = self._next_version
+        self._next_version += 1
+        catalog = TeaCatalog()
+        if self.index_backend is None:
+            for tea in teas:
+                catalog.append(tea)
+            return IndexVersion(version, catalog)
+
+        # Stream the catalog in fixed-size batches: rows go into the columnar
+        # catalog, vectors straight into the index, and nothing else is kept.
+        # Vectors of unchanged teas are copied over from the live version
+        # instead of being re-embedded.
+        previous = self.index.current
+        index = self._make_index(version, catalog)
+        embedded = 0
+        # Providers that stand in for the model the catalog was embedded with
+        # (OnnxEmbeddingProvider) are checked against a few stored vectors first,
+        # taken only from rows whose key says they were embedded from the same text
+        verify = getattr(self.embedder, "verify", None) if previous is None else None
+        samples = []
+        for batch in batched(teas, self.ingest_batch_size):
+            keys = [self.embedder.document_key(render_document(tea)) for tea in batch]
+            embeddings = [None] * len(batch)
+            carried = []
+            for i, (tea, key) in enumerate(zip(batch, keys)):
+                catalog.append(tea, key, self.context_builder.render(tea))
+                # Stored embeddings are only trusted when their key shows they were computed from
+                # this exact text and model; rows without a key predate keys (and the current
+                # document template), so they are embedded again
+                if 'embedding' in tea and tea.get('embedding_key') == key:
+                    embeddings[i] = tea['embedding']
+                    if verify is not None and len(samples) < 4:
+                        samples.append((render_document(tea), tea['embedding']))
+                elif previous is not None and previous.catalog.embedding_key(tea['id']) == key:
+                    carried.append(i)
+            if carried:
+                for i, embedding in zip(carried, previous.index.get_embeddings([batch[i]['id'] for i in carried])):
+                    embeddings[i] = embedding
+
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            if missing:
+                with self.stats.time("embed_documents"):
+                    documents = [render_document(batch[i]) for i in missing]
+                    for i, embedding in zip(missing, self.embedder.embed_documents(documents)):
+                        embeddings[i] = embedding
+                embedded += len(missing)
+            if samples and verify is not None:
+                verify([document for document, _ in samples], [embedding for _, embedding in samples])
+                verify = None
+            index.add([tea['id'] for tea in batch], embeddings)
+
+        if verify is not None:
+            print(f"No stored embeddings match {self.embedder.model}'s document keys; nothing to verify it against.")
+        if embedded:
+            print(f"Embedded {embedded} new or changed teas (reused {len(catalog) - embedded}).")
+        return IndexVersion(version, catalog, index)
+
+    def _drop_version(self, snapshot):
+        """Frees a retired index once no request is using it."""
+        if snapshot.index is None:
+            return
+        try:
+            snapshot.index.drop()
+        except Exception as e:
+            print(f"Could not drop index {snapshot.index.name}: {e}")
+
+    # --- Query path ---
+
+    def embed_query(self, text, deadline=None):
+        embedding = self.query_cache.get(text)
+        if embedding is None:
+            with self.stats.time("embed_query"):
+                embedding = self.embedder.embed_query(text, timeout=call_timeout(deadline, None))
+            self.query_cache.put(text, embedding)
+        return embedding
+
+    @profiled("retrieve")
+    def retrieve(self, query, k=None, deadline=None, user_id=None, snapshot=None):
+        """Returns (tea, score) pairs for the k best matches; inventory modes return every tea unscored.
+
+        With a user_id that has a profile, the catalog is scored against the
+        query blended with the user's preference vector. A snapshot pinned
+        by the caller is searched instead of the live version.
+        """
+        k = k or self.retrieval_n
+        with self.index.use(snapshot) as snapshot:
+            if snapshot.index is None:
+                return [(tea, None) for tea in snapshot.catalog]
+            query_embedding = self.user_profiles.blend(user_id, self.embed_query(query, deadline))
+            with self.stats.time("retrieve"):
+                ids, scores = snapshot.index.search(query_embedding, k)
+                # Only the top-k rows are materialized as dicts
+                return [(snapshot.catalog.get(tea_id), score) for tea_id, score in zip(ids, scores)]
+
+    def embed_queries(self, texts):
+        """Embeds many queries, sending only cache misses to the embedder, in batches."""
+        embeddings = [self.query_cache.get(text) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            with self.stats.time("embed_queries"):
+                for i, embedding in zip(missing, self.embedder.embed_queries([texts[i] for i in missing])):
+                    embeddings[i] = embedding
+                    self.query_cache.put(texts[i], embedding)
+        return embeddings
+
+    def retrieve_batch(self, queries, k=None, snapshot=None):
+        """retrieve() for many queries with one batched embedding call and one batched index search."""
+        k = k or self.retrieval_n
+        with self.index.use(snapshot) as snapshot:
+            if snapshot.index is None:
+                teas = [(tea, None) for tea in snapshot.catalog]
+                return [list(teas) for _ in queries]
+            query_embeddings = self.embed_queries(queries)
+            with self.stats.time("retrieve_batch"):
+                return [
+                    [(snapshot.catalog.get(tea_id), score) for tea_id, score in zip(ids, scores)]
+                    for ids, scores in snapshot.index.search_batch(query_embeddings, k)
+                ]
+
+    def record_feedback(self, user_id, tea_id, event):
+        """Folds a feedback event into user_id's profile; returns the profile's event count, or None for an unknown tea."""
+        if self.index_backend is None:
+            raise ValueError("Personalization needs an embedding index")
+        with self.index.use() as snapshot:
+            if tea_id not in snapshot.catalog:
+                return None
+            tea_embedding = snapshot.index.get_embeddings([tea_id])[0]
+        return self.user_profiles.update(user_id, tea_embedding, event)
+
+    def candidates(self, query, deadline=None, user_id=None, generate=True, snapshot=None):
+        """The final retrieval_n hits: plain top-k, or top rerank pool_size reordered by the reranker.
+
+        With generate=True, reranking leaves a typical generation's worth of the deadline for what follows.
+        """
+        if self.reranker is None or self.index_backend is None:
+            return self.retrieve(query, deadline=deadline, user_id=user_id, snapshot=snapshot)
+        hits = self.retrieve(query, k=max(self.reranker.pool_size, self.retrieval_n), deadline=deadline,
+                             user_id=user_id, snapshot=snapshot)
+        reserve = self.generation_guard.latency_estimate if generate else 0.0
+        with self.stats.time("rerank"):
+            return self.reranker.rerank(query, hits, self.retrieval_n, deadline, reserve)
+
+    def build_context(self, hits, show_id=False, snapshot=None):
+        """Returns (context, included_hits); RAG context is cut to the token budget, inventory context is not.
+
+        Snippets come from the snapshot the hits were retrieved from.
+        """
+        if self.index_backend is None:
+            return json.dumps([tea for tea, _ in hits], indent=2), hits
+        with self.index.use(snapshot) as snapshot:
+            catalog = snapshot.catalog
+            return self.context_builder.build(hits, lambda tea: catalog.snippet(tea['id']), show_id)
+
+    def build_prompt(self, query, hits, history="", snapshot=None):
+        context, _ = self.build_context(hits, snapshot=snapshot)
+        prompt = self.prompt_template.format(context=context, query=query, n=self.retrieval_n)
+        return HISTORY_PROMPT.format(history=history, prompt=prompt) if history else prompt
+
+    def _with_previous(self, session, user_query, hits, snapshot):
+        """Adds the teas a follow-up refers to ("less caffeinated than that") after the fresh hits.
+
+        They come from the request's catalog by id rather than a new search; the
+        fresh hits keep the lead, so fallbacks still return new results.
+        """
+        if session is None or not session.is_follow_up(user_query):
+            return hits
+        self.sessions.follow_ups += 1
+        seen = {tea['id'] for tea, _ in hits}
+        return hits + [(tea, None) for tea in self.lookup(session.last_tea_ids, snapshot) if tea['id'] not in seen]
+
+    def _add_turn(self, session, user_query, answer, structured, hits, snapshot):
+        if structured:
+            tea_ids = answer
+            reply = "Recommended " + ", ".join(tea['name'] for tea in self.lookup(tea_ids, snapshot))
+        else:
+            # Prose answers name teas the model saw; the top hits stand in for what it recommended
+            tea_ids = [tea['id'] for tea, _ in hits[:self.retrieval_n]]
+            reply = trim_description(answer, 64)
+        session.add_turn(user_query, reply, tea_ids)
+
+    def generate(self, prompt):
+        with self.stats.time("generate"):
+            return self.generator.generate(self.system_context, prompt)
+
+    def suggest(self, prefix, n=None):
+        """Typeahead suggestions for prefix from the live version's prefix index; never calls a model."""
+        current = self.index.current
+        if current is None or current.suggestions is None:
+            return []
+        return current.suggestions.lookup(prefix, n)
+
+    def lookup(self, tea_ids, snapshot=None):
+        """Returns the catalog entries for tea_ids, skipping ids not in the catalog.
+
+        Ids are looked up in the given snapshot (the one the request that
+        produced them pinned), or in the live version without one.
+        """
+        with self.index.use(snapshot) as snapshot:
+            catalog = snapshot.catalog
+            return [catalog.get(tea_id) for tea_id in tea_ids if tea_id in catalog]
+
+    @profiled("recommend")
+    def recommend(self, user_query, structured=False, user_id=None, session_id=None, snapshot=None):
+        """Runs the full pipeline and returns the generated answer.
+
+        With structured=True the generator is constrained to a JSON schema
+        over the retrieved candidates' ids and capped at the tokens that
+        schema needs; the validated list of tea ids is returned instead of prose.
+        If generation fails or its output cannot be parsed, the retrieval
+        ranking is returned instead, so structured calls never raise.
+        Answers are served from the semantic cache when a close enough query
+        was already answered against the same catalog version; personalized
+        requests (a user_id with a profile) bypass it.
+        With a session_id, the compacted conversation so far is sent with the
+        prompt and the turn is added to it; a session's follow-ups bypass the
+        semantic cache too, since their answer depends on the history.
+        Every stage reads the index version pinned at the start (or the
+        given snapshot), so a reload mid-request cannot mix two catalogs.
+        """
+        with self.index.use(snapshot) as snapshot:
+            session = self.sessions.get(session_id) if session_id is not None else None
+            history = session.history() if session is not None else ""
+            use_cache = (self.semantic_cache.enabled and self.embedder is not None and not history
+                         and not self.user_profiles.has_profile(user_id))
+            if use_cache:
+                query_embedding = self.embed_query(user_query)
+                version = snapshot.version
+                cached = self.semantic_cache.get(query_embedding, version, mode=structured)
+                if cached is not None:
+                    answer = list(cached) if structured else cached
+                    if session is not None:
+                        self._add_turn(session, user_query, answer, structured, [], snapshot)
+                    return answer
+
+            hits = self._with_previous(
+                session, user_query, self.candidates(user_query, user_id=user_id, snapshot=snapshot), snapshot)
+            if structured:
+                try:
+                    answer, degraded = self._recommend_ids(user_query, hits, history=history, snapshot=snapshot)
+                except Exception as e:
+                    print(f"Generation failed, serving retrieval results: {e}")
+                    degraded = "error"
+                if degraded is not None:
+                    answer = self._fallback_ids(user_query, hits, user_id=user_id)
+                    # A fallback is not the model's answer; don't serve it to similar queries
+                    use_cache = False
+            else:
+                with self.stats.time("prompt"):
+                    prompt = self.build_prompt(user_query, hits, history, snapshot)
+                try:
+                    answer = self.generate(prompt)
+                except Exception as e:
+                    return f"Error during generation: {e}"
+
+            if use_cache:
+                self.semantic_cache.put(query_embedding, answer, version, mode=structured)
+            if session is not None:
+                self._add_turn(session, user_query, answer, structured, hits, snapshot)
+            return answer
+
+    def recommend_ranked(self, user_query, deadline=None, user_id=None, session_id=None, snapshot=None):
+        """Retrieval-only answer: the top retrieval_n ids in ranked order, with no generation."""
+        with self.index.use(snapshot) as snapshot:
+            session = self.sessions.get(session_id) if session_id is not None else None
+            hits = self.candidates(user_query, deadline, user_id, generate=False, snapshot=snapshot)
+            tea_ids = [tea['id'] for tea, _ in hits[:self.retrieval_n]]
+            if session is not None:
+                self._add_turn(session, user_query, tea_ids, True, hits, snapshot)
+            return tea_ids
+
+    @profiled("recommend_within")
+    def recommend_within(self, user_query, deadline, user_id=None, session_id=None, snapshot=None):
+        """Structured recommendation bounded by deadline.
+
+        Returns (tea_ids, degraded). degraded is None when the LLM chose the
+        ids. Otherwise it names why the vector-ranked top retrieval_n ids were
+        returned without generating: "deadline" (not enough budget left for a
+        typical generation), "saturated" (too many generations in flight),
+        "circuit_open" (the model server keeps failing), "timeout", "error"
+        or "malformed" (the output was truncated or not the expected JSON).
+        A session_id makes it a conversational turn, as in recommend(), and
+        a snapshot is read throughout, as there.
+        """
+        with self.index.use(snapshot) as snapshot:
+            session = self.sessions.get(session_id) if session_id is not None else None
+            history = session.history() if session is not None else ""
+            use_cache = (self.semantic_cache.enabled and self.embedder is not None and not history
+                         and not self.user_profiles.has_profile(user_id))
+            if use_cache:
+                query_embedding = self.embed_query(user_query, deadline)
+                version = snapshot.version
+                cached = self.semantic_cache.get(query_embedding, version, mode=True)
+                if cached is not None:
+                    tea_ids = list(cached)
+                    if session is not None:
+                        self._add_turn(session, user_query, tea_ids, True, [], snapshot)
+                    return tea_ids, None
+
+            hits = self._with_previous(
+                session, user_query, self.candidates(user_query, deadline, user_id, snapshot=snapshot), snapshot)
+            degraded = self.generation_guard.admit(deadline)
+            if degraded is None:
+                start = time.perf_counter()
+                try:
+                    tea_ids, degraded = self._recommend_ids(user_query, hits, deadline, history, snapshot)
+                except Exception as e:
+                    self.generation_guard.release(time.perf_counter() - start, ok=False)
+                    degraded = "timeout" if is_timeout(e) else "error"
+                    print(f"Generation failed ({degraded}), serving retrieval results: {e}")
+                else:
+                    # The server answered, even if the answer was unusable
+                    self.generation_guard.release(time.perf_counter() - start, ok=True)
+                if degraded is None:
+                    if use_cache:
+                        self.semantic_cache.put(query_embedding, tea_ids, version, mode=True)
+                    if session is not None:
+                        self._add_turn(session, user_query, tea_ids, True, hits, snapshot)
+                    return tea_ids, None
+            tea_ids = self._fallback_ids(user_query, hits, deadline, user_id)
+            if session is not None:
+                self._add_turn(session, user_query, tea_ids, True, hits, snapshot)
+            return tea_ids, degraded
+
+    def _fallback_ids(self, user_query, hits, deadline=None, user_id=None):
+        """The ids served instead of a generated pick: the top retrieval_n hits."""
+        if self.index_backend is None and self.fallback_ranker is not None:
+            # Inventory order is not a ranking; borrow one from a retrieval pipeline
+            return self.fallback_ranker(user_query, deadline, user_id)
+        return [tea['id'] for tea, _ in hits[:self.retrieval_n]]
+
+    def recommend_batch(self, queries, generate=True, snapshot=None):
+        """Yields (tea_ids, degraded) for each query, in order, for bulk clients.
+
+        Queries are embedded and retrieved BATCH_CHUNK_SIZE at a time. With
+        generate=True the structured LLM pick runs for each query on at most
+        BATCH_GENERATION_WORKERS threads, and each generation takes a
+        background slot of the generation guard: batch work waits for a slot
+        rather than degrading, and never takes the last
+        BATCH_GENERATION_RESERVE slots (default 1) from interactive requests.
+        A failed generation falls back to the retrieval order ("timeout",
+        "error" or "malformed"), as does every generation while the circuit
+        breaker is open ("circuit_open"). With generate=False (or no
+        generator) the vector ranking is returned directly. The reranker is
+        not applied. Each chunk is retrieved and generated against one
+        pinned index version (the given snapshot, if any).
+        """
+        chunk_size = int(os.getenv("BATCH_CHUNK_SIZE", "64"))
+        workers = int(os.getenv("BATCH_GENERATION_WORKERS", "2"))
+        reserve = int(os.getenv("BATCH_GENERATION_RESERVE", "1"))
+        generate = generate and self.generator is not None
+
+        def generate_ids(query, hits, snapshot):
+            degraded = self.generation_guard.admit_background(reserve)
+            if degraded is not None:
+                return [tea['id'] for tea, _ in hits[:self.retrieval_n]], degraded
+            start = time.perf_counter()
+            try:
+                result = self._recommend_ids(query, hits, snapshot=snapshot)
+            except Exception:
+                self.generation_guard.release_background(time.perf_counter() - start, ok=False)
+                raise
+            self.generation_guard.release_background(time.perf_counter() - start, ok=True)
+            return result
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(queries), chunk_size):
+                chunk = queries[start:start + chunk_size]
+                with self.index.use(snapshot) as pinned:
+                    hits_list = self.retrieve_batch(chunk, snapshot=pinned)
+                    if not generate:
+                        for hits in hits_list:
+                            yield [tea['id'] for tea, _ in hits[:self.retrieval_n]], None
+                        continue
+                    futures = [executor.submit(generate_ids, query, hits, pinned)
+                               for query, hits in zip(chunk, hits_list)]
+                    for future, hits in zip(futures, hits_list):
+                        try:
+                            yield future.result()
+                        except Exception as e:
+                            yield [tea['id'] for tea, _ in hits[:self.retrieval_n]], "timeout" if is_timeout(e) else "error"
+
+    def _recommend_ids(self, user_query, hits, deadline=None, history="", snapshot=None):
+        """Returns (tea_ids, degraded): the model's pick, or the retrieval ranking and "malformed".
+
+        A reply cut off by the token cap, or one that is not the schema's
+        JSON, falls back to the retrieval ranking; generation errors raise.
+        """
+        with self.stats.time("prompt"):
+            context, included = self.build_context(hits, show_id=True, snapshot=snapshot)
+            # Only ids the model can actually see in the context are allowed
+            candidate_ids = [tea['id'] for tea, _ in included]
+            prompt = STRUCTURED_PROMPT.format(context=context, query=user_query, n=self.retrieval_n)
+            if history:
+                prompt = HISTORY_PROMPT.format(history=history, prompt=prompt)
+            schema = recommendation_schema(candidate_ids, self.retrieval_n)
+        # Constrained decoding should guarantee the shape, but a reply truncated at the
+        # token cap does not parse; drop duplicates and anything outside the candidates too
+        allowed = set(candidate_ids)
+        tea_ids = []
+        try:
+            with self.stats.time("generate"):
+                answer = self.generator.generate_json(
+                    self.system_context, prompt, schema, schema_token_budget(candidate_ids, self.retrieval_n),
+                    timeout=call_timeout(deadline, None)
+                )
+            for tea_id in answer["tea_ids"]:
+                if tea_id in allowed and tea_id not in tea_ids:
+                    tea_ids.append(tea_id)
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"Unusable structured output ({type(e).__name__}: {e}), serving retrieval results.")
+            return [tea['id'] for tea, _ in hits[:self.retrieval_n]], "malformed"
+        return tea_ids[:self.retrieval_n], None
+
+
+def write_embedded_catalog(embedder, out_path, data_path='data/mock_tea_data.json'):
+    """Embeds the raw catalog into out_path, reusing embeddings from the previous run for unchanged teas."""
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    embedded, reused = stream_embedded_catalog(embedder, render_document, out_path, data_path)
+    print(f"Embedded {embedded} new or changed teas (reused {reused}) using {embedder.model}; saved to {out_path}")
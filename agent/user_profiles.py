@@ -0,0 +1,133 @@
+import os
+import shelve
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How strongly each feedback event pulls a profile toward (or away from) the tea
+EVENT_WEIGHTS = {
+    "purchase": 1.0,
+    "like": 0.7,
+    "click": 0.2,
+    "dislike": -0.7
+}
+
+
+class UserProfileStore:
+    """Running preference vectors per user, updated incrementally from feedback.
+
+    A profile is an exponentially decayed sum of the embeddings of teas the
+    user interacted with, weighted by EVENT_WEIGHTS, so each event is one
+    O(dim) update and never a recompute. At most maxsize profiles are kept
+    in memory; the least recently used is written to a shelve file at path
+    and read back on its next use. save() persists everything still in memory.
+    """
+
+    def __init__(self, path=None, maxsize=None, decay=None, weight=None):
+        self.path = path or os.getenv("USER_PROFILE_PATH", "user_profiles/profiles")
+        self.maxsize = int(maxsize) if maxsize is not None else int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+        self.decay = float(decay) if decay is not None else float(os.getenv("USER_PROFILE_DECAY", "0.9"))
+        # Share of the blended retrieval vector a fully established profile contributes
+        self.weight = float(weight) if weight is not None else float(os.getenv("USER_PROFILE_WEIGHT", "0.3"))
+        self._profiles = OrderedDict()  # user id -> {"vector", "events"}
+        self._lock = threading.Lock()
+        self._shelf = None
+        self.loads = 0
+        self.evictions = 0
+
+    def _store(self):
+        if self._shelf is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._shelf = shelve.open(self.path)
+        return self._shelf
+
+    def _profile(self, user_id):
+        """The in-memory profile for user_id, loading it from disk if it was evicted (lock held)."""
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            self._profiles.move_to_end(user_id)
+            return profile
+        store = self._store()
+        if user_id not in store:
+            return None
+        profile = store[user_id]
+        self.loads += 1
+        self._remember(user_id, profile)
+        return profile
+
+    def _remember(self, user_id, profile):
+        self._profiles[user_id] = profile
+        self._profiles.move_to_end(user_id)
+        while len(self._profiles) > self.maxsize:
+            old_id, old_profile = self._profiles.popitem(last=False)
+            self._store()[old_id] = old_profile
+            self.evictions += 1
+
+    def update(self, user_id, tea_embedding, event):
+        """Folds one feedback event for a tea (by its embedding) into the user's profile."""
+        if event not in EVENT_WEIGHTS:
+            raise ValueError(f"Unknown feedback event: {event}")
+        vector = np.asarray(tea_embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._lock:
+            profile = self._profile(user_id)
+            if profile is None or profile["vector"].shape != vector.shape:
+                profile = {"vector": np.zeros_like(vector), "events": 0}
+            profile = {
+                "vector": self.decay * profile["vector"] + EVENT_WEIGHTS[event] * vector,
+                "events": profile["events"] + 1
+            }
+            self._remember(user_id, profile)
+            return profile["events"]
+
+    def blend(self, user_id, query_embedding):
+        """The retrieval vector for a user: the query plus the profile, or the query unchanged without one.
+
+        The profile's share ramps up with its number of events, so one click
+        nudges results and an established history steers them. Both vectors
+        are normalized first, so the catalog is still scored in a single
+        cosine pass against one vector.
+        """
+        if user_id is None or self.weight <= 0:
+            return query_embedding
+        with self._lock:
+            profile = self._profile(user_id)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if profile is None or profile["vector"].shape != query.shape:
+            return query_embedding
+        norm = np.linalg.norm(profile["vector"])
+        if norm == 0:
+            return query_embedding
+        share = self.weight * profile["events"] / (profile["events"] + 2)
+        blended = (1 - share) * query / (np.linalg.norm(query) or 1.0) + share * profile["vector"] / norm
+        return blended.tolist()
+
+    def has_profile(self, user_id):
+        if user_id is None:
+            return False
+        with self._lock:
+            return self._profile(user_id) is not None
+
+    def save(self):
+        """Writes every in-memory profile to disk."""
+        with self._lock:
+            if not self._profiles:
+                return
+            store = self._store()
+            for user_id, profile in self._profiles.items():
+                store[user_id] = profile
+            store.sync()
+
+    def close(self):
+        self.save()
+        with self._lock:
+            if self._shelf is not None:
+                self._shelf.close()
+                self._shelf = None
+
+    def metrics(self):
+        with self._lock:
+            return {"in_memory": len(self._profiles), "loads": self.loads, "evictions": self.evictions}
@@ -0,0 +1,384 @@
+import os
+import sys
+import json
+import time
+import threading
+import anyio.to_thread
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse, FileResponse
+from pydantic import BaseModel
+from typing import List, Optional
+
+# Add project root to path to import agent
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.query_router import QueryRouter
+from agent.cache_warmer import CacheWarmer, RequestLog
+from agent.catalog import CatalogWatcher
+from agent.deadline import Deadline, DeadlineExceeded
+from agent.batch_jobs import BatchJobs, batch_results
+from agent.neighbors import NeighborGraph
+
+# Request and Response models
+class QueryRequest(BaseModel):
+    query: str
+    budget_ms: Optional[int] = None
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+
+class FeedbackRequest(BaseModel):
+    user_id: str
+    tea_id: str
+    event: str
+
+class Suggestion(BaseModel):
+    text: str
+    kind: str
+    tea_id: Optional[str] = None
+
+class SuggestResponse(BaseModel):
+    query: str
+    suggestions: List[Suggestion]
+
+class SimilarTea(BaseModel):
+    id: str
+    name: str
+    type: str
+    score: float
+
+class SimilarResponse(BaseModel):
+    tea_id: str
+    name: str
+    similar: List[SimilarTea]
+
+class BatchRequest(BaseModel):
+    queries: List[str]
+    generate: bool = True
+
+class ProfileRequest(BaseModel):
+    sample_rate: float
+    reset: bool = False
+
+class RecommendResponse(BaseModel):
+    names: List[str]
+    degraded: bool = False
+    degraded_reason: Optional[str] = None
+    mode: Optional[str] = None
+
+# Default end-to-end latency budget per /recommend call
+REQUEST_BUDGET_MS = int(os.getenv("REQUEST_BUDGET_MS", "10000"))
+# Threads that run request handlers; requests beyond this many wait for a free one
+API_WORKER_THREADS = int(os.getenv("API_WORKER_THREADS", "40"))
+# Larger inputs go through /recommend/jobs instead of one streamed response
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+# Most suggestions or similar teas one call may ask for
+MAX_RESULTS = 100
+
+
+def load_eval_context():
+    # Look for evaluation context in the evaluation folder
+    context_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'evaluation', 'system_context_eval.txt')
+    if os.path.exists(context_path):
+        with open(context_path, 'r') as f:
+            return f.read().strip()
+    return "Output ONLY the requested JSON."
+
+
+async def arrival_time():
+    """When the request arrived: resolved on the event loop, before the handler waits for a worker thread."""
+    return time.monotonic()
+
+
+class Provider:
+    """What differs between the Ollama and OpenAI backends; everything else is shared by create_app().
+
+    build_recommender() returns the RAG pipeline and build_llm_recommender()
+    the full-inventory one used by the router. provider_stats(recommender)
+    adds the provider's own section(s) to /stats. build_model_warmer, when
+    given, returns a started warmer whose `ready` gates /health.
+    """
+
+    def __init__(self, name, build_recommender, build_llm_recommender, neighbors_path, provider_stats, build_model_warmer=None):
+        self.name = name
+        self.build_recommender = build_recommender
+        self.build_llm_recommender = build_llm_recommender
+        self.neighbors_path = neighbors_path
+        self.provider_stats = provider_stats
+        self.build_model_warmer = build_model_warmer
+
+
+class Service:
+    """The components one backend process serves from, created at startup."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.recommender = None
+        self.catalog_watcher = None
+        self.batch_jobs = None
+        self.neighbor_graph = None
+        self.neighbor_watcher = None
+        self.llm_recommender = None
+        self.query_router = None
+        self.cache_warmer = None
+        self.model_warmer = None
+        # Served queries, which the cache warmer replays (REQUEST_LOG_PATH= disables)
+        self.request_log = RequestLog()
+
+    def catalog_paths(self):
+        paths = [self.recommender.catalog_path]
+        if self.llm_recommender is not None and self.llm_recommender.catalog_path not in paths:
+            paths.append(self.llm_recommender.catalog_path)
+        return paths
+
+    def reload_catalogs(self):
+        self.recommender.reload()
+        if self.llm_recommender is not None:
+            self.llm_recommender.reload()
+        if self.cache_warmer is not None:
+            # Only answers whose candidate teas changed are generated again
+            self.cache_warmer.warm()
+
+    def start(self):
+        provider = self.provider
+        print(f"Initializing {provider.name} Recommender...")
+        self.recommender = provider.build_recommender()
+        self.recommender.build_vectordb()
+        self.recommender.system_context = load_eval_context()
+        if provider.build_model_warmer is not None:
+            self.model_warmer = provider.build_model_warmer(self.recommender)
+        print(f"{provider.name} Recommender initialized successfully.")
+        # ROUTER=1 sends attribute lookups to retrieval only and comparisons to the full-inventory LLM
+        if os.getenv("ROUTER", "1") == "1":
+            self.llm_recommender = provider.build_llm_recommender()
+            self.llm_recommender.system_context = self.recommender.system_context
+            self.query_router = QueryRouter(self.recommender, self.llm_recommender)
+        # Top logged queries are embedded and answered before /health reports ready (CACHE_WARM=0 skips this)
+        if os.getenv("CACHE_WARM", "1") == "1":
+            self.cache_warmer = CacheWarmer(self.recommender, self.query_router)
+            threading.Thread(target=self.cache_warmer.warm, name="cache-warm", daemon=True).start()
+        self.batch_jobs = BatchJobs(self.recommender)
+        # Pick up catalog edits without a restart (CATALOG_WATCH_INTERVAL=0 disables polling)
+        self.catalog_watcher = CatalogWatcher(self.catalog_paths(), self.reload_catalogs)
+        self.catalog_watcher.start()
+        # The neighbor graph file is swapped in whenever the offline job rewrites it
+        neighbors_path = os.getenv("NEIGHBORS_PATH", provider.neighbors_path)
+        self.neighbor_graph = NeighborGraph(neighbors_path)
+        self.neighbor_watcher = CatalogWatcher([neighbors_path], self.neighbor_graph.load)
+        self.neighbor_watcher.start()
+
+    def stop(self):
+        if self.catalog_watcher is not None:
+            self.catalog_watcher.stop()
+        if self.neighbor_watcher is not None:
+            self.neighbor_watcher.stop()
+        if self.model_warmer is not None:
+            self.model_warmer.stop()
+        if self.recommender is not None:
+            self.recommender.user_profiles.close()
+
+
+def create_app(provider):
+    """The TeaBot API for one model provider; the service is built on startup and kept on app.state.service.
+
+    Handlers that call into the pipeline are plain functions, so FastAPI runs
+    them on its worker threads (API_WORKER_THREADS) and a slow generation never
+    blocks the event loop. /recommend charges the time a request waited for a
+    thread to its budget.
+    """
+    app = FastAPI(title=f"TeaBot {provider.name} API")
+    service = app.state.service = Service(provider)
+
+    def ready_recommender():
+        if service.recommender is None:
+            raise HTTPException(status_code=503, detail="Recommender service is not ready")
+        return service.recommender
+
+    @app.on_event("startup")
+    async def startup_event():
+        anyio.to_thread.current_default_thread_limiter().total_tokens = API_WORKER_THREADS
+        try:
+            service.start()
+        except Exception as e:
+            print(f"Failed to initialize recommender during startup: {e}")
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        service.stop()
+
+    @app.get("/health")
+    async def health_check():
+        # Stays on the event loop so probes are answered even when every worker thread is busy
+        recommender = service.recommender
+        if recommender is None:
+            return {"status": "error", "message": "Recommender not initialized"}
+        if service.model_warmer is not None and not service.model_warmer.ready:
+            # Load balancers keep traffic away until the first request will not pay for a model load
+            raise HTTPException(status_code=503, detail="Models are warming up")
+        warmer = service.cache_warmer
+        if warmer is not None and not warmer.ready and warmer.error is None:
+            raise HTTPException(status_code=503, detail="Caches are warming up")
+        report = {"status": "ok", "catalog_version": recommender.catalog_version}
+        if warmer is not None and warmer.error is not None:
+            # A failed warm-up is reported rather than keeping the backend out of rotation; it serves cold
+            report["cache_warm_error"] = warmer.error
+        return report
+
+    @app.get("/stats")
+    def stats():
+        recommender = ready_recommender()
+        report = {
+            "stages": recommender.stats.snapshot(),
+            "query_cache": {"size": len(recommender.query_cache), "hits": recommender.query_cache.hits, "misses": recommender.query_cache.misses},
+            "semantic_cache": recommender.semantic_cache.metrics(),
+            "generation": recommender.generation_guard.metrics(),
+            "user_profiles": recommender.user_profiles.metrics(),
+            "sessions": recommender.sessions.metrics()
+        }
+        report.update(provider.provider_stats(recommender))
+        if recommender.reranker is not None:
+            report["reranker"] = recommender.reranker.metrics()
+        if service.cache_warmer is not None:
+            report["cache_warmer"] = service.cache_warmer.metrics()
+        if service.query_router is not None:
+            report["router"] = service.query_router.metrics()
+        current = recommender.index.current
+        if recommender.index_backend == "sharded" and current is not None:
+            # From the index, so stats never start the shard processes of an index still kept in-process
+            report["index_shards"] = current.index.metrics()
+        if service.model_warmer is not None:
+            report["model_warmer"] = service.model_warmer.metrics()
+        return report
+
+    @app.post("/admin/reload")
+    def reload_catalog():
+        recommender = ready_recommender()
+        # The new version is built in the background; queries keep using the current one until it is swapped in
+        threading.Thread(target=service.reload_catalogs, name="catalog-reload", daemon=True).start()
+        return {"status": "reloading", "catalog_version": recommender.catalog_version}
+
+    @app.get("/admin/profile")
+    def profile_summary():
+        return ready_recommender().profiler.summary()
+
+    @app.post("/admin/profile")
+    def configure_profile(request: ProfileRequest):
+        recommender = ready_recommender()
+        # Sampled requests write collapsed stacks and per-stage allocations to PROFILE_DIR
+        if request.reset:
+            recommender.profiler.reset()
+        recommender.profiler.sample_rate = min(max(request.sample_rate, 0.0), 1.0)
+        return recommender.profiler.summary()
+
+    @app.post("/recommend", response_model=RecommendResponse)
+    def recommend(request: QueryRequest, received_at: float = Depends(arrival_time)):
+        recommender = ready_recommender()
+
+        try:
+            query = request.query
+            print(f"Processing query: {query}")
+
+            # Structured mode: generation is constrained to a JSON schema over the retrieved tea ids.
+            # If the budget can't cover generation, or the model server is saturated or failing,
+            # the vector-ranked names come back instead, marked as degraded.
+            # The budget runs from arrival, so time spent queued for a worker thread counts against it
+            deadline = Deadline.from_ms(request.budget_ms or REQUEST_BUDGET_MS, started=received_at)
+            # One index version serves the whole request, so a reload can't rename or drop the picked teas
+            with recommender.index.use() as snapshot:
+                if service.query_router is not None:
+                    # Retrieval-only, RAG or full-inventory LLM, whichever is cheapest for this query
+                    tea_ids, degraded, mode = service.query_router.recommend_within(
+                        query, deadline, request.user_id, request.session_id, snapshot)
+                else:
+                    tea_ids, degraded = recommender.recommend_within(
+                        query, deadline, request.user_id, request.session_id, snapshot)
+                    mode = "rag"
+                llm_output_names = [tea['name'] for tea in recommender.lookup(tea_ids, snapshot)]
+            service.request_log.append(query, mode=mode, degraded=degraded,
+                                       ms=round((time.monotonic() - received_at) * 1000, 1))
+
+            return RecommendResponse(names=llm_output_names, degraded=degraded is not None, degraded_reason=degraded, mode=mode)
+
+        except DeadlineExceeded as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except Exception as e:
+            print(f"Error during recommendation: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @app.post("/feedback")
+    def feedback(request: FeedbackRequest):
+        recommender = ready_recommender()
+        # Each event updates the user's preference vector in place; later /recommend calls with this user_id are personalized
+        try:
+            events = recommender.record_feedback(request.user_id, request.tea_id, request.event)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if events is None:
+            raise HTTPException(status_code=404, detail=f"Unknown tea {request.tea_id}")
+        return {"user_id": request.user_id, "events": events}
+
+    @app.delete("/sessions/{session_id}")
+    def end_session(session_id: str):
+        recommender = ready_recommender()
+        if not recommender.sessions.end(session_id):
+            raise HTTPException(status_code=404, detail=f"Unknown session {session_id}")
+        return {"session_id": session_id, "status": "ended"}
+
+    @app.get("/suggest", response_model=SuggestResponse)
+    def suggest(q: str, n: int = Query(8, ge=1, le=MAX_RESULTS)):
+        recommender = ready_recommender()
+        # Keystroke traffic: answered from the in-memory prefix index, never the embedding server
+        return SuggestResponse(query=q, suggestions=recommender.suggest(q, n))
+
+    @app.get("/teas/{tea_id}/similar", response_model=SimilarResponse)
+    def similar_teas(tea_id: str, n: int = Query(5, ge=1, le=MAX_RESULTS)):
+        recommender = ready_recommender()
+        if service.neighbor_graph is None:
+            raise HTTPException(status_code=503, detail="Recommender service is not ready")
+        neighbors = service.neighbor_graph.similar(tea_id, n)
+        tea = recommender.teas.get(tea_id)
+        if neighbors is None or tea is None:
+            raise HTTPException(status_code=404, detail=f"No neighbors for tea {tea_id}")
+        # Neighbors removed from the live catalog since the graph was built are skipped
+        similar = []
+        for neighbor_id, score in neighbors:
+            neighbor = recommender.teas.get(neighbor_id)
+            if neighbor is not None:
+                similar.append(SimilarTea(id=neighbor_id, name=neighbor['name'], type=neighbor['type'], score=score))
+        return SimilarResponse(tea_id=tea_id, name=tea['name'], similar=similar)
+
+    @app.post("/recommend/batch")
+    def recommend_batch(request: BatchRequest):
+        recommender = ready_recommender()
+        if len(request.queries) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} queries per batch; submit larger inputs to /recommend/jobs")
+        # One NDJSON line per query, in order, streamed as each embedding/retrieval chunk completes
+        lines = (json.dumps(result) + "\n" for result in batch_results(recommender, request.queries, request.generate))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    @app.post("/recommend/jobs")
+    def submit_batch_job(request: BatchRequest):
+        if service.batch_jobs is None:
+            raise HTTPException(status_code=503, detail="Recommender service is not ready")
+        job_id = service.batch_jobs.submit(request.queries, request.generate)
+        return {
+            "job_id": job_id,
+            "status_url": f"/recommend/jobs/{job_id}",
+            "results_url": f"/recommend/jobs/{job_id}/results"
+        }
+
+    @app.get("/recommend/jobs/{job_id}")
+    def batch_job_status(job_id: str):
+        job = service.batch_jobs.status(job_id) if service.batch_jobs is not None else None
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        return job
+
+    @app.get("/recommend/jobs/{job_id}/results")
+    def batch_job_results(job_id: str):
+        batch_jobs = service.batch_jobs
+        job = batch_jobs.status(job_id) if batch_jobs is not None else None
+        if job is None or not os.path.exists(batch_jobs.results_path(job_id)):
+            raise HTTPException(status_code=404, detail="No results for this job yet")
+        # Results written so far; the job status says whether the file is complete
+        return FileResponse(batch_jobs.results_path(job_id), media_type="application/x-ndjson")
+
+    return app
@@ -0,0 +1,23 @@
+import os
+import sys
+from dotenv import load_dotenv
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.neighbors import compute_neighbors
+
+load_dotenv()
+
+EMBEDDED_CATALOGS = {
+    "ollama": 'data/ollama/tea_data_with_embeddings.json',
+    "openai": 'data/openai/tea_data_with_embeddings.json'
+}
+
+def main():
+    # Usage: python3 data/build_neighbors.py [ollama|openai ...]  (default: every embedded catalog present)
+    providers = sys.argv[1:] or [p for p, path in EMBEDDED_CATALOGS.items() if os.path.exists(path)]
+    for provider in providers:
+        compute_neighbors(EMBEDDED_CATALOGS[provider])
+
+if __name__ == "__main__":
+    main()
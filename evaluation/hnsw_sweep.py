@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from dotenv import load_dotenv
+
+# Add project root to path to import agent
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.ingest import iter_catalog
+from agent.indexes import NumpyIndex, ChromaIndex
+
+load_dotenv()
+
+EMBEDDED_CATALOGS = {
+    "ollama": 'data/ollama/tea_data_with_embeddings.json',
+    "openai": 'data/openai/tea_data_with_embeddings.json'
+}
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def rss_bytes():
+    """Resident memory of this process (Chroma's index lives in-process)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def load_vectors(provider, size, seed, clusters=None, latent_dims=64, spread=0.5):
+    """The stored catalog embeddings, grown to `size` with synthetic vectors shaped like them.
+
+    Real embedding sets are anisotropic: every vector shares a common
+    direction (the stored teas are 0.7-0.85 cosine apart), and the rest
+    varies in a low-dimensional subspace grouped by topic. Synthetic vectors
+    keep the stored vectors' component along their mean direction, and add a
+    residual drawn from `clusters` topic centers (default: one per 100
+    vectors) in a random `latent_dims`-dimensional subspace, `spread` being
+    the within-topic scatter relative to the distance between topics.
+    Jittering a handful of stored vectors instead gives a few tight blobs
+    whose neighbors are all near-ties, which understates HNSW recall.
+    """
+    stored = np.asarray([tea['embedding'] for tea in iter_catalog(EMBEDDED_CATALOGS[provider])], dtype=np.float32)
+    stored /= np.linalg.norm(stored, axis=1, keepdims=True)
+    size = size or len(stored)
+    if size <= len(stored):
+        return stored[:size].copy()
+    rng = np.random.default_rng(seed)
+    dims = stored.shape[1]
+    mean = stored.mean(axis=0)
+    mean /= np.linalg.norm(mean)
+    along = float(np.mean(stored @ mean))
+
+    # Orthonormal topic subspace, orthogonal to the shared direction
+    basis = np.linalg.qr(rng.standard_normal((dims, latent_dims + 1)))[0][:, 1:].T
+    basis -= np.outer(basis @ mean, mean)
+    clusters = clusters or max(1, size // 100)
+    centers = rng.standard_normal((clusters, latent_dims))
+    latent = centers[rng.integers(0, clusters, size - len(stored))]
+    latent += spread * rng.standard_normal(latent.shape)
+    residual = (latent @ basis).astype(np.float32)
+    residual /= np.linalg.norm(residual, axis=1, keepdims=True)
+    synthetic = along * mean + np.sqrt(1 - along ** 2) * residual
+    return np.vstack([stored, synthetic / np.linalg.norm(synthetic, axis=1, keepdims=True)])
+
+
+def make_queries(vectors, count, noise, seed):
+    """Queries near catalog vectors, so every query has a meaningful neighborhood."""
+    rng = np.random.default_rng(seed + 1)
+    jitter = rng.standard_normal((count, vectors.shape[1])).astype(np.float32)
+    queries = vectors[rng.integers(0, len(vectors), count)] + noise * jitter / np.sqrt(vectors.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def build(ids, vectors, metadata, batch_size):
+    """Builds a Chroma collection with the given HNSW settings; returns (index, seconds, rss growth)."""
+    before = rss_bytes()
+    start = time.perf_counter()
+    index = ChromaIndex(f"hnsw_sweep_{time.time_ns()}", hnsw=metadata)
+    for offset in range(0, len(ids), batch_size):
+        index.add(ids[offset:offset + batch_size], vectors[offset:offset + batch_size].tolist())
+    return index, time.perf_counter() - start, rss_bytes() - before
+
+
+def measure(index, queries, exact, k):
+    latencies = []
+    recalls = []
+    for query, truth in zip(queries, exact):
+        start = time.perf_counter()
+        ids, _ = index.search(query.tolist(), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(set(ids) & truth) / len(truth))
+    latencies.sort()
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep Chroma HNSW parameters: build time, memory, latency and recall@k against exact search.")
+    parser.add_argument("provider", nargs="?", default="ollama", choices=list(EMBEDDED_CATALOGS))
+    parser.add_argument("--size", type=int, default=0, help="Catalog size to test (default: the stored catalog; larger sizes add synthetic vectors shaped like it)")
+    parser.add_argument("--clusters", type=int, default=None, help="Topics in the synthetic vectors (default: one per 100 vectors)")
+    parser.add_argument("--latent-dims", type=int, default=64, help="Dimensions the synthetic topics vary in")
+    parser.add_argument("--spread", type=float, default=0.5, help="Within-topic scatter of synthetic vectors, relative to the distance between topics")
+    parser.add_argument("--m", type=int_list, default=[8, 16, 32], help="hnsw:M values")
+    parser.add_argument("--ef-construction", type=int_list, default=[100, 200], help="hnsw:construction_ef values")
+    parser.add_argument("--ef-search", type=int_list, default=[10, 50, 100], help="hnsw:search_ef values")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="Jitter of queries around catalog vectors, relative to the vector norm")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("INGEST_BATCH_SIZE", "256")))
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write every result to this JSON file")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.provider, args.size, args.seed, args.clusters, args.latent_dims, args.spread)
+    ids = [f"v{i}" for i in range(len(vectors))]
+    queries = make_queries(vectors, args.queries, args.noise, args.seed)
+    k = min(args.k, len(ids))
+
+    # Ground truth: exact top-k from brute-force cosine search
+    exact_index = NumpyIndex("exact")
+    exact_index.add(ids, vectors)
+    exact = [set(found) for found, _ in exact_index.search_batch(queries, k)]
+    exact_latency = measure(exact_index, queries, exact, k)
+    print(f"{len(ids)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, recall@{k}.")
+    print(f"Exact numpy search: p50 {exact_latency['p50_ms']:.2f}ms, p99 {exact_latency['p99_ms']:.2f}ms\n")
+
+    # Chroma's one-time setup would otherwise be charged to the first build's memory
+    build(ids[:10], vectors[:10], {}, args.batch_size)[0].drop()
+
+    header = f"{'M':>4} {'ef_c':>6} {'ef_s':>6} {'build_s':>8} {'mem_mb':>8} {'recall':>7} {'p50ms':>7} {'p99ms':>7}"
+    print(header)
+    print("-" * len(header))
+    results = []
+    for m, ef_construction, ef_search in itertools.product(args.m, args.ef_construction, args.ef_search):
+        # Every setting gets its own build: Chroma accepts a search_ef change on a
+        # loaded collection but keeps searching with the ef it was built with
+        metadata = {"hnsw:M": m, "hnsw:construction_ef": ef_construction, "hnsw:search_ef": ef_search}
+        index, build_seconds, memory = build(ids, vectors, metadata, args.batch_size)
+        result = {"M": m, "ef_construction": ef_construction, "ef_search": ef_search,
+                  "build_seconds": build_seconds, "memory_mb": memory / 2**20}
+        result.update(measure(index, queries, exact, k))
+        results.append(result)
+        print(f"{m:>4} {ef_construction:>6} {ef_search:>6} {build_seconds:>8.2f} {result['memory_mb']:>8.1f} "
+              f"{result['recall']:>7.3f} {result['p50_ms']:>7.2f} {result['p99_ms']:>7.2f}")
+        index.drop()
+
+    good = [r for r in results if r["recall"] >= args.target_recall]
+    if good:
+        best = min(good, key=lambda r: (r["p99_ms"], r["memory_mb"]))
+        print(f"\nLowest p99 at recall >= {args.target_recall}: HNSW_M={best['M']} "
+              f"HNSW_EF_CONSTRUCTION={best['ef_construction']} HNSW_EF_SEARCH={best['ef_search']} "
+              f"(recall {best['recall']:.3f}, p99 {best['p99_ms']:.2f}ms)")
+    else:
+        print(f"\nNo setting reached recall {args.target_recall}; try larger --ef-search or --m values.")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({"size": len(ids), "k": k, "exact": exact_latency, "results": results}, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
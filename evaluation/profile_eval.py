@@ -0,0 +1,66 @@
+import os
+import sys
+import json
+import argparse
+
+# Add project root to path to import agent
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation.recommender_eval import load_eval_context
+from agent.tea_pipeline import LRUCache
+from agent.semantic_cache import SemanticCache
+
+
+def load_recommender(engine):
+    if engine == "openai":
+        from agent.retrieval_recommender_openai_nlp_vectordb import TeaChromaOpenAIRecommender
+        return TeaChromaOpenAIRecommender()
+    from agent.retrieval_recommender_ollama_nlp_vectordb import TeaChromaRecommender
+    return TeaChromaRecommender()
+
+
+def disable_caches(recommender):
+    """Turns off the semantic and query-embedding caches, so repeated queries run the whole pipeline."""
+    recommender.semantic_cache = SemanticCache(maxsize=0)
+    recommender.query_cache = LRUCache(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the recommend() hot path over the evaluation set.")
+    parser.add_argument("engine", nargs="?", default="ollama", choices=["ollama", "openai"])
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over test_data.json")
+    parser.add_argument("--out", default=None, help="Output directory (default PROFILE_DIR or profiles/)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Keep the semantic and query-embedding caches (passes after the first then profile cache hits)")
+    args = parser.parse_args()
+
+    recommender = load_recommender(args.engine)
+    recommender.build_vectordb()
+    recommender.system_context = load_eval_context()
+    if not args.cache:
+        disable_caches(recommender)
+    # Every call is sampled; the runs are sequential, so allocation numbers are exact
+    recommender.profiler.sample_rate = 1.0
+    if args.out:
+        recommender.profiler.out_dir = args.out
+
+    with open(os.path.join(os.path.dirname(__file__), 'test_data.json'), 'r') as f:
+        queries = [item['query'] for item in json.load(f)]
+
+    print(f"Profiling {args.engine} recommend() over {len(queries)} queries x {args.repeat}...")
+    for _ in range(args.repeat):
+        for query in queries:
+            recommender.recommend(query, structured=True)
+
+    summary = recommender.profiler.summary()
+    print(f"\nSampled {summary['sampled_requests']} calls, {summary['samples']} stack samples.")
+    print("\nWhere the time went (leaf frames):")
+    for frame, share in summary['top_frames']:
+        print(f"  {share:5.1f}%  {frame}")
+    print("\nAllocations per stage:")
+    for stage, stats in summary['stages'].items():
+        print(f"  {stage:<16} calls={stats['count']:<4} avg={stats['avg_alloc_kb']:.1f}KB peak={stats['peak_kb']:.1f}KB")
+    print(f"\nCollapsed stacks: {os.path.join(summary['out_dir'], 'recommend.collapsed')} (flamegraph.pl or speedscope)")
+
+
+if __name__ == "__main__":
+    main()
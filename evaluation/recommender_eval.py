@@ -0,0 +1,86 @@
+import json
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+def load_eval_context():
+    context_path = os.path.join(os.path.dirname(__file__), 'system_context_eval.txt')
+    if os.path.exists(context_path):
+        with open(context_path, 'r') as f:
+            return f.read().strip()
+    return "Output ONLY the requested JSON."
+
+def run_case(recommender, query):
+    """Returns (name -> similarity of the retrieved teas, names the LLM recommended) for one query."""
+    # 1. Perform retrieval separately to get similarity scores
+    retrieved_info = {tea['name']: score for tea, score in recommender.retrieve(query)}
+    # 2. Get LLM recommendation in structured mode (validated tea ids; the retrieval order if the output is unusable)
+    tea_ids = recommender.recommend(query, structured=True)
+    return retrieved_info, [tea['name'] for tea in recommender.lookup(tea_ids)]
+
+def evaluate(recommender_cls, label):
+    """Runs the test set through a VectorDB recommender and reports Precision@N and similarity metrics.
+
+    Cases run EVAL_WORKERS at a time; API calls are paced by the provider
+    (OpenAI calls by the shared rate-limit scheduler), so this runs as fast as
+    the quota allows.
+    """
+    try:
+        recommender = recommender_cls()
+        recommender.build_vectordb()
+        recommender.system_context = load_eval_context()
+    except Exception as e:
+        print(f"Failed to initialize recommender: {e}")
+        return
+
+    test_data_path = os.path.join(os.path.dirname(__file__), 'test_data.json')
+    with open(test_data_path, 'r') as f:
+        test_data = json.load(f)
+    
+    total = len(test_data)
+    correct_count = 0
+    all_match_similarities = []
+    prediction_rates = []
+    
+    print(f"Evaluating {label} VectorDB Recommender (N={recommender.retrieval_n}) on {total} samples...")
+
+    with ThreadPoolExecutor(max_workers=int(os.getenv("EVAL_WORKERS", "4"))) as executor:
+        results = list(executor.map(lambda item: run_case(recommender, item['query']), test_data))
+
+    for item, (retrieved_info, llm_output_names) in zip(test_data, results):
+        query = item['query']
+        expected = item['expected_names']
+
+        # Top similarity for prediction rate calculation if no match
+        top_similarity = max(retrieved_info.values()) if retrieved_info else 0.0
+
+        # 3. Calculate matches and collect similarities
+        case_match_found = False
+        
+        for name in llm_output_names:
+            if name in expected:
+                case_match_found = True
+                # Get the similarity score for this matched tea
+                score = retrieved_info.get(name, 0.0)
+                all_match_similarities.append(score)
+        
+        if case_match_found:
+            correct_count += 1
+            prediction_rates.append(1.0)
+        else:
+            prediction_rates.append(top_similarity)
+        
+        print(f"Query: {query}")
+        print(f"  Expected: {expected}")
+        print(f"  LLM Output: {llm_output_names}")
+        print(f"  Match: {'Yes' if case_match_found else 'No'} (Rate: {prediction_rates[-1]:.4f})")
+        print("-" * 20)
+    
+    precision = (correct_count / total) * 100
+    avg_similarity = np.mean(all_match_similarities) if all_match_similarities else 0.0
+    avg_prediction_rate = np.mean(prediction_rates) if prediction_rates else 0.0
+    
+    print(f"Evaluation Complete.")
+    print(f"Precision@{recommender.retrieval_n}: {precision:.2f}% ({correct_count}/{total})")
+    print(f"Average Similarity of Matched Items: {avg_similarity:.4f}")
+    print(f"Overall Prediction Rate: {avg_prediction_rate:.4f}")
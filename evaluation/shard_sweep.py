@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+# Add project root to path to import agent
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.indexes import NumpyIndex
+from agent.sharding import ShardPool, ShardedIndex
+
+load_dotenv()
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def p50_ms(index, queries, k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return latencies[len(latencies) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-process numpy search with the sharded index across catalog sizes and shard counts.")
+    parser.add_argument("--sizes", type=int_list, default=[20000, 50000, 100000, 200000], help="Catalog sizes to test")
+    parser.add_argument("--shards", type=int_list, default=[2, os.cpu_count() or 1], help="Shard counts to test")
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write every result to this JSON file")
+    args = parser.parse_args()
+
+    # Latency depends only on the matrix shape, so random vectors stand in for a catalog
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((max(args.sizes), args.dims)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dims)).astype(np.float32)
+    pools = {shards: ShardPool(shards) for shards in sorted(set(args.shards))}
+    print(f"{os.cpu_count()} CPUs, {args.dims} dims, {args.queries} queries, k={args.k}.\n")
+
+    header = f"{'rows':>8} {'numpy_ms':>9} " + " ".join(f"{f'{shards}sh_ms':>8}" for shards in pools)
+    print(header)
+    print("-" * len(header))
+    results = []
+    try:
+        for size in args.sizes:
+            ids = [f"v{i}" for i in range(size)]
+            exact = NumpyIndex("exact")
+            exact.add(ids, vectors[:size])
+            result = {"rows": size, "numpy_p50_ms": p50_ms(exact, queries, args.k), "sharded_p50_ms": {}}
+            for shards, pool in pools.items():
+                index = ShardedIndex(f"shard_sweep_{size}_{shards}", pool=pool, min_rows=0)
+                for offset in range(0, size, 10000):
+                    index.add(ids[offset:offset + 10000], vectors[offset:offset + 10000])
+                result["sharded_p50_ms"][shards] = p50_ms(index, queries, args.k)
+                index.drop()
+            results.append(result)
+            print(f"{size:>8} {result['numpy_p50_ms']:>9.2f} "
+                  + " ".join(f"{result['sharded_p50_ms'][shards]:>8.2f}" for shards in pools))
+    finally:
+        for pool in pools.values():
+            pool.close()
+
+    faster = [r["rows"] for r in results if min(r["sharded_p50_ms"].values()) < r["numpy_p50_ms"]]
+    if faster:
+        print(f"\nSharding is faster from {min(faster)} rows on this host: set INDEX_SHARD_MIN_ROWS={min(faster)}.")
+    else:
+        print("\nSharding was never faster than numpy here; keep INDEX_BACKEND unsharded "
+              "(or INDEX_SHARD_MIN_ROWS above your catalog size).")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({"cpus": os.cpu_count(), "dims": args.dims, "k": args.k, "results": results}, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Open-loop load generator for the TeaBot backends. Requests are sent on a fixed
+# arrival schedule whether or not earlier ones have finished, and latency is
+# measured from the scheduled send time, so a backlog shows up as latency rather
+# than silently lowering the offered rate.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_QUERIES = os.path.join(PROJECT_ROOT, "evaluation", "test_data.json")
+
+
+def load_queries(path):
+    """Reads queries from a JSON array (of strings or {"query": ...}), JSONL, or a plain text log (one per line).
+
+    Repeated queries in a log are kept, so a real log replays with its own popularity mix.
+    """
+    with open(path, "r") as f:
+        text = f.read()
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError:
+        items = []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError:
+                items.append(line)
+    queries = [item["query"] if isinstance(item, dict) else str(item) for item in items]
+    if not queries:
+        raise ValueError(f"No queries found in {path}")
+    return queries
+
+
+# Endpoints the generator knows how to call; each gets the parameters it requires
+ENDPOINTS = ("/recommend", "/suggest", "/health", "/stats")
+
+
+def parse_mix(spec):
+    """Parses "/recommend=8,/health=1" into [(path, weight), ...]; unsupported paths are a ValueError."""
+    mix = []
+    for part in spec.split(","):
+        path, _, weight = part.strip().partition("=")
+        if path not in ENDPOINTS:
+            raise ValueError(f"Unsupported endpoint {path!r}; the mix can use {', '.join(ENDPOINTS)}")
+        mix.append((path, float(weight or 1)))
+    return mix
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class LoadGenerator:
+    """Drives one backend at a series of arrival rates and collects per-step results."""
+
+    def __init__(self, base_url, queries, mix, budget_ms=None, timeout=30.0, poisson=True, max_workers=512):
+        self.base_url = base_url.rstrip("/")
+        self.queries = queries
+        self.paths = [path for path, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.budget_ms = budget_ms
+        self.timeout = timeout
+        self.poisson = poisson
+        self.max_workers = max_workers
+
+    def build_request(self, path):
+        """(method, request kwargs) for one call to path.
+
+        /recommend posts a sampled query; /suggest sends a typeahead prefix of
+        one (the start of its first word, as typed so far).
+        """
+        if path == "/recommend":
+            payload = {"query": random.choice(self.queries)}
+            if self.budget_ms:
+                payload["budget_ms"] = self.budget_ms
+            return "POST", {"json": payload}
+        if path == "/suggest":
+            words = random.choice(self.queries).split() or ["tea"]
+            return "GET", {"params": {"q": words[0][:random.randint(1, len(words[0]))]}}
+        return "GET", {}
+
+    def _request(self, path):
+        """Sends one request and returns (ok, degraded).
+
+        Each request opens its own connection: a pooled keep-alive socket the
+        server has already closed would show up as a spurious error.
+        """
+        method, kwargs = self.build_request(path)
+        response = requests.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        ok = response.status_code == 200
+        return ok, ok and path == "/recommend" and response.json().get("degraded", False)
+
+    def _fire(self, path, scheduled, results, lock):
+        try:
+            ok, degraded = self._request(path)
+            error = None
+        except Exception as e:
+            ok, degraded, error = False, False, type(e).__name__
+        latency = time.monotonic() - scheduled
+        with lock:
+            results.append((path, ok, degraded, latency, error))
+
+    def run_step(self, rate, duration):
+        """Offers rate requests/second for duration seconds and waits for every request to finish."""
+        results = []
+        lock = threading.Lock()
+        start = time.monotonic() + 0.05
+        arrival = 0.0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while arrival < duration:
+                scheduled = start + arrival
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                path = random.choices(self.paths, self.weights)[0]
+                executor.submit(self._fire, path, scheduled, results, lock)
+                arrival += random.expovariate(rate) if self.poisson else 1.0 / rate
+        # The window runs to the end of the step or the last completion, whichever is later
+        elapsed = max(duration, time.monotonic() - start)
+        return summarize(rate, duration, elapsed, results)
+
+
+def summarize(rate, duration, elapsed, results):
+    latencies = sorted(latency for _, ok, _, latency, _ in results if ok)
+    errors = {}
+    for _, ok, _, _, error in results:
+        if not ok:
+            errors[error or "http_error"] = errors.get(error or "http_error", 0) + 1
+    return {
+        "offered_rps": rate,
+        "requests": len(results),
+        "sent_rps": round(len(results) / duration, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "error_rate": round(1 - len(latencies) / len(results), 4) if results else 0.0,
+        "degraded_rate": round(sum(1 for r in results if r[2]) / len(results), 4) if results else 0.0,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p90_ms": ms(percentile(latencies, 0.90)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "errors": errors
+    }
+
+
+def ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def find_knee(steps, latency_factor=3.0, max_error_rate=0.01, min_efficiency=0.8):
+    """The highest offered rate the backend sustained before saturating.
+
+    A step is saturated when it drops errors above max_error_rate, completes less
+    than min_efficiency of what was actually sent (Poisson arrivals vary around
+    the nominal rate), or its p99 exceeds latency_factor
+    times the p99 of the lightest step. Returns (knee_step, first_saturated_step).
+    """
+    if not steps:
+        return None, None
+    baseline = steps[0]["p99_ms"] or 0.0
+    knee = None
+    for step in steps:
+        saturated = (
+            step["error_rate"] > max_error_rate
+            or step["throughput_rps"] < min_efficiency * step["sent_rps"]
+            or step["p99_ms"] is None
+            or (baseline and step["p99_ms"] > latency_factor * baseline)
+        )
+        if saturated:
+            return knee, step
+        knee = step
+    return knee, None
+
+
+def print_report(steps, knee, saturated):
+    header = f"{'offered':>8} {'sent':>8} {'thruput':>8} {'err%':>6} {'degr%':>6} {'p50ms':>8} {'p90ms':>8} {'p99ms':>8} {'maxms':>8}"
+    print(header)
+    print("-" * len(header))
+    for step in steps:
+        print(f"{step['offered_rps']:>8g} {step['sent_rps']:>8.2f} {step['throughput_rps']:>8.2f} {100 * step['error_rate']:>6.1f} "
+              f"{100 * step['degraded_rate']:>6.1f} {fmt(step['p50_ms'])} {fmt(step['p90_ms'])} "
+              f"{fmt(step['p99_ms'])} {fmt(step['max_ms'])}")
+    print()
+    if knee is None:
+        print("Saturated at the first step; lower --rates to find the knee.")
+    elif saturated is None:
+        print(f"No saturation up to {knee['offered_rps']:g} req/s; raise --rates to find the knee.")
+    else:
+        print(f"Saturation knee: {knee['offered_rps']:g} req/s "
+              f"(p99 {knee['p99_ms']}ms); latency or errors collapse at {saturated['offered_rps']:g} req/s.")
+
+
+def fmt(value):
+    return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the TeaBot backend.")
+    parser.add_argument("--url", default="http://localhost:8021", help="Backend base URL")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="test_data.json, a JSONL file or a query log")
+    parser.add_argument("--mix", default="/recommend=1",
+                        help=f'Endpoint weights, e.g. "/recommend=8,/suggest=4,/health=1"; one of {", ".join(ENDPOINTS)}')
+    parser.add_argument("--rates", default="1,2,4,8,16", help="Comma-separated arrival rates (req/s), one load step each")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per load step")
+    parser.add_argument("--budget-ms", type=int, default=None, help="budget_ms sent with each /recommend")
+    parser.add_argument("--timeout", type=float, default=30, help="Client timeout per request (s)")
+    parser.add_argument("--uniform", action="store_true", help="Evenly spaced arrivals instead of Poisson")
+    parser.add_argument("--out", help="Write the step results and knee as JSON")
+    parser.add_argument("--baseline", help="A previous --out file to compare capacity against")
+    args = parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    generator = LoadGenerator(
+        args.url, load_queries(args.queries), mix,
+        budget_ms=args.budget_ms, timeout=args.timeout, poisson=not args.uniform
+    )
+    try:
+        requests.get(f"{generator.base_url}/health", timeout=5).raise_for_status()
+    except Exception as e:
+        print(f"Backend not reachable at {generator.base_url}: {e}")
+        sys.exit(1)
+
+    steps = []
+    for rate in [float(r) for r in args.rates.split(",")]:
+        print(f"Offering {rate:g} req/s for {args.duration:g}s...")
+        steps.append(generator.run_step(rate, args.duration))
+    print()
+    knee, saturated = find_knee(steps)
+    print_report(steps, knee, saturated)
+
+    capacity = knee["offered_rps"] if knee else 0.0
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            before = json.load(f)["capacity_rps"]
+        print(f"Capacity: {before:g} -> {capacity:g} req/s")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"capacity_rps": capacity, "steps": steps}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
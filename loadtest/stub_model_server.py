@@ -0,0 +1,164 @@
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+# A stand-in for an Ollama server with configurable latency, so the backend can be
+# load-tested without model hardware. It answers the same endpoints the agents use.
+
+EMBEDDING_DIM = 768  # matches nomic-embed-text, so the stored catalog embeddings still load
+DEFAULT_KEEP_ALIVE = 300  # Ollama unloads a model after 5 idle minutes unless keep_alive says otherwise
+
+
+def parse_keep_alive(value):
+    """Seconds from an Ollama keep_alive value ("30m", "45s", "1h", a number; negative keeps it forever)."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = re.fullmatch(r"(-?[\d.]+)([smh]?)", str(value).strip())
+        if not match:
+            return DEFAULT_KEEP_ALIVE
+        seconds = float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+def embed(text, dim=EMBEDDING_DIM):
+    """Deterministic bag-of-words hash vector; similar texts get similar vectors."""
+    vector = np.zeros(dim)
+    for word in re.findall(r"\w+", text.lower()):
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % dim] += 1
+    return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+
+class StubModel:
+    """Latency model: mean + uniform jitter per call, with at most `parallel` generations at once.
+
+    A model that is not loaded first costs `load_ms`, then stays loaded for
+    the request's keep_alive, like Ollama's model residency.
+    """
+
+    def __init__(self, embed_ms, generate_ms, jitter, parallel, load_ms=0):
+        self.embed_ms = embed_ms
+        self.generate_ms = generate_ms
+        self.jitter = jitter
+        self.load_ms = load_ms
+        self.loaded_until = {}  # model -> monotonic expiry
+        self.lock = threading.Lock()
+        # Ollama serves OLLAMA_NUM_PARALLEL generations per model; the rest queue
+        self.slots = threading.Semaphore(parallel)
+
+    def sleep(self, mean_ms):
+        if mean_ms > 0:
+            time.sleep(mean_ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000.0)
+
+    def load(self, body):
+        """Loads the model if it is not resident; returns the load time in nanoseconds."""
+        name = body.get("model", "")
+        with self.lock:
+            now = time.monotonic()
+            cold = self.loaded_until.get(name, 0) <= now
+            # Held under the lock: concurrent requests for a cold model wait for the same load
+            if cold and self.load_ms > 0:
+                time.sleep(self.load_ms / 1000.0)
+            self.loaded_until[name] = time.monotonic() + parse_keep_alive(body.get("keep_alive"))
+        return int(self.load_ms * 1e6) if cold else 0
+
+    def loaded(self):
+        now = time.monotonic()
+        with self.lock:
+            return [name for name, until in self.loaded_until.items() if until > now]
+
+    def generate(self, body):
+        with self.slots:
+            self.sleep(self.generate_ms)
+        prompt = body.get("prompt", "")
+        schema = body.get("format")
+        if isinstance(schema, dict):
+            # Structured mode: answer with ids allowed by the schema
+            tea_ids = schema.get("properties", {}).get("tea_ids", {})
+            ids = tea_ids.get("items", {}).get("enum") or re.findall(r"\[([^\]]+)\]", prompt)
+            return json.dumps({"tea_ids": ids[:tea_ids.get("maxItems", 2)]})
+        if prompt.rstrip().endswith("Score:"):
+            # Rerank scoring: a single digit
+            return str(random.randint(0, 9))
+        names = re.findall(r"- ([^(:\n\[]+?) \(", prompt)
+        return json.dumps(names[:2])
+
+
+def make_handler(model):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/api/ps":
+                self._send({"models": [{"name": name} for name in model.loaded()]})
+            else:
+                self._send({"models": [{"name": "gpt-oss:20b"}, {"name": "nomic-embed-text"}]})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path == "/api/embed":
+                texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                load_duration = model.load(body)
+                model.sleep(model.embed_ms)
+                self._send({"embeddings": [embed(text) for text in texts], "load_duration": load_duration})
+            elif self.path == "/api/embeddings":
+                load_duration = model.load(body)
+                model.sleep(model.embed_ms)
+                self._send({"embedding": embed(body["prompt"]), "load_duration": load_duration})
+            elif self.path == "/api/generate":
+                load_duration = model.load(body)
+                if not body.get("prompt"):
+                    # An empty prompt only loads the model, as in Ollama
+                    self._send({"response": "", "done": True, "load_duration": load_duration})
+                else:
+                    self._send({"response": model.generate(body), "done": True, "load_duration": load_duration})
+            else:
+                self.send_error(404)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama server with configurable latency.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--embed-ms", type=float, default=20, help="Mean latency of an embedding call")
+    parser.add_argument("--generate-ms", type=float, default=800, help="Mean latency of a generation call")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Uniform +/- fraction applied to each latency")
+    parser.add_argument("--parallel", type=int, default=4, help="Generations served at once (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--load-ms", type=float, default=0, help="Cost of loading a model that is not resident (keep_alive expired)")
+    args = parser.parse_args()
+
+    model = StubModel(args.embed_ms, args.generate_ms, args.jitter, args.parallel, args.load_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(model))
+    server.daemon_threads = True
+    print(f"Stub model server on http://127.0.0.1:{args.port} "
+          f"(embed {args.embed_ms}ms, generate {args.generate_ms}ms, parallel {args.parallel}, load {args.load_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import os
+import re
+import sys
+import json
+import time
+import math
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add project root to path to import the shared stub embedding
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loadtest.stub_model_server import embed
+
+# A stand-in for the OpenAI API that enforces requests-per-minute and
+# tokens-per-minute limits the way the real one does: over-limit requests get
+# a 429 with Retry-After, so the scheduler and bulk jobs can be tested locally.
+# Point the SDK at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+EMBEDDING_DIM = 1536  # matches text-embedding-ada-002, so the stored catalog embeddings still load
+
+
+def count_tokens(text):
+    return (len(text) + 3) // 4
+
+
+class RateLimiter:
+    """RPM and TPM token buckets; admit() returns 0 or the seconds to wait."""
+
+    def __init__(self, rpm, tpm):
+        self.rpm, self.tpm = float(rpm), float(tpm)
+        self.requests, self.tokens = self.rpm, self.tpm
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    def admit(self, tokens):
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.updated
+            self.updated = now
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+            if tokens > self.tpm:
+                # Can never fit; the real API rejects it outright
+                self.rejected += 1
+                return -1
+            if self.requests >= 1 and self.tokens >= tokens:
+                self.requests -= 1
+                self.tokens -= tokens
+                self.admitted += 1
+                return 0.0
+            self.rejected += 1
+            return max((1 - self.requests) * 60 / self.rpm, (tokens - self.tokens) * 60 / self.tpm, 0.001)
+
+
+def chat_content(body):
+    prompt = body["messages"][-1]["content"]
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        tea_ids = response_format["json_schema"]["schema"]["properties"]["tea_ids"]
+        return json.dumps({"tea_ids": tea_ids["items"]["enum"][:tea_ids.get("maxItems", 2)]})
+    if body.get("logprobs"):
+        return str(random.randint(0, 9))
+    return json.dumps(re.findall(r"- (?:\[[^\]]+\] )?([^(:\n]+?) \(", prompt)[:2])
+
+
+def make_handler(limiter, latency_ms):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _limit(self, tokens):
+            wait = limiter.admit(tokens)
+            if wait == 0:
+                return False
+            if wait < 0:
+                self._send(429, {"error": {"message": f"Request too large: {tokens} tokens", "type": "tokens", "code": "rate_limit_exceeded"}})
+            else:
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                           {"retry-after-ms": str(math.ceil(wait * 1000)), "retry-after": str(math.ceil(wait))})
+            return True
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path.endswith("/embeddings"):
+                texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                tokens = sum(count_tokens(text) for text in texts)
+                if self._limit(tokens):
+                    return
+                time.sleep(latency_ms / 1000.0)
+                self._send(200, {
+                    "object": "list",
+                    "model": body["model"],
+                    "data": [{"object": "embedding", "index": i, "embedding": embed(text, EMBEDDING_DIM)} for i, text in enumerate(texts)],
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+                })
+            elif self.path.endswith("/chat/completions"):
+                prompt_tokens = sum(count_tokens(m["content"]) for m in body["messages"])
+                completion_cap = body.get("max_tokens") or 256
+                if self._limit(prompt_tokens + completion_cap):
+                    return
+                time.sleep(latency_ms / 1000.0)
+                content = chat_content(body)
+                choice = {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+                if body.get("logprobs"):
+                    choice["logprobs"] = {"content": [{
+                        "token": content, "logprob": 0.0, "bytes": None,
+                        "top_logprobs": [{"token": content, "logprob": 0.0, "bytes": None}]
+                    }]}
+                completion_tokens = count_tokens(content)
+                self._send(200, {
+                    "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                    "choices": [choice],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens}
+                })
+            else:
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def do_GET(self):
+            self._send(200, {"admitted": limiter.admitted, "rejected": limiter.rejected})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI API that enforces RPM/TPM limits.")
+    parser.add_argument("--port", type=int, default=11436)
+    parser.add_argument("--rpm", type=float, default=60, help="Requests per minute")
+    parser.add_argument("--tpm", type=float, default=10000, help="Tokens per minute")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latency of an admitted call")
+    args = parser.parse_args()
+
+    limiter = RateLimiter(args.rpm, args.tpm)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(limiter, args.latency_ms))
+    server.daemon_threads = True
+    print(f"Stub OpenAI API on http://127.0.0.1:{args.port}/v1 (rpm {args.rpm:g}, tpm {args.tpm:g})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
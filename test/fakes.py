@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import zlib
+import threading
+import numpy as np
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.embeddings import embedding_key
+from agent.tea_pipeline import TeaPipeline
+
+TYPES = ["Black", "Green", "White", "Oolong", "Herbal"]
+FLAVORS = ["Citrus", "Floral", "Smoky", "Sweet", "Spicy", "Earthy", "Fruity", "Nutty", "Minty", "Malty"]
+CAFFEINE = ["None", "Low", "Medium", "High"]
+
+
+def make_teas(n, start=0):
+    """n synthetic catalog rows with distinct ids and names."""
+    teas = []
+    for i in range(start, start + n):
+        flavors = [FLAVORS[i % len(FLAVORS)], FLAVORS[(i * 3 + 1) % len(FLAVORS)]]
+        teas.append({
+            "id": f"tea_{i:04d}",
+            "name": f"Blend {i}",
+            "type": TYPES[i % len(TYPES)],
+            "flavors": flavors,
+            "description": f"A {flavors[0].lower()} {TYPES[i % len(TYPES)].lower()} tea, batch {i}.",
+            "caffeine": CAFFEINE[i % len(CAFFEINE)]
+        })
+    return teas
+
+
+def write_catalog(path, teas):
+    with open(path, 'w') as f:
+        json.dump(teas, f)
+    return str(path)
+
+
+class FakeEmbedder:
+    """Deterministic bag-of-words embeddings: texts that share words are close, like a real model.
+
+    Counts the texts it embeds, and sleeps `delay` seconds per call.
+    """
+
+    def __init__(self, model="fake-embed", dim=64, delay=0.0):
+        self.model = model
+        self.dim = dim
+        self.delay = delay
+        self.documents_embedded = 0
+        self.queries_embedded = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.strip(".,!?").encode('utf-8')) % self.dim] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_query(self, text, timeout=None):
+        time.sleep(self.delay)
+        with self._lock:
+            self.queries_embedded += 1
+        return self._vector(text)
+
+    def embed_queries(self, texts):
+        time.sleep(self.delay)
+        with self._lock:
+            self.queries_embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_documents(self, texts):
+        time.sleep(self.delay)
+        with self._lock:
+            self.documents_embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def document_key(self, text):
+        return embedding_key(self.model, text)
+
+
+class FakeGenerator:
+    """Stands in for a model server: structured calls pick the first candidates after `delay` seconds.
+
+    `response` replaces the raw JSON text of structured answers (to simulate
+    truncated output); `error` is raised from every call instead.
+    """
+
+    def __init__(self, delay=0.0, response=None, error=None):
+        self.delay = delay
+        self.response = response
+        self.error = error
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def generate(self, system, prompt, timeout=None):
+        self._call()
+        return "Try the first tea in the context."
+
+    def generate_json(self, system, prompt, schema, max_tokens, timeout=None):
+        self._call()
+        if self.response is not None:
+            return json.loads(self.response)
+        candidates = schema["properties"]["tea_ids"]["items"]["enum"]
+        return {"tea_ids": candidates[:schema["properties"]["tea_ids"]["maxItems"]]}
+
+    def generate_score(self, system, prompt, timeout=None):
+        self._call()
+        return 0.5
+
+
+def make_pipeline(tmp_path, teas=None, embedder=None, generator=None, index_backend="numpy", **kwargs):
+    """A TeaPipeline over a catalog file in tmp_path, with fake models and the index built."""
+    catalog_path = write_catalog(tmp_path / "catalog.json", teas if teas is not None else make_teas(20))
+    pipeline = TeaPipeline(
+        embedder=embedder if embedder is not None else FakeEmbedder(),
+        index_backend=index_backend,
+        generator=generator if generator is not None else FakeGenerator(),
+        embeddings_path=catalog_path,
+        collection_name="test_teas",
+        **kwargs
+    )
+    pipeline.build_index()
+    return pipeline
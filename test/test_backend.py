@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+
+# Add project root to path to import backend and agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backend.api as api
+from backend.api import Provider, create_app
+from agent.cache_warmer import read_queries
+from fakes import FakeGenerator, make_pipeline
+
+
+def make_client(monkeypatch, tmp_path, generator):
+    monkeypatch.setenv("ROUTER", "0")
+    monkeypatch.setenv("CACHE_WARM", "0")
+    monkeypatch.setenv("CATALOG_WATCH_INTERVAL", "0")
+    monkeypatch.setenv("REQUEST_LOG_PATH", str(tmp_path / "requests.jsonl"))
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    pipeline.build_vectordb = lambda: None
+    provider = Provider("Test", lambda: pipeline, None, str(tmp_path / "neighbors.json"), lambda recommender: {})
+    return TestClient(create_app(provider)), pipeline
+
+
+def post_all(client, bodies, stagger=0.0):
+    def post(i):
+        time.sleep(i * stagger)
+        return client.post("/recommend", json=bodies[i])
+    with ThreadPoolExecutor(max_workers=len(bodies)) as executor:
+        return list(executor.map(post, range(len(bodies))))
+
+
+def test_recommend_requests_run_in_parallel(monkeypatch, tmp_path):
+    generator = FakeGenerator(delay=0.5)
+    client, _ = make_client(monkeypatch, tmp_path, generator)
+    with client:
+        start = time.perf_counter()
+        responses = post_all(client, [{"query": "citrus black tea", "budget_ms": 5000}] * 4)
+        elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 and not r.json()["degraded"] for r in responses)
+    # Served one at a time this would take 2s
+    assert generator.max_in_flight == 4
+    assert elapsed < 1.5
+
+
+def test_over_budget_request_is_degraded(monkeypatch, tmp_path):
+    client, pipeline = make_client(monkeypatch, tmp_path, FakeGenerator(delay=0.5))
+    with client:
+        response = client.post("/recommend", json={"query": "citrus black tea", "budget_ms": 500})
+    body = response.json()
+    # The budget is below the typical generation time, so the vector ranking comes back
+    assert response.status_code == 200
+    assert body["degraded"] and body["degraded_reason"] == "deadline"
+    assert len(body["names"]) == pipeline.retrieval_n
+
+
+def test_queue_time_counts_against_budget(monkeypatch, tmp_path):
+    monkeypatch.setattr(api, "API_WORKER_THREADS", 1)
+    client, pipeline = make_client(monkeypatch, tmp_path, FakeGenerator(delay=0.5))
+    pipeline.generation_guard.latency_estimate = 0.5
+    with client:
+        first, second = post_all(client, [
+            {"query": "citrus black tea", "budget_ms": 5000},
+            {"query": "floral green tea", "budget_ms": 800}
+        ], stagger=0.05)
+    assert not first.json()["degraded"]
+    # The second request waited ~0.45s for the only worker thread, leaving less than a generation's worth of budget
+    assert second.json()["degraded_reason"] == "deadline"
+
+
+def test_failed_cache_warm_up_is_reported_on_health(monkeypatch, tmp_path):
+    client, pipeline = make_client(monkeypatch, tmp_path, FakeGenerator())
+    monkeypatch.setenv("CACHE_WARM", "1")
+    monkeypatch.setenv("CACHE_WARM_QUERY_LOG", str(tmp_path / "missing.jsonl"))
+
+    def unavailable(queries):
+        raise ConnectionError("embedding server down")
+    pipeline.embed_queries = unavailable
+    with client:
+        deadline = time.monotonic() + 5
+        while (response := client.get("/health")).status_code == 503 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    assert response.status_code == 200
+    assert response.json()["cache_warm_error"] == "ConnectionError: embedding server down"
+
+
+def test_served_queries_go_to_the_request_log(monkeypatch, tmp_path):
+    client, _ = make_client(monkeypatch, tmp_path, FakeGenerator())
+    with client:
+        client.post("/recommend", json={"query": "citrus black tea"})
+    assert read_queries(str(tmp_path / "requests.jsonl")) == ["citrus black tea"]
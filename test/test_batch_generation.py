@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import threading
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.deadline import Deadline, GenerationGuard
+from fakes import FakeGenerator, make_pipeline
+
+QUERIES = ["citrus black tea", "floral green tea", "smoky tea", "calming herbal tea"] * 2
+
+
+def test_batch_generations_hold_guard_slots(monkeypatch, tmp_path):
+    monkeypatch.setenv("BATCH_GENERATION_WORKERS", "4")
+    monkeypatch.setenv("BATCH_GENERATION_RESERVE", "1")
+    generator = FakeGenerator(delay=0.05)
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    pipeline.generation_guard = GenerationGuard(max_concurrent=3)
+    results = list(pipeline.recommend_batch(QUERIES))
+    assert all(degraded is None for _, degraded in results)
+    # Four workers, but batch work leaves one of the three slots to requests
+    assert generator.max_in_flight == 2
+    assert pipeline.generation_guard.metrics()["in_flight"] == 0
+
+
+def test_requests_keep_a_slot_during_a_batch(monkeypatch, tmp_path):
+    monkeypatch.setenv("BATCH_GENERATION_WORKERS", "2")
+    generator = FakeGenerator(delay=0.2)
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    pipeline.generation_guard = GenerationGuard(max_concurrent=2, latency_estimate=0.1)
+    batch = threading.Thread(target=lambda: list(pipeline.recommend_batch(QUERIES)))
+    batch.start()
+    time.sleep(0.05)
+    _, degraded = pipeline.recommend_within("citrus black tea", Deadline(5))
+    batch.join()
+    assert degraded is None
+
+
+def test_batch_waits_for_a_slot_instead_of_degrading(monkeypatch, tmp_path):
+    monkeypatch.setenv("BATCH_GENERATION_WORKERS", "2")
+    pipeline = make_pipeline(tmp_path, generator=FakeGenerator(delay=0.05))
+    pipeline.generation_guard = GenerationGuard(max_concurrent=1)
+    # A request holds the only slot while the batch starts
+    assert pipeline.generation_guard.admit() is None
+    threading.Timer(0.2, pipeline.generation_guard.release, (0.2, True)).start()
+    results = list(pipeline.recommend_batch(QUERIES[:2]))
+    assert [degraded for _, degraded in results] == [None, None]
+
+
+def test_open_breaker_degrades_batch_generations(tmp_path):
+    generator = FakeGenerator()
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    for _ in range(pipeline.generation_guard.breaker.failure_threshold):
+        pipeline.generation_guard.breaker.record_failure()
+    results = list(pipeline.recommend_batch(QUERIES[:2]))
+    assert [degraded for _, degraded in results] == ["circuit_open", "circuit_open"]
+    assert generator.calls == 0
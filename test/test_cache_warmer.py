@@ -0,0 +1,82 @@
+import os
+import sys
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.cache_warmer import CacheWarmer, RequestLog, read_queries
+from fakes import FakeGenerator, make_pipeline, make_teas, write_catalog
+
+
+def write_log(tmp_path, queries):
+    log = RequestLog(str(tmp_path / "logs" / "requests.jsonl"))
+    for query in queries:
+        log.append(query, mode="rag", degraded=None, ms=12.0)
+    return log.path
+
+
+def test_request_log_round_trips_queries(tmp_path):
+    path = write_log(tmp_path, ["citrus black tea", "floral green tea"])
+    assert read_queries(path) == ["citrus black tea", "floral green tea"]
+
+
+def test_default_log_is_the_request_log(monkeypatch, tmp_path):
+    monkeypatch.delenv("CACHE_WARM_QUERY_LOG", raising=False)
+    monkeypatch.setenv("REQUEST_LOG_PATH", str(tmp_path / "requests.jsonl"))
+    warmer = CacheWarmer(make_pipeline(tmp_path))
+    assert warmer.log_path == str(tmp_path / "requests.jsonl")
+
+
+def test_most_frequent_queries_are_warmed_first(tmp_path):
+    path = write_log(tmp_path, ["floral green tea"] + ["citrus black tea"] * 3 + ["smoky tea"] * 2)
+    warmer = CacheWarmer(make_pipeline(tmp_path), log_path=path, top_n=2)
+    assert warmer.top_queries() == ["citrus black tea", "smoky tea"]
+
+
+def test_answers_are_warmed_and_carried_across_reloads(monkeypatch, tmp_path):
+    monkeypatch.setenv("SEMANTIC_CACHE_SIZE", "16")
+    generator = FakeGenerator()
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    warmer = CacheWarmer(pipeline, log_path=write_log(tmp_path, ["citrus black tea", "floral green tea"]))
+    run = warmer.warm()
+    assert run["generated"] == 2 and run["answers_cached"]
+    assert warmer.ready and warmer.error is None
+    # A reload that leaves the candidates alone copies the answers without generating
+    write_catalog(pipeline.catalog_path, make_teas(20))
+    pipeline.reload()
+    assert warmer.warm()["carried"] == 2
+    assert generator.calls == 2
+    pipeline.recommend("citrus black tea", structured=True)
+    assert generator.calls == 2
+
+
+def test_without_a_semantic_cache_only_embeddings_are_warmed(monkeypatch, tmp_path):
+    monkeypatch.setenv("SEMANTIC_CACHE_SIZE", "0")
+    generator = FakeGenerator()
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    warmer = CacheWarmer(pipeline, log_path=write_log(tmp_path, ["citrus black tea"]))
+    run = warmer.warm()
+    assert run["embedded"] == 1 and not run["answers_cached"]
+    assert generator.calls == 0
+    assert "citrus black tea" in pipeline.query_cache._data
+
+
+def test_failed_run_does_not_report_ready(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+
+    def unavailable(queries):
+        raise ConnectionError("embedding server down")
+    pipeline.embed_queries = unavailable
+    warmer = CacheWarmer(pipeline, log_path=write_log(tmp_path, ["citrus black tea"]))
+    run = warmer.warm()
+    assert not warmer.ready
+    assert warmer.error == run["error"] == "ConnectionError: embedding server down"
+    assert warmer.metrics()["error"] == warmer.error
+
+
+def test_run_where_every_query_fails_does_not_report_ready(monkeypatch, tmp_path):
+    monkeypatch.setenv("SEMANTIC_CACHE_SIZE", "16")
+    pipeline = make_pipeline(tmp_path, generator=FakeGenerator(error=ConnectionError("model server down")))
+    warmer = CacheWarmer(pipeline, log_path=write_log(tmp_path, ["citrus black tea", "floral green tea"]))
+    warmer.warm()
+    assert not warmer.ready
+    assert warmer.error == "all 2 queries failed"
@@ -0,0 +1,84 @@
+import os
+import sys
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.context import ContextBuilder, count_tokens, trim_description
+
+EARL_GREY = {
+    "id": "tea_001",
+    "name": "Earl Grey",
+    "type": "Black",
+    "flavors": ["Citrus", "Bergamot", "bergamot", "Malty"],
+    "description": "A black tea scented with bergamot oil. It has a bright citrus nose. Best with milk in the afternoon.",
+}
+
+
+def make_hits(n):
+    hits = []
+    for i in range(n):
+        hits.append(({
+            "id": f"tea_{i:03d}",
+            "name": f"Blend {i}",
+            "type": "Green",
+            "flavors": ["Floral", "Sweet"],
+            "description": f"Blend {i} is a gentle green tea picked in early spring. " * 3
+        }, 1.0 - i / 100))
+    return hits
+
+
+def line_tokens(context, show_id=False):
+    """Tokens each line was charged: its label and its snippet, counted separately as build() does."""
+    tokens = []
+    for line in context.splitlines():
+        label, text = line.split("] ", 1) if show_id else ("-", line[2:])
+        tokens.append(count_tokens(label + ("] " if show_id else " ")) + count_tokens(text))
+    return tokens
+
+
+def test_render_trims_the_description_and_drops_repeated_flavors():
+    full, full_tokens, compact, compact_tokens = ContextBuilder(description_tokens=12).render(EARL_GREY)
+    # Whole sentences up to the description budget, and only flavors the text does not mention
+    assert full == "Earl Grey (Black): A black tea scented with bergamot oil. (Flavors: Citrus, Malty)"
+    # The compact snippet keeps the flavors, without case-insensitive repeats
+    assert compact == "Earl Grey (Black) (Flavors: Citrus, Bergamot, Malty)"
+    assert (full_tokens, compact_tokens) == (count_tokens(full), count_tokens(compact))
+
+
+def test_long_first_sentence_is_cut_at_a_word():
+    text = trim_description("An extraordinarily long single sentence about smoky lapsang souchong leaves", 8)
+    assert text.endswith("...") and count_tokens(text) <= 8
+    assert "An extraordinarily long single sentence".startswith(text[:-3])
+
+
+def test_context_stays_within_the_budget():
+    builder = ContextBuilder(budget=130, description_tokens=48)
+    hits = make_hits(20)
+    context, included = builder.build(hits)
+    lines = context.splitlines()
+    assert len(lines) == len(included) and 1 < len(included) < len(hits)
+    assert sum(line_tokens(context)) <= 130
+    # Best hits first, full snippets while they fit, then compact ones
+    assert [tea['id'] for tea, _ in included] == [tea['id'] for tea, _ in hits[:len(included)]]
+    assert ["early spring" in line for line in lines] == [True, True, False, False]
+    assert lines[-1] == "- Blend 3 (Green) (Flavors: Floral, Sweet)"
+
+
+def test_a_larger_budget_includes_more_teas():
+    hits = make_hits(20)
+    sizes = [len(ContextBuilder(budget=budget).build(hits)[1]) for budget in (80, 160, 320, 5000)]
+    assert sizes == sorted(sizes) and sizes[-1] == 20
+
+
+def test_the_top_hit_is_always_included_compacted():
+    context, included = ContextBuilder(budget=5).build(make_hits(3))
+    assert [tea['id'] for tea, _ in included] == ["tea_000"]
+    assert context == "- Blend 0 (Green) (Flavors: Floral, Sweet)\n"
+
+
+def test_ids_and_cached_snippets():
+    builder = ContextBuilder()
+    hits = make_hits(2)
+    cached = {tea['id']: ("cached " + tea['id'], 3, "compact", 1) for tea, _ in hits}
+    context, _ = builder.build(hits, snippet_of=lambda tea: cached[tea['id']], show_id=True)
+    assert context == "- [tea_000] cached tea_000\n- [tea_001] cached tea_001\n"
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import numpy as np
+import pytest
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.embeddings import OnnxEmbeddingProvider
+from agent.tea_pipeline import TeaPipeline, render_document
+from fakes import FakeEmbedder, FakeGenerator, write_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_CATALOGS = [
+    os.path.join(ROOT, 'data', 'ollama', 'tea_data_with_embeddings.json'),
+    os.path.join(ROOT, 'data', 'openai', 'tea_data_with_embeddings.json')
+]
+
+
+class StubOnnxProvider(OnnxEmbeddingProvider):
+    """OnnxEmbeddingProvider.verify() over FakeEmbedder vectors instead of an ONNX session."""
+
+    def __init__(self, model="nomic-embed-text", noise=0.0):
+        self.model = model
+        self.document_prefix = "search_document: "
+        self.fake = FakeEmbedder(model=model)
+        self.noise = noise
+        self.verified = []
+
+    def embed_documents(self, texts):
+        vectors = np.asarray(self.fake.embed_documents([self.document_prefix + text for text in texts]))
+        return (vectors + self.noise * np.random.default_rng(0).standard_normal(vectors.shape)).tolist()
+
+    def verify(self, documents, stored_embeddings, min_cosine=None):
+        self.verified.append(list(documents))
+        return super().verify(documents, stored_embeddings, min_cosine)
+
+
+def keyed_catalog(tmp_path, provider, teas):
+    """teas stored with the reference model's vectors and keys, as the embed scripts write them."""
+    reference = FakeEmbedder(model=provider.model)
+    for tea in teas:
+        document = render_document(tea)
+        tea['embedding_key'] = provider.document_key(document)
+        tea['embedding'] = reference.embed_documents([provider.document_prefix + document])[0]
+    return write_catalog(tmp_path / "catalog.json", teas)
+
+
+def build(provider, path):
+    pipeline = TeaPipeline(embedder=provider, index_backend="numpy", generator=FakeGenerator(), embeddings_path=path)
+    pipeline.build_index()
+    return pipeline
+
+
+@pytest.mark.parametrize("path", REPO_CATALOGS)
+def test_repo_catalogs_are_not_verified_against_stale_rows(path):
+    # The shipped rows have no embedding_key and were embedded from an older template,
+    # so they must neither be compared with fresh embeddings nor used as-is
+    provider = StubOnnxProvider()
+    pipeline = build(provider, path)
+    assert provider.verified == []
+    with open(path, 'r') as f:
+        assert provider.fake.documents_embedded == len(json.load(f)) == len(pipeline.teas)
+
+
+def test_verify_passes_against_matching_rows(tmp_path):
+    with open(os.path.join(ROOT, 'data', 'mock_tea_data.json'), 'r') as f:
+        teas = json.load(f)
+    provider = StubOnnxProvider()
+    build(provider, keyed_catalog(tmp_path, provider, teas))
+    assert provider.verified == [[render_document(tea) for tea in teas[:4]]]
+    # Verified rows are reused, not embedded again
+    assert provider.fake.documents_embedded == 4
+
+
+def test_verify_rejects_a_model_that_does_not_reproduce_the_stored_vectors(tmp_path):
+    with open(os.path.join(ROOT, 'data', 'mock_tea_data.json'), 'r') as f:
+        teas = json.load(f)
+    provider = StubOnnxProvider(noise=0.5)
+    with pytest.raises(ValueError, match="differ from the stored"):
+        build(provider, keyed_catalog(tmp_path, provider, teas))
+
+
+def test_verify_rejects_a_dimension_mismatch():
+    provider = StubOnnxProvider()
+    with pytest.raises(ValueError, match="dim"):
+        provider.verify(["some text"], [[1.0, 0.0]])
@@ -0,0 +1,105 @@
+import os
+import sys
+import pytest
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import agent.retrieval_recommender_fusion as fusion
+from agent.batch_jobs import batch_results
+from agent.deadline import Deadline, DeadlineExceeded
+from agent.tea_pipeline import TeaPipeline
+from fakes import FakeEmbedder, FakeGenerator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERY = "citrus black tea"
+
+
+class FlakyEmbedder(FakeEmbedder):
+    """A FakeEmbedder whose query embeddings raise `error` while it is set."""
+
+    error = None
+
+    def embed_query(self, text, timeout=None):
+        if self.error is not None:
+            raise self.error
+        return super().embed_query(text, timeout)
+
+    def embed_queries(self, texts):
+        if self.error is not None:
+            raise self.error
+        return super().embed_queries(texts)
+
+
+def fake_generator():
+    generator = FakeGenerator()
+    generator.model = "fake-llm"
+    return generator
+
+
+@pytest.fixture
+def recommender(monkeypatch):
+    # The agent reads its catalogs from the repo's data directory
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("FUSION_PROVIDER_TIMEOUT_MS", "500")
+    monkeypatch.setattr(fusion, "local_embedding_provider", lambda: FlakyEmbedder(model="fake-ollama"))
+    monkeypatch.setattr(fusion, "OpenAIEmbeddingProvider", lambda: FlakyEmbedder(model="fake-openai", dim=32))
+    monkeypatch.setattr(fusion, "OllamaGenerator", fake_generator)
+    recommender = fusion.TeaFusionRecommender(retrieval_n=3)
+    recommender.build_index()
+    return recommender
+
+
+def ids(hits):
+    return [tea['id'] for tea, _ in hits]
+
+
+def test_rankings_are_fused_with_rrf(recommender):
+    depth = max(5, recommender.depth)
+    primary = TeaPipeline.retrieve(recommender, QUERY, depth)
+    secondary = recommender.secondary.retrieve(QUERY, depth)
+    assert ids(primary) != ids(secondary)
+    expected = fusion.reciprocal_rank_fusion([primary, secondary], recommender.rrf_k)[:5]
+    assert ids(recommender.retrieve(QUERY, k=5)) == ids(expected)
+    assert recommender.metrics()["fused"] == 1
+
+
+def test_a_failing_provider_is_left_out(recommender):
+    recommender.secondary.embedder.error = ConnectionError("openai down")
+    assert ids(recommender.retrieve(QUERY, k=5)) == ids(TeaPipeline.retrieve(recommender, QUERY, 5))
+    assert recommender.metrics()["ollama_only"] == 1
+
+    # Query embeddings are cached, so each case below uses a query neither provider has embedded
+    recommender.secondary.embedder.error = None
+    recommender.embedder.error = ConnectionError("ollama down")
+    assert ids(recommender.retrieve("floral green tea", k=5)) == ids(recommender.secondary.retrieve("floral green tea", 5))
+    assert recommender.metrics()["openai_only"] == 1
+
+    recommender.secondary.embedder.error = ConnectionError("openai down")
+    with pytest.raises(DeadlineExceeded):
+        recommender.retrieve("smoky tea")
+
+
+def test_a_slow_provider_is_left_out(recommender):
+    recommender.secondary.embedder.delay = 2.0
+    assert ids(recommender.retrieve(QUERY, k=5)) == ids(TeaPipeline.retrieve(recommender, QUERY, 5))
+    assert recommender.metrics()["ollama_only"] == 1
+
+
+def test_recommendations_read_the_pinned_snapshot(recommender):
+    with recommender.index.use() as snapshot:
+        tea_ids, degraded = recommender.recommend_within(QUERY, Deadline(30), snapshot=snapshot)
+        names = [tea['name'] for tea in recommender.lookup(tea_ids, snapshot)]
+    assert degraded is None
+    assert len(names) == 3
+    assert recommender.recommend(QUERY, structured=True) == tea_ids
+
+
+def test_batches_are_fused_and_survive_a_failing_provider(recommender):
+    queries = [QUERY, "floral green tea", "smoky tea"]
+    fused = recommender.retrieve_batch(queries, k=5)
+    assert [ids(hits) for hits in fused] == [ids(recommender.retrieve(query, k=5)) for query in queries]
+
+    recommender.secondary.embedder.error = ConnectionError("openai down")
+    results = list(batch_results(recommender, ["malty breakfast tea", "minty herbal tea", "sweet white tea"], generate=False))
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert all(len(result["names"]) == 3 and not result["degraded"] for result in results)
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.batch_jobs import batch_results
+from agent.deadline import Deadline
+from agent.tea_pipeline import TeaPipeline, render_document
+from fakes import FakeEmbedder, FakeGenerator, make_pipeline, make_teas, write_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_stored_embeddings_are_reused_only_with_a_matching_key(tmp_path):
+    embedder = FakeEmbedder()
+    teas = make_teas(6)
+    for i, tea in enumerate(teas):
+        tea['embedding'] = [0.0] * embedder.dim
+        if i < 2:
+            tea['embedding_key'] = embedder.document_key(render_document(tea))
+        elif i < 4:
+            tea['embedding_key'] = "computed-from-other-text"
+        # the last two have no key at all
+    make_pipeline(tmp_path, teas=teas, embedder=embedder)
+    assert embedder.documents_embedded == 4
+
+
+def test_shipped_catalog_embeddings_without_keys_are_reembedded(tmp_path):
+    # The stored catalogs predate embedding keys and the current document template
+    path = os.path.join(ROOT, 'data', 'ollama', 'tea_data_with_embeddings.json')
+    with open(path, 'r') as f:
+        stored = json.load(f)
+    embedder = FakeEmbedder(model="nomic-embed-text")
+    pipeline = TeaPipeline(embedder=embedder, index_backend="numpy", generator=FakeGenerator(), embeddings_path=path)
+    pipeline.build_index()
+    keyless = sum('embedding_key' not in tea for tea in stored)
+    assert embedder.documents_embedded == keyless
+
+
+def test_chroma_reload_mixes_carried_and_fresh_vectors(tmp_path):
+    import chromadb
+    teas = make_teas(8)
+    embedder = FakeEmbedder()
+    pipeline = make_pipeline(tmp_path, teas=teas, embedder=embedder, index_backend="chroma",
+                             chroma_client=chromadb.EphemeralClient())
+    # One changed tea is embedded again; the other seven come back from the old collection as arrays
+    teas[3] = dict(teas[3], description="Now aged in oak barrels.")
+    write_catalog(tmp_path / "catalog.json", teas)
+    assert pipeline.reload() == 2
+    assert embedder.documents_embedded == 9
+    assert pipeline.index.current.index.count() == 8
+
+
+class ReloadingGenerator(FakeGenerator):
+    """Renames every tea in the catalog file and reloads the pipeline before each structured answer."""
+
+    def __init__(self, catalog_path):
+        super().__init__()
+        self.catalog_path = catalog_path
+        self.pipeline = None
+        self.prompts = []
+
+    def generate_json(self, system, prompt, schema, max_tokens, timeout=None):
+        self.prompts.append(prompt)
+        teas = make_teas(20)
+        for tea in teas:
+            tea['name'] = tea['name'].replace("Blend", "Renamed")
+        write_catalog(self.catalog_path, teas)
+        self.pipeline.reload()
+        return super().generate_json(system, prompt, schema, max_tokens, timeout)
+
+
+def reloading_pipeline(tmp_path):
+    generator = ReloadingGenerator(tmp_path / "catalog.json")
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    generator.pipeline = pipeline
+    return pipeline, generator
+
+
+def test_a_reload_mid_request_does_not_change_its_answer(tmp_path):
+    pipeline, generator = reloading_pipeline(tmp_path)
+    with pipeline.index.use() as snapshot:
+        tea_ids, degraded = pipeline.recommend_within("citrus black tea", Deadline(30), snapshot=snapshot)
+        names = [tea['name'] for tea in pipeline.lookup(tea_ids, snapshot)]
+    assert degraded is None
+    assert pipeline.catalog_version == snapshot.version + 1
+    assert names and all(name.startswith("Blend") for name in names)
+    # The new version is live for requests that start after the reload
+    assert all(tea['name'].startswith("Renamed") for tea in pipeline.lookup(tea_ids))
+    assert snapshot.retired and snapshot.in_flight == 0
+
+
+def test_a_request_pins_one_version_for_every_stage(tmp_path):
+    pipeline, generator = reloading_pipeline(tmp_path)
+    session_id = "s1"
+    pipeline.recommend("citrus black tea", structured=True, session_id=session_id)
+    # The turn recorded after generation names the teas of the version the prompt was built from
+    assert "Blend" in generator.prompts[0]
+    assert "Blend" in pipeline.sessions.get(session_id).history()
+    assert "Renamed" not in pipeline.sessions.get(session_id).history()
+
+
+def test_a_batch_reads_the_version_live_when_it_started(tmp_path):
+    pipeline, _ = reloading_pipeline(tmp_path)
+    results = list(batch_results(pipeline, ["citrus black tea", "floral green tea"]))
+    assert pipeline.catalog_version == 3
+    for result in results:
+        assert result["names"] and all(name.startswith("Blend") for name in result["names"])
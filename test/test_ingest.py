@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import pytest
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.ingest import stream_embedded_catalog, iter_catalog
+from agent.tea_pipeline import render_document
+from fakes import FakeEmbedder, make_teas, write_catalog
+
+
+class CrashingEmbedder(FakeEmbedder):
+    """Fails on its `fail_on`-th embed_documents call, like a run killed mid-way."""
+
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = fail_on
+        self.batches = 0
+
+    def embed_documents(self, texts):
+        self.batches += 1
+        if self.batches == self.fail_on:
+            raise RuntimeError("embedding server went away")
+        return super().embed_documents(texts)
+
+
+@pytest.fixture(params=["embedded.json", "embedded.jsonl"])
+def out_path(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def ingest(tmp_path, out_path, teas, embedder=None, batch_size=4):
+    data_path = write_catalog(tmp_path / "catalog.json", teas)
+    embedder = embedder or FakeEmbedder()
+    counts = stream_embedded_catalog(embedder, render_document, out_path, data_path, batch_size=batch_size)
+    return counts, embedder
+
+
+def stored(out_path):
+    return {tea['id']: tea for tea in iter_catalog(out_path)}
+
+
+def test_first_run_embeds_everything(tmp_path, out_path):
+    (embedded, reused), _ = ingest(tmp_path, out_path, make_teas(10))
+    assert (embedded, reused) == (10, 0)
+    rows = stored(out_path)
+    assert len(rows) == 10 and all('embedding_key' in tea for tea in rows.values())
+    assert not os.path.exists(out_path + ".previous")
+
+
+def test_insert_at_front_only_embeds_the_new_tea(tmp_path, out_path):
+    teas = make_teas(10)
+    ingest(tmp_path, out_path, teas)
+    before = stored(out_path)
+    (embedded, reused), embedder = ingest(tmp_path, out_path, make_teas(1, start=100) + make_teas(10))
+    assert (embedded, reused) == (1, 10)
+    assert embedder.documents_embedded == 1
+    after = stored(out_path)
+    assert all(after[tea_id]['embedding'] == tea['embedding'] for tea_id, tea in before.items())
+
+
+def test_delete_reuses_the_remaining_teas(tmp_path, out_path):
+    teas = make_teas(10)
+    ingest(tmp_path, out_path, teas)
+    (embedded, reused), _ = ingest(tmp_path, out_path, teas[:3] + teas[5:])
+    assert (embedded, reused) == (0, 8)
+    assert set(stored(out_path)) == {tea['id'] for tea in teas[:3] + teas[5:]}
+
+
+def test_reorder_reuses_every_tea(tmp_path, out_path):
+    teas = make_teas(10)
+    ingest(tmp_path, out_path, teas)
+    (embedded, reused), _ = ingest(tmp_path, out_path, list(reversed(teas)))
+    assert (embedded, reused) == (0, 10)
+    assert [tea['id'] for tea in iter_catalog(out_path)] == [tea['id'] for tea in reversed(teas)]
+
+
+def test_changed_text_is_embedded_again(tmp_path, out_path):
+    teas = make_teas(10)
+    ingest(tmp_path, out_path, teas)
+    teas[6] = dict(teas[6], description="Reblended with smoked pine needles.")
+    (embedded, reused), embedder = ingest(tmp_path, out_path, teas)
+    assert (embedded, reused) == (1, 9)
+    expected = embedder.embed_documents([render_document(teas[6])])[0]
+    assert stored(out_path)[teas[6]['id']]['embedding'] == expected
+
+
+def test_crashed_run_resumes_after_the_last_batch(tmp_path, out_path):
+    teas = make_teas(10)
+    with pytest.raises(RuntimeError):
+        ingest(tmp_path, out_path, teas, embedder=CrashingEmbedder(fail_on=2))
+    assert os.path.exists(out_path + ".partial") and not os.path.exists(out_path)
+    (embedded, reused), embedder = ingest(tmp_path, out_path, teas)
+    # The first batch of 4 was checkpointed; only the remaining 6 teas are embedded
+    assert (embedded, reused) == (6, 0)
+    assert embedder.documents_embedded == 6
+    assert [tea['id'] for tea in iter_catalog(out_path)] == [tea['id'] for tea in teas]
+    assert not os.path.exists(out_path + ".checkpoint")
+    if out_path.endswith('.json'):
+        with open(out_path, 'r') as f:
+            assert len(json.load(f)) == 10
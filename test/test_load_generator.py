@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+
+# Add project root to path to import the load generator and backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loadtest.load_generator import ENDPOINTS, LoadGenerator, parse_mix
+from fakes import FakeGenerator
+from test_backend import make_client
+
+
+def test_unsupported_endpoints_are_rejected():
+    assert parse_mix("/recommend=8,/suggest=4,/health") == [("/recommend", 8.0), ("/suggest", 4.0), ("/health", 1.0)]
+    with pytest.raises(ValueError, match="/feedback"):
+        parse_mix("/recommend=8,/feedback=1")
+
+
+def test_every_endpoint_gets_its_required_parameters(monkeypatch, tmp_path):
+    client, _ = make_client(monkeypatch, tmp_path, FakeGenerator())
+    generator = LoadGenerator("http://testserver", ["citrus black tea", "floral green tea"],
+                              parse_mix(",".join(ENDPOINTS)), budget_ms=5000)
+    with client:
+        for path in ENDPOINTS:
+            for _ in range(5):
+                method, kwargs = generator.build_request(path)
+                response = client.request(method, path, **kwargs)
+                assert response.status_code == 200, (path, response.text)
+    method, kwargs = generator.build_request("/suggest")
+    # A typeahead prefix is the start of a query's first word
+    assert method == "GET" and any(word.startswith(kwargs["params"]["q"]) for word in ("citrus", "floral"))
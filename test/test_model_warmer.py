@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import threading
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.model_warmer import ModelWarmer
+
+URLS = ["http://a:11434", "http://b:11434"]
+
+
+class FakePool:
+    """Records warm-up calls; `down` maps a url to the models it fails for ("*" for all)."""
+
+    def __init__(self, down=None):
+        self.down = down or {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def post_each(self, path, payload, timeout=None):
+        with self._lock:
+            self.calls.append((path, dict(payload)))
+        results = []
+        for url in URLS:
+            failing = self.down.get(url, ())
+            if "*" in failing or payload["model"] in failing:
+                results.append((url, ConnectionError("connection refused")))
+            else:
+                results.append((url, {"done": True}))
+        return results
+
+
+def test_warm_up_exercises_every_model():
+    pool = FakePool()
+    warmer = ModelWarmer(pool, generate_model="gpt-oss:20b", embed_model="nomic-embed-text", keep_alive="30m")
+    assert warmer.warm_up()
+    generate, embed = pool.calls
+    assert generate == ("/api/generate", {"model": "gpt-oss:20b", "keep_alive": "30m", "stream": False,
+                                          "prompt": "Hi", "options": {"num_predict": 1}})
+    assert embed == ("/api/embed", {"model": "nomic-embed-text", "input": ["warm up"], "keep_alive": "30m"})
+    assert warmer.metrics()["ready"] and warmer.warm_up_ms is not None
+
+
+def test_one_answering_endpoint_per_model_is_enough():
+    warmer = ModelWarmer(FakePool(down={URLS[0]: "*"}), generate_model="gpt-oss:20b", embed_model="nomic-embed-text")
+    assert warmer.warm_up()
+    assert warmer.failures == 2
+
+
+def test_a_model_no_endpoint_loads_is_not_ready():
+    pool = FakePool(down={url: ["nomic-embed-text"] for url in URLS})
+    warmer = ModelWarmer(pool, generate_model="gpt-oss:20b", embed_model="nomic-embed-text")
+    assert not warmer.warm_up()
+    assert warmer.failures == 2
+
+
+def test_background_loop_retries_then_keeps_models_loaded():
+    pool = FakePool(down={url: "*" for url in URLS})
+    warmer = ModelWarmer(pool, generate_model="gpt-oss:20b", interval=0.01)
+    warmer.start()
+    try:
+        time.sleep(0.05)
+        assert not warmer.ready
+        pool.down = {}
+        deadline = time.monotonic() + 5
+        while warmer.refreshes < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        warmer.stop()
+    assert warmer.ready and warmer.refreshes >= 2
+    # Once warm, the loop only refreshes keep_alive with load-only requests
+    assert pool.calls[-1] == ("/api/generate", {"model": "gpt-oss:20b", "keep_alive": warmer.keep_alive,
+                                                "stream": False, "prompt": ""})
@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import numpy as np
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.neighbors import NeighborGraph, compute_neighbors, neighbors_path
+from fakes import FakeGenerator, make_teas, write_catalog
+from test_backend import make_client
+
+
+def embedded_catalog(tmp_path, n=23, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    teas = make_teas(n)
+    for tea in teas:
+        tea['embedding'] = rng.standard_normal(dim).tolist()
+    return write_catalog(tmp_path / "embedded.json", teas), teas
+
+
+def exact_neighbors(teas, k):
+    vectors = np.array([tea['embedding'] for tea in teas], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -np.inf)
+    return {tea['id']: [teas[j]['id'] for j in np.argsort(-scores[i])[:k]] for i, tea in enumerate(teas)}
+
+
+def test_tiled_neighbors_match_exact_search(tmp_path):
+    path, teas = embedded_catalog(tmp_path)
+    # Tiles smaller than the catalog, with a ragged last tile
+    out_path = compute_neighbors(path, k=4, block_size=5)
+    assert out_path == neighbors_path(path)
+    assert not os.path.exists(out_path + ".vectors")
+    with open(out_path) as f:
+        graph = json.load(f)
+    assert graph["k"] == 4
+    expected = exact_neighbors(teas, 4)
+    for tea_id, entries in graph["neighbors"].items():
+        assert [neighbor_id for neighbor_id, _ in entries] == expected[tea_id]
+        scores = [score for _, score in entries]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_k_is_capped_below_the_catalog_size(tmp_path):
+    path, _ = embedded_catalog(tmp_path, n=3)
+    graph = NeighborGraph(compute_neighbors(path, k=10))
+    assert len(graph) == 3
+    assert len(graph.similar("tea_0000")) == 2
+    assert "tea_0000" not in [neighbor_id for neighbor_id, _ in graph.similar("tea_0000")]
+    assert graph.similar("tea_9999") is None
+
+
+def test_similar_endpoint_serves_the_graph(monkeypatch, tmp_path):
+    client, pipeline = make_client(monkeypatch, tmp_path, FakeGenerator())
+    path, teas = embedded_catalog(tmp_path, n=20)
+    compute_neighbors(path, out_path=str(tmp_path / "neighbors.json"), k=5)
+    expected = exact_neighbors(teas, 5)
+    with client:
+        response = client.get("/teas/tea_0003/similar", params={"n": 3})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["name"] == "Blend 3"
+        assert [tea["id"] for tea in body["similar"]] == expected["tea_0003"][:3]
+        assert client.get("/teas/tea_9999/similar").status_code == 404
+        for n in (-1, 0, 1000):
+            assert client.get("/teas/tea_0003/similar", params={"n": n}).status_code == 422
+            assert client.get("/suggest", params={"q": "blend", "n": n}).status_code == 422
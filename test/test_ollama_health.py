@@ -5,19 +5,25 @@ from dotenv import load_dotenv
 load_dotenv()
 
 def test_ollama_health():
-    url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-    try:
-        response = requests.get(f"{url}/api/tags")
-        if response.status_code == 200:
-            print(f"Ollama is healthy at {url}")
-            models = response.json().get("models", [])
-            print("Available models:")
-            for m in models:
-                print(f" - {m['name']}")
-        else:
-            print(f"Ollama returned status code {response.status_code}")
-    except Exception as e:
-        print(f"Could not connect to Ollama at {url}: {e}")
+    urls = os.getenv("OLLAMA_URLS") or os.getenv("OLLAMA_URL", "http://localhost:11434")
+    for url in [u.strip() for u in urls.split(",") if u.strip()]:
+        try:
+            response = requests.get(f"{url}/api/tags")
+            if response.status_code == 200:
+                print(f"Ollama is healthy at {url}")
+                models = response.json().get("models", [])
+                print("Available models:")
+                for m in models:
+                    print(f" - {m['name']}")
+                # Models currently resident in memory; anything missing pays a cold load on its next request
+                loaded = requests.get(f"{url}/api/ps").json().get("models", [])
+                print("Loaded models:")
+                for m in loaded:
+                    print(f" - {m['name']} (until {m.get('expires_at', 'unknown')})")
+            else:
+                print(f"Ollama returned status code {response.status_code}")
+        except Exception as e:
+            print(f"Could not connect to Ollama at {url}: {e}")
 
 if __name__ == "__main__":
     test_ollama_health()
@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import requests
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.ollama_pool import OllamaPool
+
+
+class StubServer:
+    """An HTTP server answering every POST with {"embeddings": [[1.0]]} after `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.hits += 1
+                time.sleep(stub.delay)
+                body = json.dumps({"embeddings": [[1.0]]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(delay=0.0):
+        server = StubServer(delay)
+        started.append(server)
+        return server
+    yield start
+    for server in started:
+        server.close()
+
+
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def prime_latency(pool, path, seconds, samples=20):
+    """Pretends `samples` calls to path took `seconds`, so hedging has a p95 to go on."""
+    for endpoint in pool.endpoints:
+        endpoint.latencies[path] = [seconds] * samples
+
+
+def test_calls_go_to_the_least_loaded_endpoint(servers):
+    slow, fast = servers(delay=0.5), servers()
+    pool = OllamaPool([slow.url, fast.url])
+    pool.endpoints[1].outstanding = 1
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # The first call goes to the idle slow server; while it is busy, the rest go to the fast one
+        pending = executor.submit(pool.post, "/api/embed", {})
+        time.sleep(0.1)
+        pool.endpoints[1].outstanding = 0
+        for _ in range(3):
+            pool.post("/api/embed", {})
+        pending.result()
+    assert slow.hits == 1
+    assert fast.hits == 3
+
+
+def test_unreachable_endpoint_is_ejected_and_failed_over(servers):
+    live = servers()
+    pool = OllamaPool([closed_port_url(), live.url], eject_seconds=60)
+    # The first call picks the dead server and fails over to the live one
+    pool.endpoints[1].outstanding = 1
+    assert pool.post("/api/embed", {}) == {"embeddings": [[1.0]]}
+    pool.endpoints[1].outstanding = 0
+    for _ in range(3):
+        assert pool.post("/api/embed", {}) == {"embeddings": [[1.0]]}
+    assert live.hits == 4
+    dead = pool.endpoints[0]
+    assert not dead.healthy
+    # Once ejected it is not tried again until the ejection expires
+    assert dead.errors == 1
+
+
+def test_every_endpoint_down_raises():
+    pool = OllamaPool([closed_port_url(), closed_port_url()])
+    with pytest.raises(requests.ConnectionError):
+        pool.post("/api/embed", {})
+
+
+def test_slow_call_is_hedged_to_another_endpoint(servers):
+    slow, fast = servers(delay=1.0), servers()
+    pool = OllamaPool([slow.url, fast.url])
+    prime_latency(pool, "/api/embed", 0.05)
+    # Make the slow server the one picked first
+    pool.endpoints[1].outstanding = 1
+    start = time.perf_counter()
+    assert pool.post("/api/embed", {}, hedge=True) == {"embeddings": [[1.0]]}
+    assert time.perf_counter() - start < 0.5
+    assert pool.hedged == 1 and pool.hedge_wins == 1
+
+
+def test_hedges_do_not_queue_behind_the_calls_they_race(servers, monkeypatch):
+    monkeypatch.setenv("OLLAMA_HEDGE_WORKERS", "2")
+    slow, fast = servers(delay=1.0), servers(delay=1.0)
+    pool = OllamaPool([slow.url, fast.url])
+    prime_latency(pool, "/api/embed", 0.05)
+    # Four concurrent hedged calls with two hedge threads: the first takes both
+    # (primary and backup), the others go out unhedged instead of waiting for a thread
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: pool.post("/api/embed", {}, hedge=True), range(4)))
+    assert all(result == {"embeddings": [[1.0]]} for result in results)
+    assert time.perf_counter() - start < 1.8
+    assert pool.hedged <= 1
+    assert pool.hedges_skipped >= 2
+
+
+def test_empty_hedge_workers_setting_uses_the_default(monkeypatch):
+    # .env.example lists OLLAMA_HEDGE_WORKERS with no value
+    monkeypatch.setenv("OLLAMA_HEDGE_WORKERS", "")
+    pool = OllamaPool(["http://127.0.0.1:1", "http://127.0.0.1:2"])
+    assert pool._hedge_executor._max_workers == 8
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import pytest
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.deadline import Deadline, DeadlineExceeded, is_timeout
+from agent.generators import OpenAIGenerator
+from agent.openai_scheduler import OpenAIScheduler
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_calls_within_the_limits_are_not_counted_as_throttled():
+    scheduler = OpenAIScheduler(rpm=600, tpm=100000)
+    for _ in range(5):
+        assert scheduler.call(lambda: "ok", 100) == "ok"
+    metrics = scheduler.metrics()
+    assert metrics["calls"] == 5
+    assert metrics["throttled"] == 0 and metrics["throttled_s"] == 0
+
+
+def test_waits_are_counted_when_the_bucket_is_empty():
+    # Two requests a second: the third call has to wait for a refill
+    scheduler = OpenAIScheduler(rpm=120, tpm=100000)
+    scheduler._requests.level = 1
+    start = time.perf_counter()
+    scheduler.call(lambda: "ok", 10)
+    scheduler.call(lambda: "ok", 10)
+    assert time.perf_counter() - start >= 0.4
+    assert scheduler.throttled == 1
+    assert 0.4 <= scheduler.throttled_seconds < 1.0
+
+
+def test_wait_longer_than_the_deadline_raises_at_once():
+    scheduler = OpenAIScheduler(rpm=60, tpm=100000)
+    scheduler._requests.level = 0
+    calls = []
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded) as error:
+        scheduler.call(lambda: calls.append(1), 10, Deadline(0.2))
+    assert time.perf_counter() - start < 0.1
+    assert is_timeout(error.value)
+    assert not calls
+    assert scheduler.deadline_refused == 1 and scheduler.queue_depth == 0
+
+
+def test_rate_limit_pause_is_checked_against_the_deadline():
+    scheduler = OpenAIScheduler(rpm=600, tpm=100000, max_retries=2)
+
+    def limited():
+        error = RateLimited()
+        error.response = type("Response", (), {"headers": {"retry-after": "5"}})()
+        raise error
+    with pytest.raises(DeadlineExceeded):
+        scheduler.call(limited, 10, Deadline(1.0))
+    assert scheduler.rate_limited == 1
+
+
+class RecordingCompletions:
+    def __init__(self):
+        self.timeouts = []
+
+    def create(self, messages, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        message = type("Message", (), {"content": "Try Earl Grey."})()
+        return type("Response", (), {"choices": [type("Choice", (), {"message": message})()], "usage": None})()
+
+
+def test_generator_timeout_covers_the_rate_limit_wait():
+    completions = RecordingCompletions()
+    client = type("Client", (), {"chat": type("Chat", (), {"completions": completions})()})()
+    scheduler = OpenAIScheduler(rpm=120, tpm=100000)
+    scheduler._requests.level = 0
+    generator = OpenAIGenerator(client=client, scheduler=scheduler)
+    assert generator.generate("system", "prompt", timeout=2.0) == "Try Earl Grey."
+    # About 0.5s went to waiting for a request slot, so the HTTP call got what was left
+    assert completions.timeouts[0] < 1.6
+    with pytest.raises(DeadlineExceeded):
+        scheduler._requests.level = 0
+        generator.generate("system", "prompt", timeout=0.2)
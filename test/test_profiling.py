@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import time
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.profiling import RequestProfiler, active_session, profiled
+from agent.tea_pipeline import StageStats
+from evaluation.profile_eval import disable_caches
+from fakes import FakeEmbedder, FakeGenerator, make_pipeline
+
+
+class Worker:
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.stats = StageStats()
+
+    @profiled("work")
+    def work(self, size):
+        with self.stats.time("allocate"):
+            self.buffer = bytearray(size)
+        with self.stats.time("wait"):
+            busy_wait(0.03)
+        return active_session()
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampled_calls_record_stacks_and_stage_allocations(tmp_path):
+    profiler = RequestProfiler(sample_rate=1.0, interval_ms=1, out_dir=str(tmp_path), trace_memory=True)
+    worker = Worker(profiler)
+    for _ in range(2):
+        assert worker.work(256 * 1024) is not None
+    summary = profiler.summary()
+    assert summary["sampled_requests"] == 2
+    assert summary["samples"] > 0
+    # Stacks start at the label and the profiled method, without the decorator frame
+    with open(tmp_path / "recommend.collapsed") as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.startswith("work;test_profiling.py:work") for line in lines)
+    assert any("test_profiling.py:busy_wait" in frame for frame, _ in summary["top_frames"])
+    assert not any("wrapper" in line for line in lines)
+    with open(tmp_path / "stages.json") as f:
+        stages = json.load(f)
+    assert stages["allocate"]["count"] == 2
+    assert 250 <= stages["allocate"]["avg_alloc_kb"] < 300
+    assert stages["wait"]["avg_alloc_kb"] < 16
+
+
+def test_unsampled_calls_are_not_profiled(tmp_path):
+    profiler = RequestProfiler(sample_rate=0, out_dir=str(tmp_path))
+    assert Worker(profiler).work(1024) is None
+    assert profiler.summary()["sampled_requests"] == 0
+    assert not os.path.exists(tmp_path / "recommend.collapsed")
+
+
+def test_profiled_passes_run_the_whole_pipeline(monkeypatch, tmp_path):
+    monkeypatch.setenv("SEMANTIC_CACHE_SIZE", "16")
+    embedder, generator = FakeEmbedder(), FakeGenerator()
+    pipeline = make_pipeline(tmp_path, embedder=embedder, generator=generator)
+    disable_caches(pipeline)
+    for _ in range(3):
+        pipeline.recommend("citrus black tea", structured=True)
+    assert generator.calls == 3
+    assert embedder.queries_embedded == 3
@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.deadline import Deadline
+from agent.query_router import QueryRouter
+from fakes import FakeGenerator, make_pipeline, make_teas, write_catalog
+
+
+def make_router(tmp_path, llm=True, rag_generator=None, llm_generator=None, **kwargs):
+    (tmp_path / "rag").mkdir()
+    rag = make_pipeline(tmp_path / "rag", generator=rag_generator)
+    inventory = None
+    if llm:
+        (tmp_path / "llm").mkdir()
+        inventory = make_pipeline(tmp_path / "llm", generator=llm_generator, index_backend=None)
+    return QueryRouter(rag, inventory, log_path=str(tmp_path / "router.jsonl"), **kwargs)
+
+
+def test_rules_route_lookups_comparisons_and_follow_ups(tmp_path):
+    router = make_router(tmp_path)
+    assert router.route("green tea") == ("retrieval", "attribute_lookup")
+    assert router.route("citrus black tea with no caffeine") == ("retrieval", "attribute_lookup")
+    assert router.route("Compare green and white tea for mornings") == ("llm", "comparison")
+    # Two catalog names in one query are a comparison too
+    assert router.route("Blend 3 or Blend 4 for breakfast") == ("llm", "comparison")
+
+    session = router.rag.sessions.get("s1")
+    assert router.route("something less smoky than that", session_id="s1")[1] != "follow_up"
+    session.add_turn("smoky tea", "Recommended Blend 2", ["tea_0002"])
+    assert router.route("something less smoky than that", session_id="s1") == ("rag", "follow_up")
+
+
+def test_comparisons_stay_on_rag_without_an_llm_mode(tmp_path):
+    router = make_router(tmp_path, llm=False)
+    assert router.route("Compare green and white tea") == ("rag", "comparison, no llm mode")
+
+
+def test_unsure_classifier_falls_back_to_rag(tmp_path):
+    router = make_router(tmp_path, min_margin=10)
+    assert router.route("What should I drink on a cold rainy afternoon by the fire?") == ("rag", "default")
+
+
+def test_vocabulary_follows_catalog_reloads(tmp_path):
+    router = make_router(tmp_path)
+    assert router.route("rooibos")[1] != "attribute_lookup"
+    teas = make_teas(20)
+    teas[0]['type'] = "Rooibos"
+    write_catalog(tmp_path / "rag" / "catalog.json", teas)
+    router.rag.reload()
+    assert router.route("rooibos") == ("retrieval", "attribute_lookup")
+
+
+def test_retrieval_mode_answers_without_generating(tmp_path):
+    generator = FakeGenerator()
+    router = make_router(tmp_path, rag_generator=generator)
+    tea_ids, degraded, mode = router.recommend_within("green tea", Deadline(30))
+    assert (degraded, mode) == (None, "retrieval")
+    assert tea_ids == [tea['id'] for tea, _ in router.rag.retrieve("green tea")]
+    assert generator.calls == 0
+    assert router.metrics() == {"retrieval": 1, "rag": 0, "llm": 0}
+
+
+def test_llm_mode_falls_back_to_the_vector_ranking(tmp_path):
+    router = make_router(tmp_path, llm_generator=FakeGenerator(error=ConnectionError("model server down")))
+    # The LLM mode shares the RAG pipeline's guard, so its failure shows up there
+    assert router.llm.generation_guard is router.rag.generation_guard
+    query = "Compare green and white tea"
+    tea_ids, degraded, mode = router.recommend_within(query, Deadline(30))
+    assert (degraded, mode) == ("error", "llm")
+    assert tea_ids == router.rag.recommend_ranked(query)
+
+
+def test_decisions_are_logged(tmp_path):
+    router = make_router(tmp_path)
+    router.recommend_within("green tea", Deadline(30))
+    router.recommend_within("Compare green and white tea", Deadline(30))
+    with open(router.log_path) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r["query"], r["mode"]) for r in records] == [("green tea", "retrieval"), ("Compare green and white tea", "llm")]
+    assert all(r["total_ms"] >= r["route_ms"] for r in records)
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.deadline import Deadline
+from agent.generators import OllamaGenerator
+from agent.reranker import LLMReranker
+from fakes import FakeGenerator, make_teas
+
+
+def make_hits(count=20):
+    return [(tea, None) for tea in make_teas(count)]
+
+
+def test_scoring_calls_are_bounded_across_requests():
+    generator = FakeGenerator(delay=0.05)
+    reranker = LLMReranker(generator, workers=4)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(lambda _: reranker.rerank("citrus", make_hits(), 3), range(3)))
+    assert generator.calls == 60
+    assert generator.max_in_flight <= 4
+
+
+def test_candidates_are_capped_by_the_deadline():
+    generator = FakeGenerator(delay=0.05)
+    reranker = LLMReranker(generator, workers=2)
+    reranker.guard.latency_estimate = 0.1
+    hits = make_hits(50)
+    # Just under 0.5s affords four rounds of two calls after a 0.05s reserve
+    start = time.perf_counter()
+    ranked = reranker.rerank("citrus", hits, 3, Deadline(0.5), reserve=0.05)
+    assert time.perf_counter() - start < 0.5
+    assert generator.calls == 8
+    assert reranker.skipped == 42
+    assert len(ranked) == 3
+
+
+def test_exhausted_budget_keeps_retrieval_order():
+    generator = FakeGenerator()
+    reranker = LLMReranker(generator, workers=2)
+    hits = make_hits(5)
+    ranked = reranker.rerank("citrus", hits, 3, Deadline(0.0))
+    assert generator.calls == 0
+    assert [tea['id'] for tea, _ in ranked] == [tea['id'] for tea, _ in hits[:3]]
+
+
+def test_open_breaker_stops_scoring():
+    generator = FakeGenerator(error=ConnectionError("model server down"))
+    reranker = LLMReranker(generator, workers=1)
+    reranker.guard.breaker.failure_threshold = 3
+    reranker.rerank("citrus", make_hits(10), 3)
+    # Three failures open the breaker; the other candidates are not sent to the server
+    assert generator.calls == 3
+    assert reranker.metrics()["breaker"] == "open"
+
+
+class RecordingPool:
+    url = "http://stub"
+
+    def __init__(self, response):
+        self.response = response
+        self.payloads = []
+
+    def post(self, path, payload, timeout=None, hedge=False):
+        self.payloads.append(payload)
+        return {"response": self.response}
+
+
+def test_ollama_score_is_a_short_answer_without_thinking(monkeypatch):
+    monkeypatch.setenv("OLLAMA_REASONING_TOKENS", "256")
+    monkeypatch.setenv("RERANK_MODEL", "llama3.2:3b")
+    generator = OllamaGenerator()
+    generator.pool = RecordingPool(" 7")
+    assert generator.generate_score("system", "prompt") == 7 / 9
+    payload = generator.pool.payloads[0]
+    # Reasoning tokens are for generation, not for a one-digit score
+    assert payload["options"]["num_predict"] == 2
+    assert payload["think"] is False
+    assert payload["model"] == "llama3.2:3b"
+    generator.pool.response = ""
+    assert generator.generate_score("system", "prompt") == 0.0
+
+
+def test_stub_server_answers_score_prompts_with_a_digit():
+    from agent.reranker import RERANK_PROMPT
+    from loadtest.stub_model_server import StubModel
+    prompt = RERANK_PROMPT.format(tea="Blend 1 (Black): malty.", query="breakfast tea")
+    answer = StubModel(embed_ms=0, generate_ms=0, jitter=0, parallel=1).generate({"prompt": prompt, "options": {"num_predict": 2}})
+    assert answer.isdigit() and len(answer) == 1
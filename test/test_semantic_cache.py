@@ -0,0 +1,109 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.semantic_cache import SemanticCache
+from fakes import FakeGenerator, make_pipeline
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def at_cosine(cosine):
+    """A unit vector at exactly `cosine` similarity to the first axis."""
+    return np.asarray([cosine, np.sqrt(1 - cosine ** 2), 0.0], dtype=np.float32)
+
+
+def test_default_size_matches_env_example(monkeypatch):
+    monkeypatch.delenv("SEMANTIC_CACHE_SIZE", raising=False)
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env.example")) as f:
+        example = dict(line.strip().split("=", 1) for line in f if "=" in line)
+    assert SemanticCache().maxsize == int(example["SEMANTIC_CACHE_SIZE"])
+
+
+def test_hit_needs_the_threshold():
+    cache = SemanticCache(maxsize=4, threshold=0.9)
+    base = unit(1, 0, 0)
+    cache.put(base, "answer", 1)
+    assert cache.get(at_cosine(0.95), 1) == "answer"
+    assert cache.get(at_cosine(0.85), 1) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_closest_entry_wins():
+    cache = SemanticCache(maxsize=4, threshold=0.5)
+    cache.put(unit(1, 0, 0), "x", 1)
+    cache.put(unit(0, 1, 0), "y", 1)
+    assert cache.get(unit(0.6, 0.8, 0), 1) == "y"
+
+
+def test_entries_only_match_their_catalog_version_and_mode():
+    cache = SemanticCache(maxsize=4, threshold=0.9)
+    cache.put(unit(1, 0, 0), ["tea-0001"], 1, mode=True)
+    assert cache.get(unit(1, 0, 0), 2, mode=True) is None
+    assert cache.get(unit(1, 0, 0), 1, mode=False) is None
+    assert cache.get(unit(1, 0, 0), 1, mode=True) == ["tea-0001"]
+
+
+def test_stale_versions_are_evicted_first():
+    cache = SemanticCache(maxsize=2, threshold=0.9, policy="lfu")
+    cache.put(unit(1, 0, 0), "old", 1)
+    for _ in range(5):
+        cache.get(unit(1, 0, 0), 1)
+    cache.put(unit(0, 1, 0), "new", 2)
+    # The old entry is the most used, but it can never hit again
+    cache.put(unit(0, 0, 1), "newer", 2)
+    assert cache.get(unit(0, 1, 0), 2) == "new"
+    assert cache.get(unit(0, 0, 1), 2) == "newer"
+    assert cache.evictions == 1
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = SemanticCache(maxsize=2, threshold=0.9, policy="lru")
+    cache.put(unit(1, 0, 0), "a", 1)
+    cache.put(unit(0, 1, 0), "b", 1)
+    cache.get(unit(1, 0, 0), 1)
+    cache.put(unit(0, 0, 1), "c", 1)
+    assert cache.get(unit(1, 0, 0), 1) == "a"
+    assert cache.get(unit(0, 1, 0), 1) is None
+
+
+def test_lfu_evicts_the_least_frequently_used():
+    cache = SemanticCache(maxsize=2, threshold=0.9, policy="lfu")
+    cache.put(unit(1, 0, 0), "a", 1)
+    cache.put(unit(0, 1, 0), "b", 1)
+    cache.get(unit(1, 0, 0), 1)
+    cache.get(unit(1, 0, 0), 1)
+    cache.get(unit(0, 1, 0), 1)  # b is now the most recent, but a is used more
+    cache.put(unit(0, 0, 1), "c", 1)
+    assert cache.get(unit(1, 0, 0), 1) == "a"
+    assert cache.get(unit(0, 1, 0), 1) is None
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        SemanticCache(maxsize=2, policy="fifo")
+
+
+def test_disabled_cache_stores_nothing():
+    cache = SemanticCache(maxsize=0)
+    cache.put(unit(1, 0, 0), "a", 1)
+    assert not cache.enabled and len(cache) == 0 and cache.get(unit(1, 0, 0), 1) is None
+
+
+def test_pipeline_answers_repeat_queries_from_the_cache_until_reload(monkeypatch, tmp_path):
+    monkeypatch.setenv("SEMANTIC_CACHE_SIZE", "16")
+    generator = FakeGenerator()
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    first = pipeline.recommend("citrus black tea", structured=True)
+    assert pipeline.recommend("citrus black tea", structured=True) == first
+    assert generator.calls == 1
+    # A new catalog version invalidates every cached answer
+    pipeline.build_index()
+    pipeline.recommend("citrus black tea", structured=True)
+    assert generator.calls == 2
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.context import count_tokens
+from agent.sessions import Session, SessionStore
+from fakes import FakeGenerator, make_pipeline
+
+
+def test_follow_ups_need_an_earlier_answer():
+    session = Session("s1", budget=256)
+    assert not session.is_follow_up("something less smoky than that")
+    session.add_turn("smoky tea", "Recommended Blend 2", ["tea_0002"])
+    assert session.is_follow_up("something less smoky than that")
+    assert not session.is_follow_up("floral green tea")
+    assert session.last_tea_ids == ["tea_0002"]
+
+
+def test_only_references_to_the_previous_answer_are_follow_ups():
+    session = Session("s1", budget=256)
+    session.add_turn("smoky tea", "Recommended Blend 2", ["tea_0002"])
+    for query in ("that one but cheaper", "the second one please", "another", "Cheaper?", "something milder",
+                  "is it caffeinated?", "similar to the first one", "more like those"):
+        assert session.is_follow_up(query), query
+    # Comparatives and pronouns inside a standalone query do not refer back
+    for query in ("a tea that is more floral than sencha", "is there a green tea with less caffeine",
+                  "other herbal teas for sleep", "I like it strong and smoky", "teas similar to sencha",
+                  "something floral for the morning"):
+        assert not session.is_follow_up(query), query
+
+
+def test_history_is_compacted_to_the_budget():
+    session = Session("s1", budget=60)
+    for i in range(30):
+        session.add_turn(f"question number {i} about a strong breakfast tea", f"Recommended Blend {i} and Blend {i + 1}", [f"tea_{i:04d}"])
+    history = session.history()
+    assert session.turn_count == 30
+    # The newest turn stays verbatim, older ones are summarized and the oldest dropped
+    assert history.endswith("User: question number 29 about a strong breakfast tea\nTeaBot: Recommended Blend 29 and Blend 30\n")
+    assert history.startswith("Earlier in this conversation:\n")
+    assert "question number 0 " not in history
+    assert count_tokens(history) <= 60 + count_tokens("Earlier in this conversation:\n")
+
+
+def test_idle_sessions_expire():
+    store = SessionStore(ttl=0.05)
+    store.get("s1").add_turn("smoky tea", "Recommended Blend 2", ["tea_0002"])
+    time.sleep(0.1)
+    assert store.get("s1").history() == ""
+    assert store.metrics()["expired"] == 1
+
+
+def test_least_recently_used_sessions_are_evicted():
+    store = SessionStore(maxsize=2)
+    store.get("a")
+    store.get("b")
+    store.get("a")
+    store.get("c")
+    assert len(store) == 2
+    assert not store.end("b")
+    assert store.end("a") and store.end("c")
+    assert store.metrics()["evicted"] == 1
+
+
+def test_pipeline_sends_history_and_adds_follow_up_candidates(monkeypatch, tmp_path):
+    monkeypatch.setenv("SEMANTIC_CACHE_SIZE", "16")
+    generator = FakeGenerator()
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    first = pipeline.recommend("smoky black tea", structured=True, session_id="s1")
+    session = pipeline.sessions.get("s1")
+    assert session.last_tea_ids == first
+    assert "User: smoky black tea" in session.history()
+
+    # A follow-up skips the semantic cache (its answer depends on the history) and
+    # keeps the previous answer's teas among its candidates
+    hits = pipeline._with_previous(session, "something milder than that", pipeline.candidates("something milder than that"), None)
+    assert set(first) <= {tea['id'] for tea, _ in hits}
+    pipeline.recommend("something milder than that", structured=True, session_id="s1")
+    pipeline.recommend("something milder than that", structured=True, session_id="s1")
+    assert generator.calls == 3
+    assert pipeline.sessions.metrics()["follow_ups"] == 3
+    assert session.turn_count == 3
@@ -0,0 +1,134 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.indexes import NumpyIndex
+from agent.sharding import ShardPool, ShardedIndex, ShardLostError
+from fakes import make_pipeline
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ShardPool(2)
+    yield pool
+    pool.close()
+
+
+def make_rows(count=200, dims=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return [f"tea-{i}" for i in range(count)], rng.standard_normal((count, dims)).astype(np.float32)
+
+
+def kill_shard(pool, shard):
+    pool._procs[shard].kill()
+    pool._procs[shard].join()
+
+
+def test_sharded_search_matches_numpy(pool):
+    ids, vectors = make_rows()
+    exact = NumpyIndex("exact")
+    exact.add(ids, vectors)
+    index = ShardedIndex("matches", pool=pool, min_rows=0)
+    index.add(ids[:100], vectors[:100])
+    index.add(ids[100:], vectors[100:])
+    assert index.sharded
+    assert index.count() == len(ids)
+    queries = vectors[:5] + 0.1
+    for (found, scores), (expected, expected_scores) in zip(index.search_batch(queries, 10), exact.search_batch(queries, 10)):
+        assert found == expected
+        assert scores == pytest.approx(expected_scores, abs=1e-5)
+    assert np.allclose(index.get_embeddings(ids[:3]), exact.get_embeddings(ids[:3]), atol=1e-6)
+    index.drop()
+
+
+def test_small_index_stays_in_process():
+    ids, vectors = make_rows(50)
+    # No pool is given: a sharded index below min_rows must never start one
+    index = ShardedIndex("small", min_rows=100)
+    index.add(ids, vectors)
+    assert not index.sharded
+    assert index.metrics() == {"sharded": False, "min_rows": 100, "repairs": 0}
+    assert index._pool is None
+    assert index.search(vectors[0], 1)[0] == [ids[0]]
+
+
+def test_index_moves_to_shards_past_min_rows(pool):
+    ids, vectors = make_rows(150)
+    index = ShardedIndex("grows", pool=pool, min_rows=100)
+    index.add(ids[:80], vectors[:80])
+    assert not index.sharded
+    index.add(ids[80:], vectors[80:])
+    assert index.sharded and index.count() == 150
+    assert index.search(vectors[120], 1)[0] == [ids[120]]
+    index.drop()
+
+
+def test_killed_shard_is_rebuilt_from_the_callback(pool):
+    ids, vectors = make_rows()
+    by_id = dict(zip(ids, vectors))
+    rebuilt = []
+
+    def rebuild(chunk):
+        rebuilt.extend(chunk)
+        return [by_id[tea_id] for tea_id in chunk]
+    index = ShardedIndex("rebuilt", pool=pool, rebuild=rebuild, min_rows=0)
+    index.add(ids, vectors)
+    restarts = pool.restarts
+    kill_shard(pool, 0)
+
+    found, _ = index.search(vectors[7], 1)
+    assert found == [ids[7]]
+    assert pool.restarts == restarts + 1 and index.repairs == 1
+    assert sorted(rebuilt) == sorted(i for i in ids if index.shard_of(i) == 0)
+    assert index.count() == len(ids)
+    # Adds after a repair go to the healthy shard once, not twice
+    kill_shard(pool, 1)
+    index.add(["tea-new"], vectors[:1] * -1)
+    assert index.count() == len(ids) + 1
+    index.drop()
+
+
+def test_killed_shard_without_rebuild_fails_the_call(pool):
+    ids, vectors = make_rows()
+    index = ShardedIndex("unrepaired", pool=pool, min_rows=0)
+    index.add(ids, vectors)
+    kill_shard(pool, 1)
+    with pytest.raises(ShardLostError) as error:
+        index.search(vectors[0], 5)
+    assert error.value.shards == [1]
+    # The replacement worker does not pretend to have the partition
+    with pytest.raises(ShardLostError):
+        index.count()
+    index.drop()
+
+
+def test_unknown_index_name_is_an_error(pool):
+    with pytest.raises(ShardLostError):
+        pool.scatter({0: ("search_batch", "never-created", (np.zeros((1, 4), dtype=np.float32), 3))})
+    with pytest.raises(ShardLostError):
+        pool.scatter({1: ("count", "never-created", ())})
+
+
+def test_pipeline_rebuilds_a_killed_shard_from_its_catalog(monkeypatch, tmp_path):
+    monkeypatch.setenv("INDEX_SHARDS", "2")
+    monkeypatch.setenv("INDEX_SHARD_MIN_ROWS", "0")
+    pipeline = make_pipeline(tmp_path, index_backend="sharded")
+    expected = [tea['id'] for tea, _ in pipeline.retrieve("citrus black tea", k=5)]
+    index = pipeline.index.current.index
+    kill_shard(index.pool, 0)
+    assert [tea['id'] for tea, _ in pipeline.retrieve("floral green tea", k=5)]
+    assert index.repairs == 1
+    assert [tea['id'] for tea, _ in pipeline.retrieve("citrus black tea", k=5)] == expected
+
+
+def test_empty_shard_count_setting_uses_the_cpu_count(monkeypatch):
+    # .env.example lists INDEX_SHARDS with no value
+    monkeypatch.setenv("INDEX_SHARDS", "")
+    pool = ShardPool()
+    try:
+        assert pool.shards == (os.cpu_count() or 1)
+    finally:
+        pool.close()
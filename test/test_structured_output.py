@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import pytest
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.deadline import Deadline
+from agent.tea_pipeline import schema_token_budget
+from fakes import FakeGenerator, make_pipeline
+
+QUERY = "citrus black tea"
+
+
+def retrieval_ids(pipeline, query=QUERY):
+    return [tea['id'] for tea, _ in pipeline.candidates(query)[:pipeline.retrieval_n]]
+
+
+@pytest.mark.parametrize("response", [
+    '{"tea_ids": ["tea-00',  # cut off at the token cap
+    'not json',
+    '{"ids": ["tea-0001"]}',  # wrong key
+    '{"tea_ids": 3}',  # wrong type
+    'null'
+])
+def test_unusable_output_falls_back_to_retrieval(tmp_path, response):
+    pipeline = make_pipeline(tmp_path, generator=FakeGenerator(response=response))
+    assert pipeline.recommend(QUERY, structured=True) == retrieval_ids(pipeline)
+    tea_ids, degraded = pipeline.recommend_within(QUERY, Deadline(30))
+    assert tea_ids == retrieval_ids(pipeline)
+    assert degraded == "malformed"
+    # An unusable answer is not a server failure
+    assert pipeline.generation_guard.breaker._failures == 0
+
+
+def test_structured_recommend_does_not_raise_on_generation_errors(tmp_path):
+    pipeline = make_pipeline(tmp_path, generator=FakeGenerator(error=ConnectionError("model server down")))
+    assert pipeline.recommend(QUERY, structured=True) == retrieval_ids(pipeline)
+
+
+def test_fallback_answers_are_not_cached(monkeypatch, tmp_path):
+    monkeypatch.setenv("SEMANTIC_CACHE_SIZE", "16")
+    generator = FakeGenerator(response='{"tea_ids": [')
+    pipeline = make_pipeline(tmp_path, generator=generator)
+    pipeline.recommend(QUERY, structured=True)
+    generator.response = None
+    pipeline.recommend(QUERY, structured=True)
+    assert generator.calls == 2
+
+
+def test_batch_reports_malformed_output(tmp_path):
+    pipeline = make_pipeline(tmp_path, generator=FakeGenerator(response="{"))
+    results = list(pipeline.recommend_batch([QUERY, "floral green tea"]))
+    assert [degraded for _, degraded in results] == ["malformed", "malformed"]
+    assert results[0][0] == retrieval_ids(pipeline)
+
+
+def test_token_budget_covers_a_token_per_character():
+    ids = ["tea-0001", "tea-0002", "tea-0003", "tea-0004"]
+    # Worst case: one token per character of a pretty-printed answer
+    answer = json.dumps({"tea_ids": ids[:3]}, indent=2)
+    assert len(answer) <= schema_token_budget(ids, 3)
@@ -0,0 +1,69 @@
+import os
+import sys
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.catalog import TeaCatalog
+from agent.suggest import SuggestIndex
+from fakes import make_pipeline, make_teas, write_catalog
+
+TEAS = [
+    {"id": "t1", "name": "Jasmine Dragon Pearls", "type": "Green", "flavors": ["Floral"], "popularity": 5},
+    {"id": "t2", "name": "Dragonwell", "type": "Green", "flavors": ["Nutty"], "popularity": 20},
+    {"id": "t3", "name": "Rooïbos Vanilla", "type": "Herbal", "flavors": ["Sweet"]},
+    {"id": "t4", "name": "Darjeeling First Flush", "type": "Black", "flavors": ["Floral", "Fruity"], "popularity": 8},
+]
+
+
+def make_index(**kwargs):
+    catalog = TeaCatalog()
+    for tea in TEAS:
+        catalog.append(dict(tea, description="", caffeine="Low"))
+    return SuggestIndex.from_catalog(catalog, **kwargs)
+
+
+def texts(suggestions):
+    return [s["text"] for s in suggestions]
+
+
+def test_every_word_start_matches_in_popularity_order():
+    index = make_index()
+    assert texts(index.lookup("dra")) == ["Dragonwell", "Jasmine Dragon Pearls"]
+    assert index.lookup("pearls") == [{"text": "Jasmine Dragon Pearls", "kind": "name", "tea_id": "t1"}]
+    assert index.lookup("xyz") == [] and index.lookup("  ") == []
+
+
+def test_types_and_flavors_rank_by_how_many_teas_carry_them():
+    index = make_index()
+    assert index.lookup("flo")[0] == {"text": "Floral", "kind": "flavor", "tea_id": None}
+    assert [s for s in index.lookup("g") if s["kind"] == "type"] == [{"text": "Green", "kind": "type", "tea_id": None}]
+
+
+def test_case_and_accents_are_ignored():
+    index = make_index()
+    assert texts(index.lookup("ROOIB")) == ["Rooïbos Vanilla"]
+    assert texts(index.lookup("rooïbos")) == ["Rooïbos Vanilla"]
+
+
+def test_precomputed_prefixes_match_the_bisect_path():
+    precomputed, bisected = make_index(precompute=3), make_index(precompute=0)
+    for prefix in ["d", "dr", "dra", "f", "fl", "g", "r", "v", "ja"]:
+        assert precomputed.lookup(prefix) == bisected.lookup(prefix), prefix
+
+
+def test_results_are_capped_at_the_limit():
+    index = make_index(limit=2)
+    assert len(index.lookup("d")) == 2
+    assert len(index.lookup("d", n=10)) == 2
+    assert len(index.lookup("d", n=1)) == 1
+
+
+def test_pipeline_suggestions_follow_reloads(tmp_path):
+    pipeline = make_pipeline(tmp_path, teas=make_teas(5))
+    assert texts(pipeline.suggest("blend 4")) == ["Blend 4"]
+    teas = make_teas(5)
+    teas[4]['name'] = "Keemun Blend"
+    write_catalog(tmp_path / "catalog.json", teas)
+    pipeline.reload()
+    assert pipeline.suggest("blend 4") == []
+    assert texts(pipeline.suggest("kee")) == ["Keemun Blend"]
@@ -0,0 +1,101 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add project root to path to import shared agent modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.user_profiles import EVENT_WEIGHTS, UserProfileStore
+from fakes import FakeGenerator, make_pipeline
+from test_backend import make_client
+
+QUERY = "citrus black tea"
+
+
+@pytest.fixture(autouse=True)
+def profile_path(monkeypatch, tmp_path):
+    # Keep the shelve files out of the repo
+    path = str(tmp_path / "profiles" / "profiles")
+    monkeypatch.setenv("USER_PROFILE_PATH", path)
+    return path
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_feedback_folds_into_a_decayed_weighted_sum(profile_path):
+    store = UserProfileStore(decay=0.5)
+    a, b = unit([1, 0, 0, 0]), unit([0, 3, 0, 0])
+    assert store.update("u1", a, "purchase") == 1
+    assert store.update("u1", b, "dislike") == 2
+    profile = store._profile("u1")
+    np.testing.assert_allclose(profile["vector"], 0.5 * EVENT_WEIGHTS["purchase"] * a + EVENT_WEIGHTS["dislike"] * b)
+    assert store.has_profile("u1") and not store.has_profile("u2")
+    with pytest.raises(ValueError):
+        store.update("u1", a, "stare")
+    store.close()
+
+
+def test_blend_ramps_up_with_events(profile_path):
+    store = UserProfileStore(weight=0.5)
+    query = [1.0, 0.0]
+    assert store.blend("u1", query) == query
+    shares = []
+    for _ in range(3):
+        store.update("u1", [0.0, 1.0], "like")
+        shares.append(store.blend("u1", query)[1])
+    # Each event moves the blended vector further toward the profile, up to the weight
+    assert 0 < shares[0] < shares[1] < shares[2] < 0.5
+    assert store.blend(None, query) == query
+    store.close()
+
+
+def test_profiles_persist_across_eviction_and_reopening(profile_path):
+    store = UserProfileStore(maxsize=1)
+    store.update("u1", [1.0, 0.0], "like")
+    store.update("u2", [0.0, 1.0], "click")
+    # u1 was written out to make room for u2, and is read back on use
+    assert store.metrics()["evictions"] == 1
+    assert store.update("u1", [1.0, 0.0], "purchase") == 2
+    assert store.metrics()["loads"] == 1
+    vector = store._profile("u1")["vector"].copy()
+    store.close()
+
+    reopened = UserProfileStore(maxsize=1)
+    assert reopened.has_profile("u2")
+    profile = reopened._profile("u1")
+    assert profile["events"] == 2
+    np.testing.assert_allclose(profile["vector"], vector)
+    reopened.close()
+
+
+def test_feedback_biases_retrieval_toward_liked_teas(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+    before = [tea['id'] for tea, _ in pipeline.retrieve(QUERY, k=20)]
+    liked = before[-1]
+    for _ in range(5):
+        pipeline.record_feedback("u1", liked, "purchase")
+    after = [tea['id'] for tea, _ in pipeline.retrieve(QUERY, k=20, user_id="u1")]
+    assert after.index(liked) < before.index(liked)
+    # Other users are unaffected
+    assert [tea['id'] for tea, _ in pipeline.retrieve(QUERY, k=20, user_id="u2")] == before
+    assert pipeline.record_feedback("u1", "tea_9999", "like") is None
+    pipeline.user_profiles.close()
+
+
+def test_feedback_endpoint_updates_the_profile(monkeypatch, tmp_path):
+    client, pipeline = make_client(monkeypatch, tmp_path, FakeGenerator())
+    with client:
+        for events in (1, 2):
+            response = client.post("/feedback", json={"user_id": "u1", "tea_id": "tea_0003", "event": "like"})
+            assert response.status_code == 200
+            assert response.json() == {"user_id": "u1", "events": events}
+        assert client.post("/feedback", json={"user_id": "u1", "tea_id": "tea_9999", "event": "like"}).status_code == 404
+        assert client.post("/feedback", json={"user_id": "u1", "tea_id": "tea_0003", "event": "stare"}).status_code == 400
+        assert pipeline.user_profiles.has_profile("u1")
+    # Shutdown saved the profile
+    reopened = UserProfileStore()
+    assert reopened.has_profile("u1")
+    reopened.close()